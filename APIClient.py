@@ -12,6 +12,20 @@ from models.file import File
 from models.file_version import FileVersion
 from models.share_link import ShareLink
 from models.workspace_dataclass import WorkspaceDataClass
+from transport.session_pool import SessionPool
+from transport.connectivity import ConnectivityTracker, ConnectivityState
+from transport import pagination
+from transport.response_cache import ResponseCache, CacheEntry, service_of
+from transport import compression
+from transport import downloads
+from transport.range_download import RangeDownload
+from transport import uploads
+from transport.upload_index import UploadIndex
+from transport.retry import RetryPolicy
+from transport.instrumentation import Instrumentation
+from transport.token_manager import TokenManager, TokenRefreshImpossible
+from transport.single_flight import SingleFlight
+from transport.version_index import VersionIndex, PUBLIC, PRIVATE
 
 logger = Utils.getLogger(__name__)
 
@@ -39,7 +53,10 @@ class APIClientConnectionError(APIClientException):
 class APIClientRequestException(APIClientException):
     """Something about the request was not acceptable to the API"""
 
-    pass
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        # the HTTP status of the response, if there was one
+        self.status_code = status_code
 
 
 class APIClientLoggedOutException(APIClientException):
@@ -72,6 +89,14 @@ class APIClientTierException(APIClientException):
     pass
 
 
+class APIClientCanceledException(APIClientException):
+    """
+    The user canceled a transfer.
+    """
+
+    pass
+
+
 class ConnStatus(Enum):
     LOGGED_OUT = 1  # no connection, user logged out
     CONNECTED = 2  # connection, user logged in
@@ -82,6 +107,27 @@ OK = requests.codes.ok
 CREATED = requests.codes.created
 UNAUTHORIZED = requests.codes.unauthorized
 NOT_FOUND = requests.codes.not_found
+NOT_MODIFIED = requests.codes.not_modified
+
+# Open a connection to the API in the background as soon as a logged in
+# client is created, so that the first call does not pay for the handshake.
+PRECONNECT_AT_LOGIN = True
+
+TIMEOUT_PROBE_S = 10
+# the probe of a call the user is waiting for
+TIMEOUT_PROBE_NOW_S = 3
+
+# Writes to a service (the first component of an endpoint) invalidate the
+# cached responses of that service and of the services listed here, whose
+# documents embed summaries of the written service.
+DEPENDENT_SERVICES = {
+    "file": ["directories", "workspaces", "models"],
+    "directories": ["workspaces"],
+    "models": ["file", "directories"],
+    "shared-models": ["models", "file"],
+    "workspaces": ["organizations"],
+    "preferences": ["organizations"],
+}
 
 
 class APIClient:
@@ -96,6 +142,8 @@ class APIClient:
         version,
         access_token=None,
         user=None,
+        cache_path=None,
+        upload_index_path=None,
     ):
         self.base_url = api_url
         self.lens_url = lens_url
@@ -103,6 +151,26 @@ class APIClient:
         self.version = version
         self.parent = parent
         self.status = ConnStatus.DISCONNECTED
+        self.instrumentation = Instrumentation(api_url)
+        self.sessions = SessionPool(instrumentation=self.instrumentation)
+        self.retry_policy = RetryPolicy()
+        # refreshes the access token before it expires
+        self.tokens = TokenManager(self._reauthenticate, self._token_refreshed)
+        self.connectivity = ConnectivityTracker(self._probe_online)
+        self.connectivity.add_listener(self._connectivity_changed)
+        # conditional requests are only possible with a place to store responses
+        self.response_cache = ResponseCache(cache_path) if cache_path else None
+        # identical GETs in quick succession share one request
+        self.single_flight = SingleFlight()
+        # versions of files looked up recently, e.g. by share links
+        self.version_index = VersionIndex()
+        # uploads of content the server already has can be skipped
+        self.upload_index = (
+            UploadIndex(upload_index_path) if upload_index_path else None
+        )
+        # text formats such as STEP are sent and received compressed
+        self.upload_compression = compression.UploadCompression()
+        self.transfer_stats = compression.TransferStats()
 
         if access_token is None:
             self.email = email
@@ -116,20 +184,41 @@ class APIClient:
             self.access_token = access_token
             self.user = user
             self.setStatus(ConnStatus.CONNECTED)
+            if PRECONNECT_AT_LOGIN:
+                self.sessions.preconnect(f"{self.base_url}/")
+
+    @property
+    def access_token(self):
+        return self.tokens.token
+
+    @access_token.setter
+    def access_token(self, token):
+        self.tokens.set_token(token)
 
     def setStatus(self, newStatus):
         self.status = newStatus
         if hasattr(self.parent, "api"):  # during parent startup; don't set status yet.
-            self.parent.set_ui_connectionStatus()
+            # The status may change from the connectivity probe thread, so
+            # notify the UI by means of a (queued) signal.
+            self.parent.connectionStatusChanged.emit()
 
     def getStatus(self):
         """
-        Gets the current connection status;
-        This is an active check to see if really online.
+        Gets the current connection status.
+
+        The status is inferred from the outcome of the calls to the API, so
+        this does not make a call itself.
         """
-        self._confirm_online()
         return self.status
 
+    def _connectivity_changed(self, state):
+        if state == ConnectivityState.OFFLINE:
+            self.setStatus(ConnStatus.DISCONNECTED)
+        elif self.is_logged_in():
+            self.setStatus(ConnStatus.CONNECTED)
+        else:
+            self.setStatus(ConnStatus.LOGGED_OUT)
+
     def getNameUser(self):
         if self.user and "name" in self.user:
             return self.user["name"]
@@ -140,8 +229,61 @@ class APIClient:
         self.password = None
         self.access_token = None
         self.user = None
+        self.tokens.stop()
+        self.connectivity.stop()
+        self.sessions.close()
+        if self.upload_index:
+            self.upload_index.close()
         self.setStatus(ConnStatus.LOGGED_OUT)
 
+    def get_connection_stats(self):
+        """Return the number of handshakes and reused connections.
+
+        Useful from the Python console to see how many connections are saved
+        by keeping them alive, for example:
+
+            WorkspaceView.wsv.api.get_connection_stats()
+        """
+        return self.sessions.get_stats()
+
+    def get_call_stats(self):
+        """Return the latency and size of the calls per endpoint.
+
+        See Instrumentation for more ways to query the calls, for example:
+
+            WorkspaceView.wsv.api.instrumentation.print_summary()
+        """
+        return self.instrumentation.summary()
+
+    def get_retry_stats(self):
+        """Return the number of retried calls, retries and give ups.
+
+        For example, from the Python console:
+
+            WorkspaceView.wsv.api.get_retry_stats()
+        """
+        return self.retry_policy.stats.as_dict()
+
+    def get_compression_stats(self):
+        """Return the bytes saved by compressed uploads and downloads.
+
+        The totals are per direction, see transfer_stats for the individual
+        transfers, for example:
+
+            WorkspaceView.wsv.api.transfer_stats.get_recent()
+        """
+        return self.transfer_stats.get_stats()
+
+    def _record_transfer(self, direction, filename, encoding, raw_bytes, wire_bytes):
+        transfer = self.transfer_stats.record(
+            direction, os.path.basename(filename), encoding, raw_bytes, wire_bytes
+        )
+        if encoding:
+            logger.debug(
+                f"{direction}: {filename} {wire_bytes} of {raw_bytes} bytes "
+                f"with {encoding}, saved {transfer['savedBytes']} bytes"
+            )
+
     def is_logged_in(self):
         """Whether a user is logged in.
 
@@ -161,6 +303,9 @@ class APIClient:
         def wrapper(self, *args, **kwargs):
             if not self.access_token:
                 self.authenticate()
+            else:
+                # normally the token manager refreshed the token already
+                self.tokens.ensure_valid()
 
             result = func(self, *args, **kwargs)
 
@@ -187,13 +332,52 @@ class APIClient:
         self.user = data["user"]
         self.setStatus(ConnStatus.CONNECTED)
 
+    def _reauthenticate(self, token):
+        """Obtain a new access token for the token manager.
+
+        Without the credentials (the user logged in during an earlier session)
+        the server is asked to reissue the current token.
+        """
+        if self.email and self.password:
+            payload = {
+                "strategy": "local",
+                "email": self.email,
+                "password": self.password,
+            }
+        else:
+            payload = {"strategy": "jwt", "accessToken": token}
+
+        headers = self._set_content_type()
+        try:
+            data = self._post(
+                "authentication", headers=headers, data=json.dumps(payload)
+            )
+        except APIClientAuthenticationException as e:
+            raise TokenRefreshImpossible(e)
+        self.user = data.get("user", self.user)
+        return data["accessToken"]
+
+    def _token_refreshed(self, token):
+        logger.debug("Refreshed the access token")
+        if hasattr(self.parent, "api"):
+            # possibly called from the token manager thread
+            self.parent.tokenRefreshed.emit()
+
+    def get_token_stats(self):
+        return self.tokens.get_stats()
+
     def _raiseException(self, response, **kwargs):
         "Raise a generic exception based on the status code"
         # dumps only when debugging is enabled
         self._dump_response(response, **kwargs)
+        try:
+            message = response.json()["message"]
+        except (ValueError, KeyError, TypeError):
+            # e.g. a proxy that rejects a compressed upload
+            message = response.reason
         raise APIClientRequestException(
-            f"API request failed with status code {response.status_code}: "
-            + response.json()["message"]
+            f"API request failed with status code {response.status_code}: {message}",
+            status_code=response.status_code,
         )
 
     def _set_default_headers(self, headers):
@@ -208,44 +392,74 @@ class APIClient:
         headers = {"Content-Type": "application/json"}
         return headers
 
-    def _confirm_online(self):
+    def _probe_online(self, timeout=TIMEOUT_PROBE_S):
         """
         Calls lens api root to simply check if online.
-        If not online, updates status.
+
+        Only used by the connectivity tracker while we are offline.
         """
         try:
-            requests.get(f"{self.base_url}/")
-            if self.is_logged_in():
-                self.setStatus(ConnStatus.CONNECTED)
-            else:
-                self.setStatus(ConnStatus.LOGGED_OUT)
+            self.sessions.get(f"{self.base_url}/", timeout=timeout)
+            return True
         except requests.exceptions.RequestException as e:
-            if e.response is None:
-                self.setStatus(ConnStatus.DISCONNECTED)
+            return e.response is not None
 
-    def _confirm_online_after_exception(self):
-        self._confirm_online()
-        if self.status == ConnStatus.DISCONNECTED:
+    def _record_response(self, response):
+        """Let the connectivity tracker know the outcome of a call."""
+        if response.status_code >= 500:
+            self.connectivity.record_failure()
+        else:
+            self.connectivity.record_success()
+
+    def _raise_after_request_exception(
+        self, e, exceptionClass=APIClientConnectionError
+    ):
+        if e.response is None:
+            # a connection error is conclusive, other errors (such as time
+            # outs) only degrade the connection
+            self.connectivity.record_failure(
+                conclusive=isinstance(e, requests.exceptions.ConnectionError)
+            )
+        else:
+            self._record_response(e.response)
+        if self.connectivity.is_offline():
             raise APIClientOfflineException("Disconnected from service: logged out")
+        raise exceptionClass(e)
 
     def _properly_throw_if_offline(self):
-        if self.status == ConnStatus.DISCONNECTED:
-            self._confirm_online()  # try to connect again
-            if self.status == ConnStatus.DISCONNECTED:
-                raise APIClientOfflineException("Disconnected from service: logged out")
+        if self.connectivity.is_offline() and not self.connectivity.probe_now(
+            lambda: self._probe_online(TIMEOUT_PROBE_NOW_S)
+        ):
+            # the connectivity tracker probes in the background and will
+            # report when we are online again
+            raise APIClientOfflineException("Disconnected from service: logged out")
+
+    def _send(self, method, endpoint, idempotent=None, **kwargs):
+        """Send a request to an endpoint, retrying transient failures.
+
+        See RetryPolicy for which requests are retried.  Streamed bodies
+        cannot be sent again, so these requests are never retried.
+        """
+        url = f"{self.base_url}/{endpoint}"
+
+        def send():
+            return self.sessions.request(method, url, **kwargs)
+
+        if hasattr(kwargs.get("data"), "read"):
+            return send()
+        return self.retry_policy.call(method, send, idempotent)
 
     def _delete(self, endpoint, headers={}, params=None):
         headers = self._set_default_headers(headers)
 
         try:
-            response = requests.delete(
-                f"{self.base_url}/{endpoint}", params=params, headers=headers
-            )
+            response = self._send("DELETE", endpoint, params=params, headers=headers)
         except requests.exceptions.RequestException as e:
-            self._confirm_online_after_exception()
-            raise APIClientConnectionError(e)
+            self._raise_after_request_exception(e)
+        self._record_response(response)
 
         if response.status_code == OK:
+            self._invalidate_cache(endpoint)
             return response.json()
         elif response.status_code == NOT_FOUND:
             raise APIClientNotFoundException(f"item not found {endpoint}")
@@ -254,19 +468,83 @@ class APIClient:
                 response, endpoint=endpoint, headers=headers, params=params
             )
 
+    def _scope(self):
+        """The user that cached data belongs to."""
+        return self.user["_id"] if self.user and "_id" in self.user else "public"
+
+    def _cache_key(self, endpoint, params):
+        if self.response_cache is None:
+            return None
+        return ResponseCache.make_key(self._scope(), endpoint, params)
+
+    def _cache_response(self, key, endpoint, response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if key and (etag or last_modified):
+            entry = CacheEntry(
+                key, service_of(endpoint), etag, last_modified, response.text
+            )
+            self.response_cache.put(entry)
+
+    def _invalidate_cache(self, endpoint):
+        self.single_flight.clear()
+        service = service_of(endpoint)
+        services = [service] + DEPENDENT_SERVICES.get(service, [])
+        if "file" in services:
+            self.version_index.invalidate()
+        if self.response_cache is None:
+            return
+        self.response_cache.invalidate(services)
+
+    def get_cache_stats(self):
+        if self.response_cache is None:
+            return {}
+        return self.response_cache.get_stats()
+
+    def get_single_flight_stats(self):
+        """Return how many GETs are coalesced with an identical GET.
+
+        For example, from the Python console:
+
+            WorkspaceView.wsv.api.get_single_flight_stats()
+        """
+        return self.single_flight.get_stats()
+
     def _request(self, endpoint, headers={}, params=None):
+        """GET an endpoint, shared with identical GETs in flight or just done.
+
+        The body is shared and every caller decodes its own result, which it
+        may modify.
+        """
+        key = SingleFlight.make_key(self._scope(), endpoint, headers, params)
+        body = self.single_flight.do(
+            key, lambda: self._request_body(endpoint, headers, params)
+        )
+        return json.loads(body)
+
+    def _request_body(self, endpoint, headers={}, params=None):
+        """GET an endpoint; returns the JSON body as text."""
         self._properly_throw_if_offline()
-        headers = self._set_default_headers(headers)
+        # copy the headers as the default argument is shared between calls
+        headers = self._set_default_headers(dict(headers))
+
+        cache_key = self._cache_key(endpoint, params)
+        cache_entry = self.response_cache.get(cache_key) if cache_key else None
+        if cache_entry:
+            headers.update(cache_entry.validators())
+
         try:
-            response = requests.get(
-                f"{self.base_url}/{endpoint}", headers=headers, params=params
-            )
+            response = self._send("GET", endpoint, headers=headers, params=params)
         except requests.exceptions.RequestException as e:
-            self._confirm_online_after_exception()
-            raise APIClientConnectionError(e)
-
-        if response.status_code == OK:
-            return response.json()
+            self._raise_after_request_exception(e)
+        self._record_response(response)
+
+        if response.status_code == NOT_MODIFIED and cache_entry:
+            self.response_cache.record_hit(cache_key)
+            return cache_entry.body
+        elif response.status_code == OK:
+            self._cache_response(cache_key, endpoint, response)
+            return response.text
         elif response.status_code == UNAUTHORIZED:
             raise APIClientAuthenticationException("Not authenticated")
         elif response.status_code == NOT_FOUND:
@@ -282,18 +560,19 @@ class APIClient:
         if endpoint == "authentication":
             headers.pop("Authorization")
         try:
-            response = requests.post(
-                f"{self.base_url}/{endpoint}", headers=headers, data=data, files=files
+            response = self._send(
+                "POST", endpoint, headers=headers, data=data, files=files
             )
         except requests.exceptions.RequestException as e:
-            self._confirm_online_after_exception()
-            raise APIClientConnectionError(e)
+            self._raise_after_request_exception(e)
+        self._record_response(response)
 
         # only _post makes a distinction between the general error and
         # unauthorized because _authenticate makes use of post and unauthorized
         # should be handled differently for the _authenticate function (for
         # example give the user another try to log in).
         if response.status_code in [CREATED, OK]:
+            self._invalidate_cache(endpoint)
             return response.json()
         elif response.status_code == UNAUTHORIZED:
             raise APIClientAuthenticationException("Not authenticated")
@@ -309,14 +588,22 @@ class APIClient:
         headers = self._set_default_headers(headers)
 
         try:
-            response = requests.patch(
-                f"{self.base_url}/{endpoint}", headers=headers, data=data, files=files
+            # sending the same payload again has the same effect, except for
+            # files that may have been read already
+            response = self._send(
+                "PATCH",
+                endpoint,
+                idempotent=files is None,
+                headers=headers,
+                data=data,
+                files=files,
             )
         except requests.exceptions.RequestException as e:
-            self._confirm_online_after_exception()
-            raise APIClientConnectionError(e)
+            self._raise_after_request_exception(e)
+        self._record_response(response)
 
         if response.status_code in [CREATED, OK]:
+            self._invalidate_cache(endpoint)
             return response.json()
         elif response.status_code == NOT_FOUND:
             raise APIClientNotFoundException(f"item not found {endpoint}")
@@ -325,33 +612,90 @@ class APIClient:
                 response, endpoint=endpoint, headers=headers, data=data, files=files
             )
 
-    def _download(self, url, filename):
+    def _stream_download(self, url, write_func, **kwargs):
+        """Download url in chunks with write_func(response).
+
+        The body is never held in memory as a whole.  It is requested
+        compressed and decompressed while streamed; write_func returns the
+        number of bytes written.
+        """
         self._properly_throw_if_offline()
         try:
-            response = requests.get(url)
+            response = self.sessions.get(
+                url,
+                headers={"Accept-Encoding": compression.accept_encoding()},
+                stream=True,
+            )
         except requests.exceptions.RequestException as e:
-            raise APIClientException(e)
+            self._raise_after_request_exception(e, APIClientException)
+        self._record_response(response)
+
+        with response:
+            if response.status_code == OK:
+                try:
+                    size = write_func(response)
+                except requests.exceptions.RequestException as e:
+                    # the connection failed halfway
+                    self._raise_after_request_exception(e, APIClientException)
+                self._record_transfer(
+                    "download",
+                    kwargs.get("filename", url.split("?")[0]),
+                    downloads.get_content_encoding(response),
+                    size,
+                    downloads.wire_bytes(response, size),
+                )
+                return True
+            else:
+                self._raiseException(
+                    response, url=url, status_code=response.status_code, **kwargs
+                )
+
+    def _download(self, url, filename, progress=None):
+        # Save file to workspace directory under the user name not the unique name
+        return self._stream_download(
+            url,
+            lambda response: downloads.stream_to_file(response, filename, progress),
+            filename=filename,
+        )
 
-        if response.status_code == OK:
-            # Save file to workspace directory under the user name not the unique name
-            with open(filename, "wb") as f:
-                f.write(response.content)
-            return True
-        else:
-            self._raiseException(response, url=url, filename=filename)
+    def _download_resumable(self, url, filename, key, progress=None):
+        """Download url to filename with a download that can be resumed.
 
-    def _download_with_file_handle(self, url, fh):
+        The key identifies the file across signed urls.  If the download
+        fails, the partial file is kept and a next download of the same key
+        continues where this one stopped.
+        """
         self._properly_throw_if_offline()
+        download = RangeDownload(
+            self.sessions.get,
+            url,
+            filename,
+            key,
+            accept_encoding=compression.accept_encoding(),
+        )
         try:
-            response = requests.get(url)
+            size = download.run(progress)
         except requests.exceptions.RequestException as e:
-            raise APIClientException(e)
+            self._raise_after_request_exception(e, APIClientException)
+        self.connectivity.record_success()
+        self._record_transfer(
+            "download",
+            filename,
+            download.encoding,
+            size - download.resumed_bytes,
+            download.wire_bytes,
+        )
+        if download.resumed_bytes or download.retries:
+            logger.debug(
+                f"Downloaded {filename} resuming from {download.resumed_bytes} "
+                f"bytes with {download.retries} retries"
+            )
+        return True
 
-        if response.status_code == OK:
-            fh.write(response.content)
-            return True
-        else:
-            self._raiseException(response, url=url, status_code=response.status_code)
+    def _download_with_file_handle(self, url, fh, progress=None):
+        return self._stream_download(
+            url, lambda response: downloads.stream_to_handle(response, fh, progress)
+        )
 
     def _dump_response(self, response, **kwargs):
         # # make a dictionary out of the keyword arguments
@@ -374,6 +718,26 @@ class APIClient:
             # Access response body as JSON
             logger.debug(f"Response body (JSON): {response.json()}")
 
+    def _fetch_page_func(self, endpoint, headers=None):
+        def fetch_page(params):
+            # _request modifies the headers, so hand it a fresh copy
+            return self._request(endpoint, dict(headers or {}), params)
+
+        return fetch_page
+
+    @authRequired
+    def iter_pages(self, endpoint, params=None, headers=None):
+        """Generate the pages (lists of dicts) of a "find" on an endpoint.
+
+        The next page is fetched in the background while the current page is
+        being processed.  Raises an APIClientException when a page fails.
+        """
+        return pagination.iter_pages(self._fetch_page_func(endpoint, headers), params)
+
+    def _find_all(self, endpoint, params=None, headers=None):
+        """Return the items of all pages of a "find" on an endpoint."""
+        return pagination.fetch_all(self._fetch_page_func(endpoint, headers), params)
+
     @authRequired
     def get_base_url(self):
         return self.lens_url
@@ -398,18 +762,10 @@ class APIClient:
 
     @authRequired
     def getModels(self, params=None):
-        paginationparams = {"$limit": 50, "$skip": 0, "isSharedModel": "false"}
-
         endpoint = "models"
-        if params is None:
-            params = paginationparams
-        else:
-            params = {**params, **paginationparams}
+        params = {**(params or {}), "isSharedModel": "false"}
 
-        result = self._request(endpoint, params=params)
-        models = result["data"]
-
-        return models
+        return self._find_all(endpoint, params)
 
     @authRequired
     def getModel(self, modelId):
@@ -462,39 +818,58 @@ class APIClient:
 
     @authRequired
     def getFiles(self, params=None):
-        paginationparams = {"$limit": 50, "$skip": 0, "isSystemGenerated": "false"}
         endpoint = "file"
-        if params is None:
-            params = paginationparams
-        else:
-            params = {**params, **paginationparams}
-
-        result = self._request(endpoint, params=params)
-        files = result["data"]
+        params = {**(params or {}), "isSystemGenerated": "false"}
 
-        return files
+        return self._find_all(endpoint, params)
 
     @authRequired
     def get_file_version_details(
         self, file_id, version_id, public=False
     ) -> (File, FileVersion):
+        """Return the file and one of its versions (None if it does not exist).
+
+        Recently fetched files are answered from the version index.  The
+        result is shared and must not be modified.
+        """
+        found = self.version_index.lookup(file_id, version_id, public)
+        if found:
+            return found
+
         endpoint = f"file/{file_id}"
         if public:
-            params = {"publicInfo": "true"}  # yes, a string, not a bool
-            try:
-                file_json = self._request(endpoint, params=params)
-            except (
-                APIClientRequestException
-            ):  # if public fails, fall back to a private attempt
-                file_json = self._request(endpoint)
+
+            def fetch(mode):
+                # yes, publicInfo is a string, not a bool
+                params = {"publicInfo": "true"} if mode == PUBLIC else None
+                return self._request(endpoint, params=params)
+
+            # try the access mode that worked last time first, and if it
+            # fails, fall back to the other
+            mode, file_json = self.version_index.fetch(
+                file_id,
+                fetch,
+                (
+                    APIClientRequestException,
+                    APIClientAuthenticationException,
+                    APIClientNotFoundException,
+                ),
+            )
         else:
+            mode = PRIVATE
             file_json = self._request(endpoint)
         file = File.from_json(file_json)
-        version = None
-        for ver in file.versions:
-            if ver._id == version_id:
-                version = ver
-        return file, version
+        get_version = self.version_index.store(
+            file_id,
+            file.updatedAt,
+            file,
+            ((version._id, version) for version in file.versions),
+            public=mode == PUBLIC,
+        )
+        return file, get_version(version_id)
+
+    def get_version_index_stats(self):
+        return self.version_index.get_stats()
 
     @authRequired
     def createFile(self, fileName, fileUpdatedAt, uniqueName, directory, workspace):
@@ -567,7 +942,14 @@ class APIClient:
     #  Upload Functions
 
     @authRequired
-    def uploadFileToServer(self, uniqueName, filename):
+    def uploadFileToServer(self, uniqueName, filename, progress=None):
+        """Upload a file under a unique name.
+
+        The file is streamed in chunks, compressed if it is a format that
+        compresses well (see transport.compression).  The optional progress
+        is called as progress(bytes_sent, bytes_total) and cancels the upload
+        by returning False, which raises an APIClientCanceledException.
+        """
         logger.debug(f"upload: {filename}")
         # files to be uploaded need to have a unique name generated with uuid
         # (use str(uuid.uuid4()) ) : test.fcstd ->
@@ -578,39 +960,98 @@ class APIClient:
         if not os.path.isfile(filename):
             raise FileNotFoundError
 
+        def send(encoding):
+            logger.debug(f"upload: {filename} with coding {encoding}")
+            return self._upload(endpoint, uniqueName, filename, encoding, progress)
+
+        # a refused content coding shows as a failed request or a reset
+        return self.upload_compression.upload(
+            filename, send, (APIClientRequestException, APIClientConnectionError)
+        )
+
+    def _upload(self, endpoint, uniqueName, filename, encoding, progress):
         with open(filename, "rb") as f:
-            fileWithUniqueName = (
-                uniqueName,
-                f,
-                "application/octet-stream",
+            body = uploads.MultipartFileEncoder(
+                "file", uniqueName, f, progress=progress
             )
+            headers = {"Content-Type": body.content_type}
+            if encoding:
+                body = compression.CompressingBody(body, encoding)
+                headers["Content-Encoding"] = encoding
+            try:
+                result = self._post(endpoint, headers=headers, data=body)
+            except uploads.UploadCanceledException:
+                raise APIClientCanceledException(f"Upload of {filename} canceled")
+        if encoding:
+            self._record_transfer(
+                "upload", filename, encoding, body.raw_bytes, body.wire_bytes
+            )
+        else:
+            self._record_transfer("upload", filename, None, len(body), len(body))
+        return result
 
-            files = {"file": fileWithUniqueName}
-            result = self._post(endpoint, files=files)
-            return result
+    @authRequired
+    def uploadFileContent(self, uniqueName, filename, progress=None):
+        """Upload a file unless the server already has its content.
+
+        Returns the unique name of the blob on the server: uniqueName if the
+        file is uploaded or the unique name of an earlier upload of the same
+        content.
+        """
+        if self.upload_index is None:
+            self.uploadFileToServer(uniqueName, filename, progress)
+            return uniqueName
+
+        digest = self.upload_index.hash(filename)
+        existingName = self.upload_index.lookup(self._scope(), digest)
+        if existingName:
+            logger.debug(f"upload: {filename} skipped, content is {existingName}")
+            return existingName
+
+        self.uploadFileToServer(uniqueName, filename, progress)
+        self.upload_index.record(self._scope(), digest, uniqueName)
+        return uniqueName
+
+    def findUploadedContent(self, filename):
+        """Return the unique name of an earlier upload of this content or None."""
+        if self.upload_index is None:
+            return None
+        return self.upload_index.lookup(self._scope(), self.upload_index.hash(filename))
+
+    def get_upload_index_stats(self):
+        if self.upload_index is None:
+            return {}
+        return self.upload_index.get_stats()
 
     @authRequired
-    def downloadFileFromServer(self, uniqueFileName, pathFile):
+    def downloadFileFromServer(self, uniqueFileName, pathFile, progress=None):
+        """Download a file to pathFile.
+
+        The optional progress is called as progress(bytes_done, bytes_total).
+        An interrupted download is resumed by the next call.
+        """
         endpoint = f"/upload/{uniqueFileName}"
 
         response = self._request(endpoint)
         directory = os.path.dirname(pathFile)
         os.makedirs(directory, exist_ok=True)
 
-        return self._download(response["url"], pathFile)
+        return self._download_resumable(
+            response["url"], pathFile, uniqueFileName, progress
+        )
 
     @authRequired
-    def downloadObjectFileFromServer(self, objUrl, pathFile):
+    def downloadObjectFileFromServer(self, objUrl, pathFile, progress=None):
         directory = os.path.dirname(pathFile)
         os.makedirs(directory, exist_ok=True)
 
-        return self._download(objUrl, pathFile)
+        return self._download(objUrl, pathFile, progress)
 
     @authRequired
-    def downloadFileFromServerUsingHandle(self, unique_filename, fh):
+    def downloadFileFromServerUsingHandle(self, unique_filename, fh, progress=None):
         endpoint = f"/upload/{unique_filename}"
         url_dict = self._request(endpoint)
-        return self._download_with_file_handle(url_dict["url"], fh)
+        return self._download_with_file_handle(url_dict["url"], fh, progress)
 
     # Shared Model Functions
 
@@ -619,18 +1060,12 @@ class APIClient:
         endpoint = "shared-models"
 
         headers = self._set_content_type()
-        paginationparams = {"$limit": 50, "$skip": 0}
-
-        if params is None:
-            params = paginationparams
-        else:
-            params = {**params, **paginationparams}
+        params = dict(params or {})
         if "pin" in params:
             if params["pin"] == "":
                 del params["pin"]
 
-        result = self._request(endpoint, headers, params)
-        return result["data"]
+        return self._find_all(endpoint, params, headers)
 
     def get_public_shared_models(self):
         """
@@ -700,17 +1135,14 @@ class APIClient:
     # Workspace functions.
     @authRequired
     def getWorkspaces(self, params=None):
-        paginationparams = {"$limit": 50, "$skip": 0}
         endpoint = "workspaces"
-        if params is None:
-            params = paginationparams
-        else:
-            params = {**params, **paginationparams}
 
-        result = self._request(endpoint, params=params)
-        workspaces = result["data"]
+        return self._find_all(endpoint, params)
 
-        return workspaces
+    @authRequired
+    def iter_workspace_pages(self, params=None):
+        """Generate the workspaces page by page, see iter_pages."""
+        return self.iter_pages("workspaces", params)
 
     @authRequired
     def getWorkspace(self, workspaceID):
@@ -766,17 +1198,9 @@ class APIClient:
     # Directory Functions
     @authRequired
     def getDirectories(self, params=None):
-        paginationparams = {"$limit": 50, "$skip": 0}
         endpoint = "directories"
-        if params is None:
-            params = paginationparams
-        else:
-            params = {**params, **paginationparams}
 
-        result = self._request(endpoint, params=params)
-        directories = result["data"]
-
-        return directories
+        return self._find_all(endpoint, params)
 
     @authRequired
     def getDirectory(self, directoryID):
@@ -902,17 +1326,9 @@ class APIClient:
 
     @authRequired
     def getOrganizations(self, params=None):
-        paginationparams = {"$limit": 50, "$skip": 0}
         endpoint = "organizations"
-        if params is None:
-            params = paginationparams
-        else:
-            params = {**params, **paginationparams}
-
-        result = self._request(endpoint, params=params)
-        organizations = result["data"]
 
-        return organizations
+        return self._find_all(endpoint, params)
 
     def getOndselOrganization(self):
         endpoint = "organizations"
@@ -9,12 +9,13 @@ import os
 import json
 from pathlib import Path
 
-from PySide.QtCore import Qt, QAbstractListModel, QModelIndex
+from PySide.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, Signal
 from PySide.QtGui import QStandardItemModel, QStandardItem
 
 import FreeCAD
 
 from APIClient import fancy_handle, APICallResult
+from async_api_client import get_async_client
 
 
 CACHE_PATH = FreeCAD.getUserCachePath() + "Ondsel-Lens/"
@@ -33,6 +34,10 @@ class WorkspaceListModel(QAbstractListModel):
     ]
     """
 
+    # emitted when a refresh completed with whether the workspaces changed,
+    # or None if that is not known
+    workspacesRefreshed = Signal(object)
+
     def __init__(self, **kwargs):
         parent = kwargs.get("parent", None)
         super(WorkspaceListModel, self).__init__(parent)
@@ -40,6 +45,10 @@ class WorkspaceListModel(QAbstractListModel):
         self.api = kwargs["api"]
 
         self.workspaceListFile = f"{CACHE_PATH}/workspaceList.json"
+        # the generator of the remaining pages of the refresh in progress
+        self.pages = None
+        # the ids and update dates of the workspaces last retrieved
+        self.snapshot = None
 
         self.refreshModel()
 
@@ -47,16 +56,75 @@ class WorkspaceListModel(QAbstractListModel):
         self.api = api
 
     def refreshModel(self):
-        def try_get_workspaces_connected():
-            self.workspaces = self.api.getWorkspaces()
+        """Refresh the workspaces.
+
+        The first page of workspaces is shown immediately.  The remaining pages
+        (that are prefetched in the background) are appended from the Qt event
+        loop, such that the UI remains responsive for users with many
+        workspaces.
+        """
+        pages = None
+        first_page = []
+
+        def try_get_first_page():
+            nonlocal pages, first_page
+            pages = self.api.iter_workspace_pages()
+            first_page = next(pages, [])
+
+        # a refresh in progress is superseded by this one
+        self.pages = None
 
         self.beginResetModel()
-        api_result = fancy_handle(try_get_workspaces_connected)
+        api_result = fancy_handle(try_get_first_page)
         if api_result == APICallResult.OK:
-            self.save()
+            self.workspaces = first_page
+            self.pages = pages
         else:
             self.load()
         self.endResetModel()
+        if self.pages is None:
+            self.workspacesRefreshed.emit(None)
+
+        if self.pages is not None:
+            QTimer.singleShot(0, lambda: self.appendNextPage(pages))
+
+    def appendNextPage(self, pages):
+        if pages is not self.pages:
+            # superseded by another refresh
+            return
+
+        page = None
+
+        def try_get_next_page():
+            nonlocal page
+            page = next(pages, None)
+
+        api_result = fancy_handle(try_get_next_page)
+        if api_result != APICallResult.OK:
+            # keep what we have, but do not store an incomplete list
+            self.pages = None
+            self.workspacesRefreshed.emit(None)
+        elif page is None:
+            self.pages = None
+            self.save()
+            self.workspacesRefreshed.emit(self.updateSnapshot())
+        else:
+            if page:
+                first = len(self.workspaces)
+                self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+                self.workspaces.extend(page)
+                self.endInsertRows()
+            QTimer.singleShot(0, lambda: self.appendNextPage(pages))
+
+    def updateSnapshot(self):
+        """Take a snapshot of the workspaces; returns whether they changed."""
+        snapshot = [
+            (workspace.get("_id"), workspace.get("updatedAt"))
+            for workspace in self.workspaces
+        ]
+        changed = snapshot != self.snapshot
+        self.snapshot = snapshot
+        return changed
 
     def rowCount(self, parent=QModelIndex()):
         return len(self.workspaces)
@@ -106,6 +174,7 @@ class WorkspaceListModel(QAbstractListModel):
     #         self.save()
 
     def removeWorkspaces(self):
+        self.pages = None
         self.beginResetModel()
         self.workspaces = []
         self.endResetModel()
@@ -148,9 +217,7 @@ TYPE_BOOKMARK = 1
 def getBookmarkModel(apiClient):
     model = QStandardItemModel()
 
-    def addBookmarks(item, orgSecondaryReferencesId):
-        secRefs = apiClient.getSecondaryRefs(orgSecondaryReferencesId)
-
+    def addBookmarks(item, secRefs):
         for bookmark in secRefs["bookmarks"]:
             if bookmark["collectionName"] == "shared-models":
                 summary = bookmark["collectionSummary"]
@@ -162,11 +229,21 @@ def getBookmarkModel(apiClient):
     root = model.invisibleRootItem()
     if apiClient:
         orgs = apiClient.getOrganizations()
-        for org in orgs:
+        # the secondary references of the organizations are independent
+        aapi = get_async_client(apiClient)
+        secRefsOrgs = aapi.run(
+            aapi.gather(
+                *[
+                    aapi.getSecondaryRefs(org["orgSecondaryReferencesId"])
+                    for org in orgs
+                ]
+            )
+        )
+        for org, secRefs in zip(orgs, secRefsOrgs):
             orgItem = QStandardItem(org["name"])
             orgItem.setData(TYPE_ORG, ROLE_TYPE)
             root.appendRow(orgItem)
-            addBookmarks(orgItem, org["orgSecondaryReferencesId"])
+            addBookmarks(orgItem, secRefs)
 
     return model
 
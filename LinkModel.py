@@ -4,8 +4,56 @@
 # *                                                                     *
 # ***********************************************************************
 
+import copy
+import time
+import weakref
+
 from PySide.QtCore import Qt, QAbstractListModel, QModelIndex
 
+from async_api_client import get_async_client
+
+# Seconds that the links of a model are reused.  A model is created for every
+# click on a file, so this saves fetching the links again and again.  Changes
+# made with a ShareLinkModel invalidate the links right away; changes made
+# elsewhere (on the Lens website) show up after this time.
+LINKS_MAX_AGE_S = 300
+
+
+class ShareLinkCache:
+    """The links of models by cloneModelId, including their PINs."""
+
+    def __init__(self, max_age=LINKS_MAX_AGE_S, clock=time.monotonic):
+        self.max_age = max_age
+        self.clock = clock
+        self.entries = {}
+
+    def get(self, model_id):
+        """Return a copy of the links of a model, or None if not cached."""
+        entry = self.entries.get(model_id)
+        if entry is None:
+            return None
+        stored, links = entry
+        if self.clock() - stored > self.max_age:
+            del self.entries[model_id]
+            return None
+        return copy.deepcopy(links)
+
+    def put(self, model_id, links):
+        self.entries[model_id] = (self.clock(), copy.deepcopy(links))
+
+    def invalidate(self, model_id):
+        self.entries.pop(model_id, None)
+
+
+_link_caches = weakref.WeakKeyDictionary()
+
+
+def get_link_cache(api):
+    """Return the ShareLinkCache of an APIClient."""
+    if api not in _link_caches:
+        _link_caches[api] = ShareLinkCache()
+    return _link_caches[api]
+
 
 class ShareLinkModel(QAbstractListModel):
     """
@@ -73,6 +121,8 @@ class ShareLinkModel(QAbstractListModel):
 
         link = self.links[row]
         linkData["_id"] = link["_id"]
+        # the links change even if the call fails halfway
+        self._invalidate()
         self.apiClient.updateSharedModel(linkData)
         self.refresh_model()
 
@@ -84,12 +134,36 @@ class ShareLinkModel(QAbstractListModel):
 
     def refresh_model(self):
         # throws an APIClientException
+        cache = get_link_cache(self.apiClient)
+        links = cache.get(self.model_id)
+        if links is None:
+            links = self._fetch_links()
+            cache.put(self.model_id, links)
+
         self.beginResetModel()
         self.links = []
+        for link in links:
+            self._add_link(link)
+        self.endResetModel()
 
+    def _invalidate(self):
+        get_link_cache(self.apiClient).invalidate(self.model_id)
+
+    def _fetch_links(self):
         params = {"cloneModelId": self.model_id}
         shared_models = self.apiClient.getSharedModels(params=params)
 
+        # a "find" never returns a PIN for security reasons, so make singular
+        # queries to get that detail, concurrently (the async client bounds
+        # the number of calls in flight).
+        aapi = get_async_client(self.apiClient)
+        pin_ids = [sm["_id"] for sm in shared_models if sm["protection"] == "Pin"]
+        full_shared_models = aapi.run(
+            aapi.gather(*[aapi.getSharedModel(pin_id) for pin_id in pin_ids])
+        )
+        pins = {fsm["_id"]: fsm.get("pin", "") for fsm in full_shared_models}
+
+        links = []
         for sm in shared_models:
             canExport = sm.get("canExportModel", True)
             link = {
@@ -111,16 +185,9 @@ class ShareLinkModel(QAbstractListModel):
                 "canDownloadDefaultModel": sm.get("canDownloadDefaultModel", canExport),
                 "cloneModelId": sm.get("cloneModelId"),
             }
-            if link["protection"] == "Pin":
-                # a "find" never returns a PIN for security reasons, so
-                # make a singular query to get that detail.
-                fullSharedModel = self.apiClient.getSharedModel(sm["_id"])
-                link["pin"] = fullSharedModel.get("pin", "")
-            else:
-                link["pin"] = ""
-
-            self._add_link(link)
-        self.endResetModel()
+            link["pin"] = pins.get(sm["_id"], "")
+            links.append(link)
+        return links
 
     def compute_direct_link(self, model_id):
         return f"{self.apiClient.get_base_url()}share/{model_id}"
@@ -142,6 +209,7 @@ class ShareLinkModel(QAbstractListModel):
 
     def delete_link(self, link_id):
         # raises an APIClientException
+        self._invalidate()
         self.apiClient.deleteSharedModel(link_id)
         self.refresh_model()
 
@@ -156,6 +224,7 @@ class ShareLinkModel(QAbstractListModel):
         if link.get("isActive", None) is not None:
             link.pop("isActive")
 
+            self._invalidate()
             self.apiClient.createSharedModel(link)
             self.refresh_model()
 
@@ -2,14 +2,16 @@ from PySide.QtCore import (
     QAbstractListModel,
     Qt,
     QModelIndex,
-    Signal,
     QFileSystemWatcher,
-    QThread,
+    QTimer,
+    Signal,
 )
 from PySide.QtGui import QPixmap
 import Utils
 import os
 import shutil
+import threading
+import time
 import uuid
 import requests
 import APIClient
@@ -23,8 +25,16 @@ from DataModels import CACHE_PATH
 from VersionModel import VersionModel
 
 import check_links
+from listings import diff_listings, is_case_insensitive, merge_listings
 
 from APIClient import fancy_handle, APICallResult
+from transport.downloads import is_partial_download
+from transport.pipeline import Pipeline, Stage, Job
+from transport.coalescer import EventCoalescer
+from transport.instrumentation import caller, tag_caller
+from transport.latest_only import LatestOnly
+from transport.mutation_queue import MutationQueue, MutationConflict
+from transport.sync_state import SyncState
 
 logger = Utils.getLogger(__name__)
 
@@ -41,6 +51,19 @@ logger = Utils.getLogger(__name__)
 
 NO_REFRESH = False
 
+# The number of blobs uploaded in parallel by bulkUpload
+UPLOAD_WORKERS = 4
+
+# The number of threads that list directories for ServerWorkspaceModel
+REFRESH_WORKERS = 2
+
+# The journal of changes made while offline, relative to the workspace path.
+# Directories starting with a dot are not shown.
+PATH_PENDING_CHANGES = ".lens/pending.json"
+
+# The server listings and the sync state of the files, to browse offline
+PATH_SYNC_STATE = ".lens/sync-state.sqlite3"
+
 
 class FileStatus(Enum):
     SERVER_ONLY = auto()
@@ -65,15 +88,6 @@ class FileStatus(Enum):
             return "Unknown"
 
 
-class TokenRefreshThread(QThread):
-    token_refreshed = Signal()
-
-    def run(self):
-        while True:
-            self.token_refreshed.emit()
-            self.sleep(600)
-
-
 class WorkspaceModel(QAbstractListModel):
     NameRole = Qt.UserRole + 1
     NameAndIsFolderRole = Qt.UserRole + 2
@@ -95,11 +109,21 @@ class WorkspaceModel(QAbstractListModel):
         self.path = CACHE_PATH + self._id
         self.subPath = kwargs.get("subPath", "")
         self.files = []
-
+        # the directory that the files are of
+        self.filesPath = None
+
+        # the names and modification times of the local files last listed
+        self.localSnapshot = None
+
+        # Saving a document fires a burst of events, which are handled at
+        # once.  The watcher follows the directory shown, see setFiles().
+        self.watchEvents = EventCoalescer()
+        self.watchTimer = QTimer(self)
+        self.watchTimer.setSingleShot(True)
+        self.watchTimer.timeout.connect(self.flushWatchEvents)
         self.watcher = QFileSystemWatcher()
-        self.watcher.fileChanged.connect(self.refreshModel)
-        self.watcher.directoryChanged.connect(self.refreshModel)
-        self.watcher.addPath(self.path)
+        self.watcher.fileChanged.connect(self.watchEvent)
+        self.watcher.directoryChanged.connect(self.watchEvent)
 
     def clearModel(self):
         self.beginResetModel()
@@ -107,31 +131,120 @@ class WorkspaceModel(QAbstractListModel):
         self.endResetModel()
 
     def refreshModel(self):
-        self.clearModel()
+        """Refresh the file items; returns whether they changed."""
         if not os.path.isdir(self.path):
-            self.files = []
-            return
+            return self.setFiles([])
         localDirs, localFiles = self.getLocalFiles()
-        self.beginResetModel()
-        self.files = self.sortFiles(localDirs, localFiles)
-        self.endResetModel()
+        self.localSnapshot = self.getSnapshot(localDirs, localFiles)
+        return self.setFiles(self.sortFiles(localDirs, localFiles))
+
+    def refreshLocal(self, localDirs, localFiles):
+        """Refresh the file items after a local change, from the local items.
+
+        Returns whether the file items changed.
+        """
+        return self.setFiles(self.sortFiles(localDirs, localFiles))
+
+    def watchEvent(self, path):
+        delay = self.watchEvents.add(path)
+        self.watchTimer.start(int(delay * 1000))
+
+    def flushWatchEvents(self):
+        """Handle a burst of watcher events with a rescan of the local files.
+
+        Nothing happens if the listing did not change, for example if only a
+        backup or a partial download was written.  Returns whether the file
+        items changed.
+        """
+        paths = self.watchEvents.take()
+        if not os.path.isdir(self.getFullPath()):
+            return False
+        with caller("watcher"):
+            localDirs, localFiles = self.getLocalFiles()
+            snapshot = self.getSnapshot(localDirs, localFiles)
+            if snapshot == self.localSnapshot:
+                logger.debug(f"No local changes after {len(paths)} watcher events")
+                return False
+            self.localSnapshot = snapshot
+            return self.refreshLocal(localDirs, localFiles)
+
+    def watchDirectory(self, path):
+        """Watch path instead of the directory watched before."""
+        watched = self.watcher.directories()
+        if watched == [path]:
+            return
+        if watched:
+            self.watcher.removePaths(watched)
+        if os.path.isdir(path):
+            self.watcher.addPath(path)
+
+    def close(self):
+        """Stop watching the file system; the model is no longer used."""
+        self.watchTimer.stop()
+        watched = self.watcher.files() + self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+
+    def setFiles(self, files):
+        """Replace the file items, signaling only the rows that change.
+
+        A view keeps its selection and scroll position this way.  The model
+        is reset only if the directory changed or the rows cannot be diffed.
+        Returns whether the items changed.
+        """
+        diff = None
+        if self.filesPath == self.getFullPath():
+            diff = diff_listings(
+                self.files,
+                files,
+                key=lambda fileItem: (fileItem.is_folder, fileItem.name),
+                same=lambda old, new: vars(old) == vars(new),
+            )
+        self.filesPath = self.getFullPath()
+        self.watchDirectory(self.filesPath)
+        if diff is None:
+            self.beginResetModel()
+            self.files = files
+            self.endResetModel()
+            return True
+
+        for first, last in diff.removed:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.files[first : last + 1]
+            self.endRemoveRows()
+        for first, last in diff.inserted:
+            self.beginInsertRows(QModelIndex(), first, last)
+            self.files[first:first] = files[first : last + 1]
+            self.endInsertRows()
+        # the rows are in place, so the unchanged items can be replaced quietly
+        self.files = files
+        for first, last in diff.changed:
+            self.dataChanged.emit(self.index(first), self.index(last))
+        return not diff.is_empty()
 
     def getLocalFiles(self):
-        if not os.path.exists(self.getFullPath()):
-            os.makedirs(self.getFullPath())
-        files = os.listdir(self.getFullPath())
+        return self.scanLocalFiles(self.getFullPath())
+
+    def scanLocalFiles(self, path):
+        """List the local dirs and files in path.
+
+        Does not touch the model, so it may run off the GUI thread.
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        files = os.listdir(path)
         local_dirs = []
         local_files = []
 
         for basename in files:
             # First we filter the dirs
             if os.path.isdir(
-                Utils.joinPath(self.getFullPath(), basename)
+                Utils.joinPath(path, basename)
             ) and not basename.startswith("."):
                 file_item = FileItem(
                     basename,
                     "",
-                    self.getFullPath(),
+                    path,
                     True,
                     [],
                     "",
@@ -144,16 +257,16 @@ class WorkspaceModel(QAbstractListModel):
 
         for basename in files:
             # Then we add the files
-            file_path = Utils.joinPath(self.getFullPath(), basename)
+            file_path = Utils.joinPath(path, basename)
             if not os.path.isdir(file_path):
                 created_time = Utils.getFileCreatedAt(file_path)
                 modified_time = Utils.getFileUpdatedAt(file_path)
                 base, extension = os.path.splitext(basename)
-                if extension.lower() != ".fcbak":
+                if extension.lower() != ".fcbak" and not is_partial_download(basename):
                     file_item = FileItem(
                         basename,
                         extension.lower(),
-                        self.getFullPath(),
+                        path,
                         False,
                         [basename],
                         basename,
@@ -164,6 +277,14 @@ class WorkspaceModel(QAbstractListModel):
                     local_files.append(file_item)
         return local_dirs, local_files
 
+    @staticmethod
+    def getSnapshot(localDirs, localFiles):
+        """The names and modification times of local items, to compare."""
+        return (
+            {item.name for item in localDirs},
+            {item.name: item.updatedAt for item in localFiles},
+        )
+
     def rowCount(self, parent=None):
         return len(self.files)
 
@@ -299,26 +420,50 @@ class WorkspaceModel(QAbstractListModel):
 
 
 class ServerWorkspaceModel(WorkspaceModel):
+    # emitted from a worker thread with the result of refreshModelAsync()
+    refreshFinished = Signal(int, object, object)
+    # emitted when a refresh observed the files, with whether they changed
+    filesRefreshed = Signal(object)
+
     def __init__(self, workspaceDict, **kwargs):
         super().__init__(workspaceDict, **kwargs)
 
         # a stack of directories, the current directory is currentDirectory[-1]
         # (pushing is 'append()', popping is 'pop()')
         self.currentDirectory = [workspaceDict["rootDirectory"]]
+        # the server listing last retrieved, to reconcile local changes with
+        self.serverListing = None
 
         self.apiClient = kwargs["apiClient"]
-        self.refreshModel()
+        # changes made while offline, applied when we are online again
+        self.pendingChanges = MutationQueue(
+            Utils.joinPath(self.path, PATH_PENDING_CHANGES)
+        )
+        self.syncState = SyncState(Utils.joinPath(self.path, PATH_SYNC_STATE))
+        # Listing a directory takes a server round trip and a local scan,
+        # which happens off the GUI thread.  The result of a refresh that
+        # was overtaken, for example by navigating elsewhere, is dropped.
+        self.refresher = LatestOnly(
+            self.refreshFinished.emit, workers=REFRESH_WORKERS, name="Refresh"
+        )
+        self.refreshFinished.connect(self.applyRefresh)
+        self.refreshModelAsync()
 
         # if the folder doesnt exist, create it
         if not os.path.exists(self.path):
             os.makedirs(self.path)
-        # Create an instance of the token refresh thread
-        self.refresh_thread = TokenRefreshThread()
-        self.refresh_thread.token_refreshed.connect(self.refreshModel)
-        self.refresh_thread.start()
 
-    def getServerDirs(self, serverDirDicts):
-        currentDir = self.currentDirectory[-1]
+    def close(self):
+        """Release the refresh workers and the sync state database.
+
+        A refresh that is still running is dropped.
+        """
+        self.refresher.bump()
+        self.refresher.shutdown()
+        self.syncState.close()
+        super().close()
+
+    def getServerDirs(self, serverDirDicts, currentDir):
         serverDirs = []
         for dirDict in serverDirDicts:
             nameDir = dirDict["name"]
@@ -351,7 +496,7 @@ class ServerWorkspaceModel(WorkspaceModel):
         updatedDate = currentVersion["additionalData"].get("fileUpdatedAt", createdDate)
         return updatedDate, createdDate
 
-    def getServerFiles(self, serverFileDicts):
+    def getServerFiles(self, serverFileDicts, path):
         serverFiles = []
         for serverFileDict in serverFileDicts:
             currentVersion = serverFileDict["currentVersion"]
@@ -362,7 +507,7 @@ class ServerWorkspaceModel(WorkspaceModel):
             file_item = FileItem(
                 custFileName,
                 extension.lower(),
-                self.getFullPath(),
+                path,
                 False,
                 [custFileName],
                 custFileName,
@@ -374,26 +519,18 @@ class ServerWorkspaceModel(WorkspaceModel):
             serverFiles.append(file_item)
         return serverFiles
 
-    def mergeFiles(self, serverFiles, localFiles, funcUpdateFound, funcUpdateNotFound):
-        filesToAdd = []
-
-        # O(n^2) can be made more efficient with sorting and parallel iteration
-        # for now it suffices
-        for localFile in localFiles:
-            # logger.debug(f'serverFile: {localFile.name}')
-            for serverFile in serverFiles:
-                # logger.debug(f'localFile: {serverFile.name}')
-                if serverFile.name == localFile.name:
-                    # logger.debug(f'found {serverFile.name} locally')
-                    funcUpdateFound(serverFile, localFile)
-                    break
-            else:  # the server does not have this file
-                # Note that this 'else' is part of the 'for and not of the 'if'
-                # inside the 'for'
-                funcUpdateNotFound(localFile)
-                filesToAdd.append(localFile)
-
-        return serverFiles + filesToAdd
+    def mergeFiles(
+        self, serverFiles, localFiles, funcUpdateFound, funcUpdateNotFound, path
+    ):
+        # on a file system that ignores case, a server file that differs in
+        # case only is the same file as the local one
+        return merge_listings(
+            serverFiles,
+            localFiles,
+            funcUpdateFound,
+            funcUpdateNotFound,
+            ignoreCase=is_case_insensitive(path),
+        )
 
     def refreshModel(self, firstCall=True):
         """Refresh the model in terms of file items.
@@ -402,30 +539,152 @@ class ServerWorkspaceModel(WorkspaceModel):
         directories, compare them and update the model with FileItem instances
         that reflect the status of the server and local file system.
 
+        Returns whether the file items changed.
         """
 
-        self.clearModel()
-
+        # a refresh off the GUI thread that is still running is overtaken
+        self.refresher.bump()
         currentDir = self.currentDirectory[-1]
 
         # retrieve the dirs and files from the server
         # the directories are shown first and then the files
+        serverDirDict = self.getServerListing(currentDir)
+        if serverDirDict is None:
+            self.serverListing = None
+            changed = super().refreshModel()
+            self.filesRefreshed.emit(changed)
+            return changed
+
+        self.serverListing = (currentDir["_id"], serverDirDict)
+        localDirs, localFiles = self.getLocalFiles()
+        self.localSnapshot = self.getSnapshot(localDirs, localFiles)
+        changed = self.mergeServerListing(serverDirDict, localDirs, localFiles)
+        self.filesRefreshed.emit(changed)
+
+        # This needs to be disabled unless we maintain our own file administration.
+        # If a file is deleted on the server, the addon will automatically add it to
+        # the server again by means of this call.
+        # if firstCall:
+        #     self.uploadUntrackedFiles()
+        return changed
+
+    def refreshLocal(self, localDirs, localFiles):
+        """Reconcile a local change with the server listing last retrieved.
+
+        The server is asked only if there is no listing of the directory, for
+        example because we were offline, in which case whether the file items
+        changed is not known yet.  Changes on the server are picked up by the
+        periodic refresh.
+        """
+        if (
+            self.serverListing is None
+            or self.serverListing[0] != self.currentDirectory[-1]["_id"]
+        ):
+            self.refreshModelAsync()
+            return None
+        # the local items of a refresh that is still running may be outdated
+        self.refresher.bump()
+        changed = self.mergeServerListing(self.serverListing[1], localDirs, localFiles)
+        self.filesRefreshed.emit(changed)
+        return changed
+
+    def getServerListing(self, currentDir):
+        """Retrieve the listing of a server directory, like getDirectory.
+
+        The listing is stored in the sync state.  While disconnected, the
+        stored listing is returned instead, so that the files are shown
+        with their status as last known.  Returns None if there is no
+        listing.  Safe to call off the GUI thread.
+        """
+        if currentDir["_id"] is None:
+            # created while offline
+            return None
         serverDirDict = None
-        serverDirs = None
-        serverFiles = None
 
         def tryGetServerInfo():
             nonlocal serverDirDict
-            nonlocal serverDirs
-            nonlocal serverFiles
             serverDirDict = self.apiClient.getDirectory(currentDir["_id"])
-            serverDirs = self.getServerDirs(serverDirDict["directories"])
-            serverFiles = self.getServerFiles(serverDirDict["files"])
 
         api_result = fancy_handle(tryGetServerInfo)
-        if api_result != APICallResult.OK:
-            super().refreshModel()
+        if api_result == APICallResult.OK:
+            self.syncState.store_listing(currentDir["_id"], serverDirDict)
+            return serverDirDict
+        if api_result == APICallResult.DISCONNECTED:
+            return self.syncState.load_listing(currentDir["_id"])
+        return None
+
+    def refreshModelAsync(self):
+        """Refresh the model like refreshModel(), but off the GUI thread.
+
+        The server and local listings are retrieved and merged on a worker
+        thread.  applyRefresh() updates the model with the result on the GUI
+        thread, unless the model was refreshed or the user navigated
+        elsewhere meanwhile.  The main thread time saved is available from
+        the Python console:
+
+            WorkspaceView.wsv.currentWorkspaceModel.refresher.get_stats()
+        """
+        currentDir = self.currentDirectory[-1]
+        subPath = self.subPath
+        path = self.getFullPath()
+
+        def listDirectory():
+            serverDirDict = self.getServerListing(currentDir)
+            localDirs, localFiles = self.scanLocalFiles(path)
+            snapshot = self.getSnapshot(localDirs, localFiles)
+            if serverDirDict is None:
+                return None, snapshot, self.sortFiles(localDirs, localFiles)
+            files = self.reconcileListings(
+                serverDirDict, localDirs, localFiles, currentDir, path, subPath
+            )
+            return (currentDir["_id"], serverDirDict), snapshot, files
+
+        self.refresher.start(listDirectory)
+
+    def applyRefresh(self, generation, result, error):
+        if not self.refresher.is_current(generation):
+            logger.debug("Dropped the result of an overtaken refresh")
             return
+        if error is not None:
+            logger.error(f"Failed to refresh the files: {error}")
+            return
+        with self.refresher.applying():
+            self.serverListing, self.localSnapshot, files = result
+            changed = self.setFiles(files)
+        self.filesRefreshed.emit(changed)
+
+    def showDirectory(self):
+        """Show the directory navigated to, of which the files follow."""
+        self.setFiles([])
+        self.refreshModelAsync()
+
+    def mergeServerListing(self, serverDirDict, localDirs, localFiles):
+        """Update the model from a server and a local listing.
+
+        Returns whether the file items changed.
+        """
+        return self.setFiles(
+            self.reconcileListings(
+                serverDirDict,
+                localDirs,
+                localFiles,
+                self.currentDirectory[-1],
+                self.getFullPath(),
+                self.subPath,
+            )
+        )
+
+    def reconcileListings(
+        self, serverDirDict, localDirs, localFiles, currentDir, path, subPath
+    ):
+        """Merge a server and a local listing of path into sorted file items.
+
+        The items get the status of the server and local file system.  Does
+        not touch the model, so it may run off the GUI thread.
+        """
+        serverDirs = self.getServerDirs(serverDirDict["directories"], currentDir)
+        serverFiles = self.getServerFiles(serverDirDict["files"], path)
+        synced = self.syncState.get_synced(subPath)
 
         def updateDirFound(serverFileItem, localFileItem):
             pass
@@ -434,6 +693,24 @@ class ServerWorkspaceModel(WorkspaceModel):
             pass
 
         def updateFileFound(serverFileItem, localFileItem):
+            record = synced.get(localFileItem.name)
+            if record is not None:
+                # which side changed since the file was last downloaded or
+                # uploaded, which tells more than the dates, e.g. after
+                # making an older version active
+                versionId = serverFileItem.serverFileDict["currentVersion"]["_id"]
+                serverChanged = versionId != record["versionId"]
+                localChanged = localFileItem.updatedAt != record["localUpdatedAt"]
+                if not serverChanged and not localChanged:
+                    serverFileItem.status = FileStatus.SYNCED
+                    return
+                elif serverChanged and not localChanged:
+                    serverFileItem.status = FileStatus.LOCAL_COPY_OUTDATED
+                    return
+                elif localChanged and not serverChanged:
+                    serverFileItem.status = FileStatus.SERVER_COPY_OUTDATED
+                    return
+                # both changed, compare the dates
             serverDate = serverFileItem.updatedAt
             localDate = localFileItem.updatedAt
             if serverDate < localDate:
@@ -454,21 +731,13 @@ class ServerWorkspaceModel(WorkspaceModel):
         def updateFileNotFound(localFileItem):
             localFileItem.status = FileStatus.UNTRACKED
 
-        localDirs, localFiles = self.getLocalFiles()
-        dirs = self.mergeFiles(serverDirs, localDirs, updateDirFound, updateDirNotFound)
+        dirs = self.mergeFiles(
+            serverDirs, localDirs, updateDirFound, updateDirNotFound, path
+        )
         files = self.mergeFiles(
-            serverFiles, localFiles, updateFileFound, updateFileNotFound
+            serverFiles, localFiles, updateFileFound, updateFileNotFound, path
         )
-
-        self.beginResetModel()
-        self.files = self.sortFiles(dirs, files)
-        self.endResetModel()
-
-        # This needs to be disabled unless we maintain our own file administration.
-        # If a file is deleted on the server, the addon will automatically add it to
-        # the server again by means of this call.
-        # if firstCall:
-        #     self.uploadUntrackedFiles()
+        return self.sortFiles(dirs, files)
 
     def data(self, index, role=Qt.DisplayRole):
         if not index.isValid():
@@ -500,7 +769,7 @@ class ServerWorkspaceModel(WorkspaceModel):
             ):
                 thumbnailUrl = file_item.serverFileDict["thumbnailUrlCache"]
                 try:
-                    response = requests.get(thumbnailUrl)
+                    response = self.apiClient.sessions.get(thumbnailUrl)
                     image_data = response.content
                     pixmap = QPixmap()
                     pixmap.loadFromData(image_data)
@@ -521,18 +790,24 @@ class ServerWorkspaceModel(WorkspaceModel):
 
     def openDirectory(self, index):
         file_item = self.files[index.row()]
-        self.subPath = Utils.joinPath(self.subPath, file_item.name)
         # push the directory to the stack
         if file_item.serverFileDict.get("_id"):
             # the server knows about this directory
             self.currentDirectory.append(file_item.serverFileDict)
         else:
-            # the server needs to know about this directory
+            # the server needs to know about this directory, create it while
+            # the parent is the current directory
             id = None
-            fancy_handle(lambda: self.createDir(file_item.name))
+
+            def tryCreateDir():
+                nonlocal id
+                id = self.createDir(file_item.name)
+
+            fancy_handle(tryCreateDir)
             # ignore the result
             self.currentDirectory.append({"_id": id, "name": file_item.name})
-        self.refreshModel()
+        self.subPath = Utils.joinPath(self.subPath, file_item.name)
+        self.showDirectory()
 
     def _isEmptyDirectoryOnServer(self, index):
         # throws an APIClientException
@@ -579,12 +854,15 @@ class ServerWorkspaceModel(WorkspaceModel):
             if api_result == APICallResult.OK:
                 pass
             elif api_result == APICallResult.DISCONNECTED:
-                logger.warn("Disconnected. Could not delete directory on the server.")
+                self.queueDeleteDir(fileItem.name)
             elif api_result == APICallResult.NOT_LOGGED_IN:
                 logger.warn("Not logged in. Could not delete directory on the server.")
                 pass
             else:
                 raise Exception("Unknown API result")
+        elif not self.apiClient.is_connected() and self.apiClient.is_logged_in():
+            # while offline we cannot tell whether the server has it
+            self.queueDeleteDir(fileItem.name)
         else:
             logger.debug(f"Dir {fileItem.name} is not on the server.")
         self.refreshModel()
@@ -618,14 +896,15 @@ class ServerWorkspaceModel(WorkspaceModel):
         # we may be disconnected
         return None
 
-    def downloadFile(self, fileItem):
+    def downloadFile(self, fileItem, progress=None):
         # This will download the current (active) version.
         # Throws an APIClientException
         currentVersion = fileItem.serverFileDict["currentVersion"]
-        self.downloadVersion(fileItem, currentVersion)
+        self.downloadVersion(fileItem, currentVersion, progress)
 
-    def downloadVersion(self, fileItem, version):
+    def downloadVersion(self, fileItem, version, progress=None):
         # This will download a specific version
+        # progress is called as progress(bytes_done, bytes_total)
         if fileItem.is_folder:
             logger.warn("Download of folders not supported yet.")
             self.refreshModel()
@@ -636,13 +915,19 @@ class ServerWorkspaceModel(WorkspaceModel):
 
             def tryDownload():
                 self.apiClient.downloadFileFromServer(
-                    version["uniqueFileName"], file_path
+                    version["uniqueFileName"], file_path, progress
                 )
                 updatedAt, createdAt = VersionModel.getVersionDateTime(version)
                 Utils.setFileModificationTimes(file_path, updatedAt, createdAt)
 
-            fancy_handle(tryDownload)
-            # discard the result
+            if fancy_handle(tryDownload) == APICallResult.OK:
+                self.syncState.record_synced(
+                    self.subPath,
+                    fileItem.name,
+                    fileItem.serverFileDict["_id"],
+                    version["_id"],
+                    Utils.getFileUpdatedAt(file_path),
+                )
             self.refreshModel()
             return True
 
@@ -664,14 +949,47 @@ class ServerWorkspaceModel(WorkspaceModel):
             self.refreshModel(False)
 
     def upload(
-        self, fileName, fileId=None, message="Update from the Ondsel Lens addon"
+        self,
+        fileName,
+        fileId=None,
+        message="Update from the Ondsel Lens addon",
+        progress=None,
     ):
-        # unique file name is always generated even if file is already on the
-        # server under another uniqueFileName.  fileId is only used for updates
+        # a unique file name is generated, but if the content is already on
+        # the server, the uniqueFileName of that upload is reused.  fileId is
+        # only used for updates
 
-        # raises APIClientException
+        # raises APIClientException, except when offline: then the upload is
+        # queued
 
         file_path = Utils.joinPath(self.getFullPath(), fileName)
+        try:
+            if Utils.is_freecad_document(fileName):
+                self.checkUploadLinks(file_path)
+
+            logger.info(f"Uploading file {fileName}")
+            fileUpdateDate = Utils.getFileUpdatedAt(file_path)
+
+            # the content may already be on the server under another unique name
+            uniqueName = self.apiClient.uploadFileContent(
+                self.generateUniqueName(), file_path, progress
+            )
+
+            currentDir = self.currentDirectory[-1]
+            self.commitUpload(
+                fileName, fileUpdateDate, uniqueName, currentDir, fileId, message
+            )
+        except APIClient.APIClientOfflineException:
+            self.queueUpload(fileName, fileId, message)
+
+    def generateUniqueName(self):
+        return f"{str(uuid.uuid4())}.fcstd"  # TODO replace .fcstd by {extension}
+
+    def checkUploadLinks(self, file_path):
+        """Raise if a solo user uploads a document with links.
+
+        Only for FreeCAD documents: other files are not zip archives.
+        """
         if (
             check_links.find_paths_links_file(file_path)
             and self.apiClient.is_user_solo()
@@ -681,15 +999,21 @@ class ServerWorkspaceModel(WorkspaceModel):
                 "single-document files are supported in your current lens account. "
             )
 
-        logger.info(f"Uploading file {fileName}")
-        base, extension = os.path.splitext(fileName)
-        uniqueName = f"{str(uuid.uuid4())}.fcstd"  # TODO replace .fcstd by {extension}
-
-        fileUpdateDate = Utils.getFileUpdatedAt(file_path)
-
-        self.apiClient.uploadFileToServer(uniqueName, file_path)
+    def commitUpload(
+        self,
+        fileName,
+        fileUpdateDate,
+        uniqueName,
+        currentDir,
+        fileId=None,
+        message="Update from the Ondsel Lens addon",
+        subPath=None,
+    ):
+        """Create the file (and model) or a new version for an uploaded blob.
 
-        currentDir = self.currentDirectory[-1]
+        The file is in subPath, by default the current directory.
+        """
+        base, extension = os.path.splitext(fileName)
         workspace = self.summarizeWorkspace()
 
         if fileId:
@@ -711,11 +1035,106 @@ class ServerWorkspaceModel(WorkspaceModel):
             if extension.lower() in [".fcstd", ".obj", ".step", ".stp"]:
                 # TODO: This creates a file in the root directory as well
                 self.apiClient.createModel(fileId)
+        self.recordUploaded(
+            self.subPath if subPath is None else subPath,
+            fileName,
+            fileId,
+            result.get("currentVersionId") if result else None,
+            fileUpdateDate,
+        )
+
+    def recordUploaded(self, subPath, fileName, fileId, versionId, fileUpdateDate):
+        """Record in the sync state that a file is uploaded as versionId."""
+        if versionId is None:
+            self.syncState.forget_synced(subPath, fileName)
+            return
+        filePath = Utils.joinPath(self.path, Utils.joinPath(subPath, fileName))
+        uploadIndex = self.apiClient.upload_index
+        digest = None
+        if uploadIndex and Utils.getFileUpdatedAt(filePath) == fileUpdateDate:
+            # hashed for the upload already
+            digest = uploadIndex.hash(filePath)
+        self.syncState.record_synced(
+            subPath, fileName, fileId, versionId, fileUpdateDate, digest
+        )
+
+    def bulkUpload(self, sourcePaths, on_status=None, on_finished=None):
+        """Copy files into the current directory and upload them.
+
+        The files go through a pipeline of stages with their own worker pools:
+        copying and hashing, checking links, uploading the blob, and creating
+        the file and model.  The files and models are created one at a time
+        because the server adds them to the same directory.
+
+        Returns the started pipeline; the callbacks are called from its worker
+        threads (see transport.pipeline).
+        """
+        fullPath = self.getFullPath()
+        subPath = self.subPath
+        currentDir = self.currentDirectory[-1]
+        uploadIndex = self.apiClient.upload_index
+
+        def scan(job):
+            path = Utils.joinPath(fullPath, job.name)
+            try:
+                shutil.copy(job.data["source"], path)
+            except shutil.SameFileError:
+                pass
+            job.data["path"] = path
+            job.data["fileUpdateDate"] = Utils.getFileUpdatedAt(path)
+            job.size = os.path.getsize(path)
+            if uploadIndex:
+                # overlaps hashing with the uploads of other files
+                uploadIndex.hash(path)
+
+        def checkLinks(job):
+            # other files have no links
+            if Utils.is_freecad_document(job.name):
+                self.checkUploadLinks(job.data["path"])
+
+        def uploadBlob(job):
+            try:
+                job.data["uniqueName"] = self.apiClient.uploadFileContent(
+                    self.generateUniqueName(), job.data["path"]
+                )
+            except APIClient.APIClientOfflineException:
+                self.queueUpload(job.name, subPath=subPath)
+                job.data["queued"] = True
+
+        def commit(job):
+            if job.data.get("queued"):
+                return
+            try:
+                self.commitUpload(
+                    job.name,
+                    job.data["fileUpdateDate"],
+                    job.data["uniqueName"],
+                    currentDir,
+                    subPath=subPath,
+                )
+            except APIClient.APIClientOfflineException:
+                self.queueUpload(job.name, subPath=subPath)
+
+        stages = [
+            Stage("scan", scan, workers=2),
+            Stage("check", checkLinks, workers=2),
+            Stage("upload", uploadBlob, workers=UPLOAD_WORKERS),
+            Stage("commit", commit, workers=1),
+        ]
+        def finished(summary):
+            if uploadIndex:
+                # the hashes and blobs of the batch
+                uploadIndex.flush()
+            if on_finished:
+                on_finished(summary)
+
+        jobs = [Job(os.path.basename(path), source=path) for path in sourcePaths]
+        return Pipeline(stages, on_status, finished).start(jobs)
 
     def openParentFolder(self):
         self.subPath = os.path.dirname(self.subPath)
         self.currentDirectory.pop()
-        self.refreshModel()
+        self.showDirectory()
 
     def getFileNames(self):
         # raises an APIClientException
@@ -731,17 +1150,253 @@ class ServerWorkspaceModel(WorkspaceModel):
         return {k: self.workspace[k] for k in ("_id", "name", "refName", "open")}
 
     def createDir(self, nameDirectory):
-        # raises an APIClientException
+        # raises an APIClientException, except when offline: then the
+        # directory is created locally and on the server later on.
         currentDir = self.currentDirectory[-1]
         workspace = self.summarizeWorkspace()
+        try:
+            result = self.apiClient.createDirectory(
+                nameDirectory,
+                currentDir["_id"],
+                currentDir["name"],
+                workspace,
+            )
+        except APIClient.APIClientOfflineException:
+            super().createDir(nameDirectory)
+            self.queueCreateDir(nameDirectory)
+            return None
+
+        return result["_id"]
+
+    def setVersionActive(self, fileId, versionId):
+        """Make a version the active one.
+
+        Returns False if we are offline and the change is queued.
+        """
+        try:
+            self.apiClient.setVersionActive(fileId, versionId)
+            return True
+        except APIClient.APIClientOfflineException:
+            self.pendingChanges.add(
+                "setVersionActive",
+                f"version:{fileId}",
+                fileId=fileId,
+                versionId=versionId,
+            )
+            logger.info("Offline: making the version active is queued")
+            return False
+
+    # ####
+    # Changes made while offline
+    # ####
+
+    def queueUpload(self, fileName, fileId=None, message=None, subPath=None):
+        """Queue the upload of a file in the current directory or subPath.
+
+        The upload takes the content of the file when it is replayed, so an
+        earlier queued upload of the same file is replaced.
+        """
+        path = Utils.joinPath(self.subPath if subPath is None else subPath, fileName)
+        key = f"upload:{path}"
+        baseVersion = None
+        if fileId:
+            fileItem = self.getFileItemFileId(fileId)
+            if fileItem:
+                baseVersion = fileItem.serverFileDict["currentVersion"][
+                    "uniqueFileName"
+                ]
+        since = int(time.time() * 1000)
+        messages = [message] if message else []
+
+        pending = self.pendingChanges.get(key)
+        if pending:
+            # the change is relative to the server version before the first
+            # queued upload
+            args = pending["args"]
+            fileId = args["fileId"] or fileId
+            baseVersion = args["baseVersion"] or baseVersion
+            since = args["since"]
+            if args["message"] and args["message"] not in messages:
+                messages.insert(0, args["message"])
+
+        self.pendingChanges.add(
+            "upload",
+            key,
+            path=path,
+            fileId=fileId,
+            baseVersion=baseVersion,
+            since=since,
+            message="\n".join(messages) or None,
+        )
+        logger.info(f"Offline: the upload of {fileName} is queued")
+
+    def queueCreateDir(self, nameDirectory):
+        path = Utils.joinPath(self.subPath, nameDirectory)
+        self.pendingChanges.add("createDir", f"dir:{path}", path=path)
+        logger.info(f"Offline: creating directory {nameDirectory} is queued")
+
+    def queueDeleteDir(self, nameDirectory):
+        path = Utils.joinPath(self.subPath, nameDirectory)
+        # the changes within the directory are moot
+        self.pendingChanges.cancel(
+            lambda entry: entry["args"].get("path", "").startswith(path + "/")
+        )
+        # replaces a queued creation of the directory
+        self.pendingChanges.add("deleteDirectory", f"dir:{path}", path=path)
+        logger.info(f"Offline: deleting directory {nameDirectory} is queued")
+
+    def replayPendingChanges(self, on_finished=None):
+        """Apply the changes made while offline in a background thread.
+
+        on_finished(summary) is called from that thread, see
+        MutationQueue.replay().  Returns whether there are changes to apply.
+        """
+        if not len(self.pendingChanges):
+            return False
+
+        def replay():
+            logger.info(
+                f"Applying {len(self.pendingChanges)} changes made while offline"
+            )
+            summary = self.pendingChanges.replay(self.applyPendingChange)
+            if summary is not None and on_finished:
+                on_finished(summary)
+
+        threading.Thread(
+            target=tag_caller("replay", replay), name="PendingChanges", daemon=True
+        ).start()
+        return True
+
+    def applyPendingChange(self, entry, batch):
+        """Apply a queued change, raising a MutationConflict if impossible.
+
+        Being offline again, a failing connection or a failing login stops
+        the replay, keeping the change for the next replay.  The
+        changes are idempotent because a change may be replayed twice after a
+        crash.
+        """
+        args = entry["args"]
+        try:
+            if entry["op"] == "upload":
+                self._replayUpload(args, batch)
+            elif entry["op"] == "createDir":
+                self._replayCreateDir(args, batch)
+            elif entry["op"] == "deleteDirectory":
+                self._replayDeleteDir(args, batch)
+            elif entry["op"] == "setVersionActive":
+                self.apiClient.setVersionActive(args["fileId"], args["versionId"])
+            else:
+                raise MutationConflict(f"Unknown change {entry['op']}")
+        except (
+            APIClient.APIClientOfflineException,
+            APIClient.APIClientConnectionError,
+            APIClient.APIClientLoggedOutException,
+            APIClient.APIClientAuthenticationException,
+        ):
+            raise
+        except APIClient.APIClientException as e:
+            raise MutationConflict(f"{entry['op']} {args.get('path', '')}: {e}")
+
+    def _getServerDirectory(self, dirId, batch):
+        listings = batch.setdefault("listings", {})
+        if dirId not in listings:
+            listings[dirId] = self.apiClient.getDirectory(dirId)
+        return listings[dirId]
+
+    def _findServerDirectory(self, path, batch):
+        """Return the server directory at a path in the workspace or None."""
+        dirs = batch.setdefault("dirs", {"": self.workspace["rootDirectory"]})
+        if path not in dirs:
+            parentPath, _, name = path.rpartition("/")
+            parent = self._findServerDirectory(parentPath, batch)
+            dirs[path] = None
+            if parent is not None:
+                for dirDict in self._getServerDirectory(parent["_id"], batch)[
+                    "directories"
+                ]:
+                    if dirDict["name"] == name:
+                        dirs[path] = dirDict
+        return dirs[path]
+
+    def _replayCreateDir(self, args, batch):
+        path = args["path"]
+        if self._findServerDirectory(path, batch) is not None:
+            return
+        parentPath, _, name = path.rpartition("/")
+        parent = self._findServerDirectory(parentPath, batch)
+        if parent is None:
+            raise MutationConflict(f"The parent of directory {path} is deleted")
         result = self.apiClient.createDirectory(
-            nameDirectory,
-            currentDir["_id"],
-            currentDir["name"],
-            workspace,
+            name, parent["_id"], parent["name"], self.summarizeWorkspace()
         )
+        batch["dirs"][path] = result
 
-        return result["_id"]
+    def _replayDeleteDir(self, args, batch):
+        path = args["path"]
+        dirDict = self._findServerDirectory(path, batch)
+        if dirDict is None:
+            return
+        serverDir = self._getServerDirectory(dirDict["_id"], batch)
+        if serverDir["files"] or serverDir["directories"]:
+            raise MutationConflict(f"Directory {path} is not empty on the server")
+        try:
+            self.apiClient.deleteDirectory(dirDict["_id"])
+        except APIClient.APIClientNotFoundException:
+            pass
+        batch["dirs"][path] = None
+
+    def _replayUpload(self, args, batch):
+        path = args["path"]
+        filePath = Utils.joinPath(self.path, path)
+        if not os.path.isfile(filePath):
+            raise MutationConflict(f"File {path} no longer exists")
+        dirPath, _, fileName = path.rpartition("/")
+        directory = self._findServerDirectory(dirPath, batch)
+        if directory is None:
+            raise MutationConflict(f"The directory of {path} is deleted")
+
+        fileId = args["fileId"]
+        serverFile = None
+        for fileDict in self._getServerDirectory(directory["_id"], batch)["files"]:
+            if fileDict["custFileName"] == fileName:
+                serverFile = fileDict
+        if serverFile:
+            currentVersion = serverFile["currentVersion"]
+            if currentVersion["uniqueFileName"] == self.apiClient.findUploadedContent(
+                filePath
+            ):
+                # replayed before
+                return
+            if args["baseVersion"]:
+                changed = currentVersion["uniqueFileName"] != args["baseVersion"]
+            else:
+                changed = currentVersion["createdAt"] > args["since"]
+            if changed:
+                raise MutationConflict(f"File {path} changed on the server")
+            fileId = serverFile["_id"]
+        elif fileId:
+            raise MutationConflict(f"File {path} is deleted on the server")
+
+        if Utils.is_freecad_document(filePath):
+            self.checkUploadLinks(filePath)
+        fileUpdateDate = Utils.getFileUpdatedAt(filePath)
+        uniqueName = self.apiClient.uploadFileContent(
+            self.generateUniqueName(), filePath
+        )
+        if fileId:
+            self.commitUpload(
+                fileName,
+                fileUpdateDate,
+                uniqueName,
+                directory,
+                fileId,
+                args["message"] or "Update from the Ondsel Lens addon",
+                subPath=dirPath,
+            )
+        else:
+            self.commitUpload(
+                fileName, fileUpdateDate, uniqueName, directory, subPath=dirPath
+            )
 
 
 class FileItem:
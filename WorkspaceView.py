@@ -48,6 +48,7 @@ from APIClient import (
     APIClient,
     APIClientException,
     APIClientAuthenticationException,
+    APIClientCanceledException,
     ConnStatus,
     APICallResult,
     fancy_handle,
@@ -64,6 +65,9 @@ from views.public_shares_view import PublicSharesView
 from views.search_results_view import SearchResultsView
 
 from components.choose_download_action_dialog import ChooseDownloadActionDialog
+from components.transfer_progress_dialog import TransferProgressDialog
+from transport.pipeline import JobStatus
+from sync_scheduler import SyncScheduler
 
 from PySide.QtGui import (
     QStyledItemDelegate,
@@ -105,8 +109,14 @@ IDX_TAB_SEARCH = 3
 IDX_TAB_PUBLIC_SHARES = 4
 
 PATH_BOOKMARKS = Utils.joinPath(CACHE_PATH, "bookmarks")
-
-INTERVAL_TIMER_MS = 60000
+PATH_RESPONSE_CACHE = Utils.joinPath(CACHE_PATH, "responses")
+PATH_UPLOAD_INDEX = Utils.joinPath(CACHE_PATH, "uploads.json")
+
+# The refresh intervals of the workspaces and of the files of a workspace in
+# seconds.  They adapt to how often the refreshes find changes.
+INTERVAL_REFRESH_S = 60
+MIN_INTERVAL_REFRESH_S = 15
+MAX_INTERVAL_REFRESH_S = 600
 INTERVAL_TOOLBAR_TIMER_MS = 500
 
 p = Utils.get_param_group()
@@ -327,9 +337,27 @@ class BookmarkDelegate(QStyledItemDelegate):
 
 
 class WorkspaceView(QtWidgets.QScrollArea):
+    # emitted by the APIClient, possibly from another thread
+    connectionStatusChanged = QtCore.Signal()
+    # emitted by the APIClient when the access token is refreshed
+    tokenRefreshed = QtCore.Signal()
+    # emitted by the bulk upload pipeline from its worker threads
+    bulkUploadStatusChanged = QtCore.Signal(str, object, object, object)
+    bulkUploadFinished = QtCore.Signal(object, object)
+    # emitted when the changes made while offline have been replayed
+    pendingChangesReplayed = QtCore.Signal(object, object)
 
     def __init__(self, mw):
         super(WorkspaceView, self).__init__(mw)
+        self.connectionStatusChanged.connect(self.set_ui_connectionStatus)
+        self.connectionStatusChanged.connect(self.replayPendingChanges)
+        self.pendingChangesReplayed.connect(self.finishPendingChanges)
+        self.tokenRefreshed.connect(self.token_refreshed_handler)
+        self.bulkUploadStatusChanged.connect(self.showBulkUploadStatus)
+        self.bulkUploadFinished.connect(self.finishBulkUpload)
+        self.bulkUpload = None
+        # all periodic refreshes
+        self.scheduler = SyncScheduler(self)
 
         self.current_workspace = None
         self.currentWorkspaceModel = None
@@ -373,6 +401,9 @@ class WorkspaceView(QtWidgets.QScrollArea):
         )
         self.workspacesModel.rowsInserted.connect(self.switchView)
         self.workspacesModel.rowsRemoved.connect(self.switchView)
+        self.workspacesModel.workspacesRefreshed.connect(
+            lambda changed: self.scheduler.record_change("workspaces", changed)
+        )
 
         self.filesDelegate = FileListDelegate(self)
         self.form.fileList.setItemDelegate(self.filesDelegate)
@@ -457,11 +488,8 @@ class WorkspaceView(QtWidgets.QScrollArea):
 
             self.workspacesModel.refreshModel()
 
-        # Set a timer to check regularly the server
-        self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(self.timerTick)
-        self.timer.setInterval(INTERVAL_TIMER_MS)
-        self.timer.start()
+        # check regularly the server
+        self.scheduleRefresh("workspaces", self.refreshWorkspaces)
 
         self.handle_request(self.check_for_update)
 
@@ -647,6 +675,8 @@ class WorkspaceView(QtWidgets.QScrollArea):
             Utils.get_version_source_api_request(),
             None,
             None,
+            cache_path=PATH_RESPONSE_CACHE,
+            upload_index_path=PATH_UPLOAD_INDEX,
         )
 
     def get_login_data(self):
@@ -677,6 +707,8 @@ class WorkspaceView(QtWidgets.QScrollArea):
                     Utils.get_version_source_api_request(),
                     access_token,
                     user,
+                    cache_path=PATH_RESPONSE_CACHE,
+                    upload_index_path=PATH_UPLOAD_INDEX,
                 )
                 # do not forget to set the API for the workspacesModel
                 self.workspacesModel.set_api(self.api)
@@ -684,9 +716,6 @@ class WorkspaceView(QtWidgets.QScrollArea):
                 # Set a timer to logout when token expires.
                 # we know that the token is not expired
                 self.set_token_expiration_timer(access_token)
-
-                # verify the status
-                self.api.getStatus()
         self.set_ui_connectionStatus()
 
     def login_btn_clicked(self):
@@ -704,6 +733,8 @@ class WorkspaceView(QtWidgets.QScrollArea):
                         Utils.env.lens_url,
                         Utils.get_source_api_request(),
                         Utils.get_version_source_api_request(),
+                        cache_path=PATH_RESPONSE_CACHE,
+                        upload_index_path=PATH_UPLOAD_INDEX,
                     )
                     self.set_ui_connectionStatus()
                     # do not forget to set the API for the workspacesModel
@@ -759,9 +790,10 @@ class WorkspaceView(QtWidgets.QScrollArea):
         self.hideBookmarks()
 
         if p.GetBool("clearCache", False):
+            # the model keeps files in the cache open
+            self.closeWorkspaceModel()
             shutil.rmtree(CACHE_PATH)
             self.current_workspace = None
-            self.currentWorkspaceModel = None
             self.form.fileList.setModel(None)
             self.workspacesModel.removeWorkspaces()
             self.switchView()
@@ -785,6 +817,9 @@ class WorkspaceView(QtWidgets.QScrollArea):
 
             time_difference = expiration_time - current_time
             interval_milliseconds = max(0, time_difference.total_seconds() * 1000)
+            if getattr(self, "token_timer", None):
+                # the token has been refreshed
+                self.token_timer.stop()
             if interval_milliseconds < MAX_INT32:
                 # Create a QTimer that triggers only once when the token is expired
                 self.token_timer = QtCore.QTimer()
@@ -797,6 +832,16 @@ class WorkspaceView(QtWidgets.QScrollArea):
             self.set_ui_connectionStatus()
             logger.error(e)
 
+    def token_refreshed_handler(self):
+        if self.api is None or self.api.access_token is None:
+            return
+        loginData = {
+            "accessToken": self.api.access_token,
+            "user": self.api.user,
+        }
+        p.SetString("loginData", json.dumps(loginData))
+        self.set_token_expiration_timer(self.api.access_token)
+
     def token_expired_handler(self):
         QMessageBox.information(
             None,
@@ -891,12 +936,63 @@ class WorkspaceView(QtWidgets.QScrollArea):
             self.setWorkspaceModel()
 
     def setWorkspaceModel(self):
+        self.closeWorkspaceModel()
         self.currentWorkspaceModel = ServerWorkspaceModel(
             self.current_workspace, apiClient=self.api
         )
+        # replaces the refresh of the previous model
+        wsm = self.currentWorkspaceModel
+        self.scheduleRefresh("files", lambda: self.refreshFiles(wsm))
+        # every refresh of the files adapts the interval, including those
+        # that complete later and those after an upload
+        wsm.filesRefreshed.connect(
+            lambda changed: self.scheduler.record_change("files", changed)
+        )
         self.setWorkspaceNameLabel()
         self.form.fileList.setModel(self.currentWorkspaceModel)
         self.switchView()
+        self.replayPendingChanges()
+
+    def closeWorkspaceModel(self):
+        """Stop the refreshes of the current workspace model and release it."""
+        self.scheduler.remove("files")
+        if self.currentWorkspaceModel is not None:
+            self.currentWorkspaceModel.close()
+            self.currentWorkspaceModel = None
+
+    def replayPendingChanges(self):
+        """Apply the changes made offline in the current workspace, if online."""
+        wsm = self.currentWorkspaceModel
+        if wsm is None or not self.is_connected():
+            return
+        wsm.replayPendingChanges(
+            lambda summary: self.pendingChangesReplayed.emit(wsm, summary)
+        )
+
+    def finishPendingChanges(self, wsm, summary):
+        logger.info(
+            f"Applied {summary['applied']} changes made while offline, "
+            f"{len(summary['conflicts'])} conflicts"
+        )
+        if summary["error"] is not None:
+            logger.warning(
+                f"Stopped applying the changes made while offline: "
+                f"{summary['error']}. {summary['remaining']} changes remain queued."
+            )
+        if wsm is self.currentWorkspaceModel:
+            self.handle_api_call(wsm.refreshModel, "Failed to refresh the files.")
+        if summary["conflicts"]:
+            for _, reason in summary["conflicts"]:
+                logger.error(f"Not applied: {reason}")
+            reasons = "".join(
+                f"<li>{reason}</li>" for _, reason in summary["conflicts"]
+            )
+            QtGui.QMessageBox.warning(
+                None,
+                "Conflicts",
+                "The following changes made while offline could not be applied:"
+                f"<ul>{reasons}</ul>The local files are left as they are.",
+            )
 
     def leaveWorkspace(self):
         if self.current_workspace is None:
@@ -905,7 +1001,7 @@ class WorkspaceView(QtWidgets.QScrollArea):
         # self.synchronizeAction.setVisible(False)
         # self.synchronizeAction.triggered.disconnect()
         self.current_workspace = None
-        self.currentWorkspaceModel = None
+        self.closeWorkspaceModel()
         self.form.fileList.setModel(None)
         self.workspacesModel.refreshModel()
         self.switchView()
@@ -1039,7 +1135,7 @@ class WorkspaceView(QtWidgets.QScrollArea):
         else:
             pathFile = Utils.joinPath(wsm.getFullPath(), fileItem.name)
             if not os.path.isfile(pathFile):
-                wsm.downloadFile(fileItem)
+                self.downloadWithProgress(fileItem, wsm.downloadFile)
                 # wsm has refreshed
             self.tryOpenPathFile(pathFile)
 
@@ -1106,7 +1202,12 @@ class WorkspaceView(QtWidgets.QScrollArea):
                 wsm.refreshModel()
                 return False
 
-        return wsm.downloadVersion(fileItem, version)
+        return self.downloadWithProgress(fileItem, wsm.downloadVersion, version)
+
+    def downloadWithProgress(self, fileItem, downloadFunc, *args):
+        """Call a download function of the workspace model with a progress dialog."""
+        with TransferProgressDialog(f"Downloading {fileItem.name}", self) as dialog:
+            return downloadFunc(fileItem, *args, progress=dialog.progress)
 
     def downloadVersion(self, fileItem, version):
         """Download a version.
@@ -1119,7 +1220,7 @@ class WorkspaceView(QtWidgets.QScrollArea):
 
         # if the current file is already a version, then simply download
         if versionModel.getOnDiskVersionId(fileItem):
-            return wsm.downloadVersion(fileItem, version)
+            return self.downloadWithProgress(fileItem, wsm.downloadVersion, version)
         else:
             return self.downloadVersionConfirm(fileItem, version)
 
@@ -1147,7 +1248,7 @@ class WorkspaceView(QtWidgets.QScrollArea):
             logger.info("This file is already in sync")
             wsm.refreshModel()
             return
-        wsm.downloadFile(fileItem)
+        self.downloadWithProgress(fileItem, wsm.downloadFile)
         if Utils.isOpenableByFreeCAD(fileItem.getPath()):
             self.updateThumbnail(fileItem)
 
@@ -1425,7 +1526,11 @@ class WorkspaceView(QtWidgets.QScrollArea):
         base, extension = os.path.splitext(pathConfig)
         uniqueName = f"{str(uuid.uuid4())}{extension}"
 
-        self.api.uploadFileToServer(uniqueName, pathConfig)
+        name = os.path.basename(pathConfig)
+        with TransferProgressDialog(
+            f"Uploading {name}", self, cancelable=True
+        ) as dialog:
+            self.api.uploadFileToServer(uniqueName, pathConfig, dialog.progress)
 
         return uniqueName
 
@@ -1449,8 +1554,14 @@ class WorkspaceView(QtWidgets.QScrollArea):
                 FILENAME_SYS_CFG,
             )
 
+        def tryStorePrefsCancelable():
+            try:
+                tryStorePrefs()
+            except APIClientCanceledException:
+                logger.info("Storing preferences canceled")
+
         with wait_cursor():
-            self.handle_api_call(tryStorePrefs, "No preferences stored.")
+            self.handle_api_call(tryStorePrefsCancelable, "No preferences stored.")
 
     def convertParam(self, type, paramGroup, value):
         if type == "FCBool":
@@ -1780,12 +1891,19 @@ class WorkspaceView(QtWidgets.QScrollArea):
         """
 
         wsm = self.currentWorkspaceModel
-        if fileId:
-            # updating an existing version
-            wsm.upload(fileName, fileId, message)
-        else:
-            # initial commit
-            wsm.upload(fileName)
+        try:
+            with TransferProgressDialog(
+                f"Uploading {fileName}", self, cancelable=True
+            ) as dialog:
+                if fileId:
+                    # updating an existing version
+                    wsm.upload(fileName, fileId, message, progress=dialog.progress)
+                else:
+                    # initial commit
+                    wsm.upload(fileName, progress=dialog.progress)
+        except APIClientCanceledException:
+            logger.info(f"Upload of {fileName} canceled")
+            return
         wsm.refreshModel()
         if self.form.versionsComboBox.isVisible():
             model = self.form.versionsComboBox.model()
@@ -2058,7 +2176,10 @@ class WorkspaceView(QtWidgets.QScrollArea):
         wsm = self.currentWorkspaceModel
 
         def trySetVersion():
-            self.api.setVersionActive(fileId, versionId)
+            if not wsm.setVersionActive(fileId, versionId):
+                # queued until we are online again
+                self.refreshModel()
+                return
             # refresh the models
             wsm.refreshModel()
             newFileItem = wsm.getFileItemFileId(fileItem.serverFileDict["_id"])
@@ -2085,8 +2206,42 @@ class WorkspaceView(QtWidgets.QScrollArea):
         else:
             self.workspacesModel.refreshModel()
 
-    def timerTick(self):
-        self.refreshModel()
+    def scheduleRefresh(self, name, func):
+        self.scheduler.add(
+            name,
+            func,
+            INTERVAL_REFRESH_S,
+            MIN_INTERVAL_REFRESH_S,
+            MAX_INTERVAL_REFRESH_S,
+        )
+
+    def refreshWorkspaces(self):
+        """Refresh the workspaces.
+
+        Whether they changed is not known yet, see workspacesRefreshed.
+        """
+        if self.current_workspace is None:
+            self.workspacesModel.refreshModel()
+        return None
+
+    def refreshFiles(self, wsm):
+        """Refresh the files of a workspace model off the GUI thread.
+
+        Whether the files changed is not known yet, see filesRefreshed.
+        """
+        wsm.refreshModelAsync()
+        if not self.is_connected():
+            self.hideLinkVersionDetails()
+        return None
+
+    def showEvent(self, event):
+        # the Lens tab is shown, so refresh again
+        self.scheduler.resume()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.scheduler.pause()
+        super().hideEvent(event)
 
     # ####
     # Adding files and directories
@@ -2141,35 +2296,55 @@ class WorkspaceView(QtWidgets.QScrollArea):
             "All Files (*);;Text Files (*.txt)",
         )
 
-        wsm = self.currentWorkspaceModel
-
-        # copy selected files to destination folder
-        for fileUrl in selectedFiles:
-            fileName = os.path.basename(fileUrl)
-            destFileUrl = Utils.joinPath(wsm.getFullPath(), fileName)
-
-            try:
-                shutil.copy(fileUrl, destFileUrl)
-            except (shutil.SameFileError, OSError):
-                QtGui.QMessageBox.warning(
-                    None, "Error", "Failed to copy file " + fileName
-                )
-
-        # after copying try the upload
-        def tryUpload():
-            for fileUrl in selectedFiles:
-                fileName = os.path.basename(fileUrl)
-                destFileUrl = Utils.joinPath(wsm.getFullPath(), fileName)
-                if os.path.isfile(destFileUrl):
-                    wsm.upload(fileName)
-                else:
-                    logger.warning(f"Not a file: {fileName}")
-            wsm.refreshModel()
+        if not selectedFiles:
+            return
+        if self.bulkUpload and not self.bulkUpload.is_finished():
+            QtGui.QMessageBox.information(
+                None, "Upload in progress", "Wait for the current upload to finish."
+            )
+            return
 
-        self.handle_api_call(tryUpload, "Failed to upload (some of) the files.")
+        wsm = self.currentWorkspaceModel
+        logger.info(f"Uploading {len(selectedFiles)} files")
+        # copying and uploading happens in the background
+        self.bulkUpload = wsm.bulkUpload(
+            selectedFiles,
+            # the job changes while the signal is queued, so pass a snapshot
+            lambda job: self.bulkUploadStatusChanged.emit(
+                job.name, job.status, job.stage, job.error
+            ),
+            lambda summary: self.bulkUploadFinished.emit(wsm, summary),
+        )
 
         self.switchView()
 
+    def showBulkUploadStatus(self, name, status, stage, error):
+        if status == JobStatus.DONE:
+            logger.info(f"Uploaded {name}")
+        elif status == JobStatus.FAILED:
+            logger.error(f"Failed to upload {name} ({stage}): {error}")
+        else:
+            logger.debug(f"Upload {name}: {stage}")
+
+    def finishBulkUpload(self, wsm, summary):
+        logger.info(
+            f"Uploaded {summary['done']} of {summary['jobs']} files "
+            f"({summary['bytes'] / 1024 / 1024:.1f} MB) "
+            f"in {summary['seconds']:.1f} s: "
+            f"{summary['jobsPerSecond']:.1f} files/s, "
+            f"{summary['bytesPerSecond'] / 1024 / 1024:.1f} MB/s"
+        )
+        # refresh once for all the files
+        if wsm is self.currentWorkspaceModel:
+            self.handle_api_call(wsm.refreshModel, "Failed to refresh the files.")
+        if summary["failed"]:
+            QtGui.QMessageBox.warning(
+                None,
+                "Error",
+                f"Failed to upload {summary['failed']} of {summary['jobs']} files. "
+                "See the Report View for details.",
+            )
+
     def addDir(self):
         existingFileNames = self.currentWorkspaceModel.getFileNames()
         dialog = CreateDirDialog(existingFileNames)
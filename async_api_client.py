@@ -0,0 +1,139 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide.QtCore import QObject, Signal
+
+# The maximum number of API calls that are in flight at the same time
+DEFAULT_CONCURRENCY = 6
+
+
+class AsyncAPIClient:
+    """Expose the endpoints of an APIClient as coroutines.
+
+    Every public method of the APIClient is available under the same name as
+    a coroutine function.  The calls are made on a bounded thread pool with
+    the pooled sessions of the wrapped client, so that independent calls can
+    be gathered concurrently:
+
+        aapi = AsyncAPIClient(api)
+        refs = aapi.run(aapi.gather(*[aapi.getSecondaryRefs(i) for i in ids]))
+
+    The connection status, the tokens and the response cache are shared with
+    the wrapped APIClient.
+    """
+
+    def __init__(self, api, concurrency=DEFAULT_CONCURRENCY):
+        self.api = api
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="lens-api"
+        )
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self.api, name)
+        if not callable(method):
+            raise AttributeError(name)
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(method, *args, **kwargs)
+            )
+
+        return call
+
+    async def gather(self, *coros, return_exceptions=False):
+        """Run the calls concurrently and return the results in order."""
+        return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+
+    def run(self, coro):
+        """Run a coroutine from synchronous code and return its result.
+
+        Raises the exception of the coroutine, typically an APIClientException.
+        """
+        return get_runner().run(coro)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+class AsyncRunner(QObject):
+    """Bridge between the Qt event loop and an asyncio event loop.
+
+    The asyncio loop runs in its own thread.  Coroutines can be run
+    synchronously with `run()` or in the background with `submit()`.  In the
+    latter case the callback is called in the Qt main thread by means of a
+    queued signal.
+    """
+
+    finished = Signal(object, object, object)  # callback, result, exception
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="lens-asyncio", daemon=True
+        )
+        self.thread.start()
+        self.finished.connect(self._call_callback)
+
+    def run(self, coro):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return future.result()
+
+    def submit(self, coro, callback):
+        """Run a coroutine in the background.
+
+        The callback is called in the Qt main thread as callback(result,
+        exception) where exception is None on success.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+        def done(future):
+            try:
+                self.finished.emit(callback, future.result(), None)
+            except Exception as e:
+                self.finished.emit(callback, None, e)
+
+        future.add_done_callback(done)
+        return future
+
+    def _call_callback(self, callback, result, exception):
+        callback(result, exception)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_runner = None
+
+
+def get_runner():
+    """Return the (single) AsyncRunner of the addon."""
+    global _runner
+    if _runner is None:
+        _runner = AsyncRunner()
+    return _runner
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(api):
+    """Return the AsyncAPIClient that wraps an APIClient."""
+    if api not in _async_clients:
+        # a proxy, otherwise the value would keep the key alive
+        _async_clients[api] = AsyncAPIClient(weakref.proxy(api))
+    return _async_clients[api]
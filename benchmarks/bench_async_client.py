@@ -0,0 +1,115 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+"""Compare the wall time of loading bookmarks and share links.
+
+The sequential calls of the APIClient are compared to the calls gathered
+concurrently by the AsyncAPIClient.  Run from the FreeCAD Python console or
+with FreeCADCmd from the root of the addon:
+
+    FreeCADCmd benchmarks/bench_async_client.py
+
+The credentials are read from the (.gitignored) config.py that is also used by
+testAPI.py.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402 .gitignored file containing credentials
+
+from APIClient import APIClient  # noqa: E402
+from async_api_client import AsyncAPIClient  # noqa: E402
+
+REPEAT = 5
+
+
+def timed(func):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+
+def load_bookmarks_sync(api):
+    orgs = api.getOrganizations()
+    return [api.getSecondaryRefs(org["orgSecondaryReferencesId"]) for org in orgs]
+
+
+def load_bookmarks_async(api, aapi):
+    orgs = api.getOrganizations()
+    return asyncio.run(
+        aapi.gather(
+            *[aapi.getSecondaryRefs(org["orgSecondaryReferencesId"]) for org in orgs]
+        )
+    )
+
+
+def load_links_sync(api, model_id):
+    shared_models = api.getSharedModels({"cloneModelId": model_id})
+    return [
+        api.getSharedModel(sm["_id"])
+        for sm in shared_models
+        if sm["protection"] == "Pin"
+    ]
+
+
+def load_links_async(api, aapi, model_id):
+    shared_models = api.getSharedModels({"cloneModelId": model_id})
+    pin_ids = [sm["_id"] for sm in shared_models if sm["protection"] == "Pin"]
+    return asyncio.run(aapi.gather(*[aapi.getSharedModel(i) for i in pin_ids]))
+
+
+def report(name, sync_times, async_times):
+    sync_min, sync_mean = sync_times
+    async_min, async_mean = async_times
+    print(
+        f"{name:10} sync: {sync_mean * 1000:8.1f} ms (min {sync_min * 1000:.1f})  "
+        f"async: {async_mean * 1000:8.1f} ms (min {async_min * 1000:.1f})  "
+        f"speedup: {sync_mean / async_mean:.2f}x"
+    )
+
+
+def main():
+    api = APIClient(
+        None,
+        config.username,
+        config.password,
+        config.base_url,
+        config.lens_url,
+        "benchmark",
+        "benchmark",
+    )
+    api.authenticate()
+    aapi = AsyncAPIClient(api)
+
+    report(
+        "bookmarks",
+        timed(lambda: load_bookmarks_sync(api)),
+        timed(lambda: load_bookmarks_async(api, aapi)),
+    )
+
+    model_id = getattr(config, "model_id", None)
+    if model_id is None:
+        models = api.getModels()
+        model_id = models[0]["_id"] if models else None
+    if model_id:
+        report(
+            "links",
+            timed(lambda: load_links_sync(api, model_id)),
+            timed(lambda: load_links_async(api, aapi, model_id)),
+        )
+    aapi.shutdown()
+
+
+if __name__ == "__main__":
+    main()
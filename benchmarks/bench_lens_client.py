@@ -0,0 +1,232 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+"""Measure the throughput and latency of the addon against a fake Lens API.
+
+The APIClient and the ServerWorkspaceModel are driven against the local
+stand-in of benchmarks/fake_lens_server.py under a number of network
+profiles.  For each scenario the operations per second and the p50 and p95
+latency are reported.  Run with FreeCADCmd from the root of the addon (the
+APIClient needs FreeCAD):
+
+    FreeCADCmd benchmarks/bench_lens_client.py
+    FreeCADCmd benchmarks/bench_lens_client.py --profile wan --threads 4
+
+No account or config.py is needed.
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_lens_server import EMAIL, PASSWORD, FakeLensServer  # noqa: E402
+from APIClient import APIClient  # noqa: E402
+from Workspace import ServerWorkspaceModel  # noqa: E402
+
+PROFILES = {
+    "local": {},
+    "lan": {"latency": 0.002, "jitter": 0.001, "bandwidth": 100 * 1024 * 1024},
+    "wan": {"latency": 0.05, "jitter": 0.02, "bandwidth": 5 * 1024 * 1024},
+    "flaky": {
+        "latency": 0.05,
+        "jitter": 0.02,
+        "bandwidth": 5 * 1024 * 1024,
+        "failure_rate": 0.05,
+        "seed": 1,
+    },
+}
+
+# Size of the files that are uploaded and downloaded
+FILE_SIZE = 1024 * 1024
+
+# Number of files in the workspace before the scenarios run
+INITIAL_FILES = 20
+
+PATH_DOCUMENT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "testshape.FCStd"
+)
+
+
+def percentile(samples, p):
+    """The p-th percentile of the samples by the nearest rank method."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(len(ordered) * p / 100))
+    return ordered[rank - 1]
+
+
+def measure(name, operation, iterations, threads):
+    """Run operation(i) iterations times on a number of threads.
+
+    Returns the statistics of the scenario.  Failed operations count as
+    errors and are not part of the latencies.
+    """
+    latencies = []
+    errors = []
+
+    def run(i):
+        start = time.perf_counter()
+        try:
+            operation(i)
+        except Exception as e:
+            errors.append(e)
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(run, range(iterations)))
+    seconds = time.perf_counter() - start
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 1)
+
+    return {
+        "scenario": name,
+        "ops": len(latencies),
+        "errors": len(errors),
+        "seconds": round(seconds, 3),
+        "opsPerSecond": round(len(latencies) / seconds, 1),
+        "p50Ms": ms(percentile(latencies, 50)),
+        "p95Ms": ms(percentile(latencies, 95)),
+        "meanMs": ms(sum(latencies) / len(latencies) if latencies else None),
+    }
+
+
+def make_document(path, size):
+    """Write a FreeCAD document of about size bytes."""
+    with zipfile.ZipFile(PATH_DOCUMENT) as source:
+        document = source.read("Document.xml")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as z:
+        z.writestr("Document.xml", document)
+        z.writestr("payload.bin", os.urandom(size))
+
+
+class Bench:
+    """The client, the workspace model and the data of one server profile."""
+
+    def __init__(self, server, tmpdir):
+        self.server = server
+        self.tmpdir = tmpdir
+        self.api = APIClient(
+            None,
+            EMAIL,
+            PASSWORD,
+            server.url,
+            f"{server.url}/",
+            "bench",
+            "bench",
+            cache_path=os.path.join(tmpdir, "responses"),
+            upload_index_path=os.path.join(tmpdir, "uploads.json"),
+        )
+        self.api.authenticate()
+        workspace = self.api.getWorkspace(server.workspace["_id"])
+        self.wsm = ServerWorkspaceModel(workspace, apiClient=self.api)
+        for i in range(INITIAL_FILES):
+            self.add_file(f"initial-{i}.FCStd")
+        self.rootId = workspace["rootDirectory"]["_id"]
+        self.files = self.api.getDirectory(self.rootId)["files"]
+
+    def add_file(self, name):
+        make_document(os.path.join(self.wsm.getFullPath(), name), FILE_SIZE)
+        self.wsm.upload(name)
+
+    def download(self, i):
+        fileDict = self.files[i % len(self.files)]
+        path = os.path.join(self.tmpdir, "downloads", f"{i}.FCStd")
+        self.api.downloadFileFromServer(
+            fileDict["currentVersion"]["uniqueFileName"], path
+        )
+        os.remove(path)
+
+    def fileDetails(self, i):
+        fileDict = self.files[i % len(self.files)]
+        self.api.get_file_version_details(
+            fileDict["_id"], fileDict["currentVersion"]["_id"]
+        )
+
+    def scenarios(self):
+        return [
+            ("authenticate", lambda i: self.api.authenticate()),
+            ("getWorkspaces", lambda i: self.api.getWorkspaces()),
+            ("getDirectory", lambda i: self.api.getDirectory(self.rootId)),
+            ("fileDetails", self.fileDetails),
+            ("refreshModel", lambda i: self.wsm.refreshModel()),
+            ("upload", lambda i: self.add_file(f"upload-{uuid.uuid4()}.FCStd")),
+            ("download", self.download),
+        ]
+
+    def close(self):
+        shutil.rmtree(self.wsm.path, ignore_errors=True)
+        self.api.logout()
+
+
+def run_profile(name, iterations, threads):
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with FakeLensServer(**PROFILES[name]) as server:
+            bench = Bench(server, tmpdir)
+            try:
+                for scenario, operation in bench.scenarios():
+                    result = measure(scenario, operation, iterations, threads)
+                    results.append({"profile": name, "threads": threads, **result})
+                    print_result(results[-1])
+            finally:
+                bench.close()
+    return results
+
+
+def print_header():
+    print(
+        f"{'profile':8}{'scenario':16}{'threads':>8}{'ops':>6}{'err':>5}"
+        f"{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}"
+    )
+
+
+def print_result(r):
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    print(
+        f"{r['profile']:8}{r['scenario']:16}{r['threads']:>8}{r['ops']:>6}"
+        f"{r['errors']:>5}{r['opsPerSecond']:>9.1f}{fmt(r['p50Ms']):>9}"
+        f"{fmt(r['p95Ms']):>9}{fmt(r['meanMs']):>9}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--profile", choices=list(PROFILES), action="append", help="default: all"
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    # FreeCADCmd may pass arguments of its own
+    args, _ = parser.parse_known_args()
+
+    print_header()
+    results = []
+    for profile in args.profile or list(PROFILES):
+        results += run_profile(profile, args.iterations, args.threads)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
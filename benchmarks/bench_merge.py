@@ -0,0 +1,108 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+"""Measure the merge of a server and a local listing of a directory.
+
+ServerWorkspaceModel.refreshModel merges the listings on every refresh, so
+it has to stay fast for directories with many files.  Run from the root of
+the addon:
+
+    python benchmarks/bench_merge.py
+    python benchmarks/bench_merge.py --sizes 1000 10000 50000 --quadratic
+
+With --quadratic the nested loop that the merge replaced is measured as
+well, for sizes of at most QUADRATIC_MAX_SIZE.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from listings import merge_listings  # noqa: E402
+
+REPEAT = 5
+
+QUADRATIC_MAX_SIZE = 10000
+
+
+class Item:
+    def __init__(self, name):
+        self.name = name
+
+
+def make_listings(size, seed=0):
+    """A server and a local listing of size items that overlap for the most part.
+
+    A tenth of the items is only on the server, a tenth only local and a
+    tenth differs in case only.
+    """
+    rng = random.Random(seed)
+    names = [f"part-{i:06d}.FCStd" for i in range(size)]
+    serverItems = []
+    localItems = []
+    for name in names:
+        kind = rng.randrange(10)
+        if kind != 0:
+            serverItems.append(Item(name))
+        if kind == 1:
+            localItems.append(Item(name.upper()))
+        elif kind != 2:
+            localItems.append(Item(name))
+    rng.shuffle(serverItems)
+    rng.shuffle(localItems)
+    return serverItems, localItems
+
+
+def merge_quadratic(serverItems, localItems, funcUpdateFound, funcUpdateNotFound):
+    """The nested loop of old, for comparison."""
+    itemsToAdd = []
+    for localItem in localItems:
+        for serverItem in serverItems:
+            if serverItem.name == localItem.name:
+                funcUpdateFound(serverItem, localItem)
+                break
+        else:
+            funcUpdateNotFound(localItem)
+            itemsToAdd.append(localItem)
+    return serverItems + itemsToAdd
+
+
+def timed(merge, serverItems, localItems, **kwargs):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        merge(serverItems, localItems, lambda s, l: None, lambda l: None, **kwargs)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--quadratic", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'size':>8}{'merge ms':>12}{'ignore case ms':>16}{'nested loop ms':>16}")
+    for size in args.sizes:
+        serverItems, localItems = make_listings(size)
+        merge = timed(merge_listings, serverItems, localItems)
+        ignoreCase = timed(merge_listings, serverItems, localItems, ignoreCase=True)
+        quadratic = "-"
+        if args.quadratic and size <= QUADRATIC_MAX_SIZE:
+            seconds = timed(merge_quadratic, serverItems, localItems)
+            quadratic = f"{seconds * 1000:.1f}"
+        print(
+            f"{size:>8}{merge * 1000:>12.1f}{ignoreCase * 1000:>16.1f}"
+            f"{quadratic:>16}"
+        )
+
+
+if __name__ == "__main__":
+    main()
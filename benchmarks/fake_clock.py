@@ -0,0 +1,16 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+"""A clock for tests of code that takes a clock function, such as
+time.monotonic, to advance time by hand."""
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
@@ -0,0 +1,745 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+"""A local stand-in for the Lens API.
+
+The server keeps the services that the addon uses in memory: authentication,
+workspaces, directories, file, upload, models, shared-models, organizations,
+org-secondary-references, preferences and keywords.  It mimics the Feathers
+conventions of the real API (find queries with $limit, $skip and $sort,
+paginated responses, ObjectIds, JWT access tokens) closely enough to drive the
+APIClient, but it does not enforce permissions beyond a valid token.
+
+Request bodies may be compressed with a Content-Encoding, and responses are
+compressed with gzip for clients that accept it, as a reverse proxy in front
+of the API would do.  Latency, bandwidth and failures can be configured to measure the client under
+network conditions of choice, see benchmarks/bench_lens_client.py.  The
+server can also be started on its own:
+
+    python benchmarks/fake_lens_server.py --port 3030 --latency 0.05
+"""
+
+import argparse
+import base64
+import copy
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qsl, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.range_file_server import RANGE, QuietHTTPServer  # noqa: E402
+from transport import compression  # noqa: E402
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench"
+
+# The maximum page size of a find, as on the real API
+PAGE_SIZE = 50
+
+TOKEN_LIFETIME_S = 24 * 3600
+
+WRITE_SIZE = 64 * 1024
+
+# Query parameters that are not filters
+NO_FILTER = {"publicInfo"}
+
+SORT = re.compile(r"^\$sort\[(\w+)\]$")
+
+# Services that can be queried without an access token
+PUBLIC_SERVICES = {"keywords"}
+
+
+class FakeLensError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def summarize(doc, *keys):
+    return {k: doc.get(k) for k in keys}
+
+
+def make_token(user_id, lifetime=TOKEN_LIFETIME_S):
+    """A token that looks like a JWT; the signature is not checked."""
+
+    def encode(d):
+        return base64.urlsafe_b64encode(json.dumps(d).encode()).rstrip(b"=").decode()
+
+    payload = {
+        "sub": user_id,
+        "exp": int(time.time() + lifetime),
+        "n": os.urandom(4).hex(),
+    }
+    return f"{encode({'alg': 'HS256', 'typ': 'access'})}.{encode(payload)}.fake"
+
+
+def parse_multipart(content_type, body):
+    """Return the filename and content of the (first) file in a form."""
+    match = re.search(r"boundary=([^;]+)", content_type or "")
+    if not match:
+        raise FakeLensError(400, "Expected a multipart form")
+    boundary = b"--" + match.group(1).strip('"').encode()
+    for part in body.split(boundary):
+        headers, sep, content = part.partition(b"\r\n\r\n")
+        filename = re.search(rb'filename="([^"]*)"', headers)
+        if sep and filename:
+            return filename.group(1).decode(), content[: -len(b"\r\n")]
+    raise FakeLensError(400, "No file in the form")
+
+
+class Store:
+    """The documents of the services, by service and id."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.services = {}
+        self.blobs = {}
+        self._ids = itertools.count(1)
+
+    def new_id(self):
+        return f"{0xFACE:04x}{next(self._ids):020x}"
+
+    def insert(self, service, doc):
+        doc.setdefault("_id", self.new_id())
+        doc.setdefault("createdAt", now_ms())
+        doc.setdefault("updatedAt", doc["createdAt"])
+        self.services.setdefault(service, {})[doc["_id"]] = doc
+        return doc
+
+    def get(self, service, id):
+        doc = self.services.get(service, {}).get(id)
+        if doc is None:
+            raise FakeLensError(404, f"No record found for id '{id}'")
+        return doc
+
+    def find(self, service, params):
+        docs = list(self.services.get(service, {}).values())
+        sort = []
+        for key, value in params.items():
+            match = SORT.match(key)
+            if match:
+                sort.append((match.group(1), int(value)))
+            elif not key.startswith("$") and key not in NO_FILTER:
+                docs = [d for d in docs if matches(d.get(key), value)]
+        for field, direction in reversed(sort):
+            docs.sort(key=lambda d: d.get(field) or 0, reverse=direction < 0)
+        return docs
+
+
+def matches(field, value):
+    if isinstance(field, bool):
+        return str(field).lower() == value.lower()
+    return field is not None and str(field) == value
+
+
+class FakeLens:
+    """The services of the Lens API on top of a Store."""
+
+    def __init__(self, base_url_func):
+        self.store = Store()
+        self.base_url = base_url_func
+        self.tokens = {}
+        self.user = self._seed()
+
+    def _seed(self):
+        s = self.store
+        ondsel = s.insert("organizations", {"name": "Ondsel", "type": "Ondsel"})
+        user_id = s.new_id()
+        org = s.insert(
+            "organizations", {"name": "Personal", "type": "Personal", "owner": user_id}
+        )
+        for o in (ondsel, org):
+            refs = s.insert(
+                "org-secondary-references",
+                {"bookmarks": [], "organizationId": o["_id"]},
+            )
+            o["orgSecondaryReferencesId"] = refs["_id"]
+            o["preferencesId"] = None
+        user = s.insert(
+            "users",
+            {
+                "_id": user_id,
+                "email": EMAIL,
+                "name": "Bench Mark",
+                "username": "bench",
+                "firstName": "Bench",
+                "lastName": "Mark",
+                "tier": "Peer",
+                "organizations": [summarize(org, "_id", "name", "type")],
+                "currentOrganizationId": org["_id"],
+            },
+        )
+        self.organization = org
+        self.workspace = self.create_workspace(
+            {"name": "Bench", "description": "", "organizationId": org["_id"]}
+        )
+        return user
+
+    # ####
+    # Authentication
+    # ####
+
+    def authenticate(self, payload):
+        if payload.get("strategy") == "local":
+            if payload.get("email") != EMAIL or payload.get("password") != PASSWORD:
+                raise FakeLensError(401, "Invalid login")
+        elif payload.get("strategy") == "jwt":
+            self.check_token(payload.get("accessToken"))
+        else:
+            raise FakeLensError(401, "Invalid authentication strategy")
+        token = make_token(self.user["_id"])
+        self.tokens[token] = self.user["_id"]
+        return {"accessToken": token, "user": self.user}
+
+    def check_token(self, token):
+        if token not in self.tokens:
+            raise FakeLensError(401, "Not authenticated")
+
+    # ####
+    # Services with behavior beyond storing documents
+    # ####
+
+    def create_workspace(self, data):
+        s = self.store
+        org = s.get("organizations", data["organizationId"])
+        workspace = {
+            "name": data["name"],
+            "refName": data.get("refName", data["name"].lower()),
+            "open": False,
+            "description": data.get("description", ""),
+            "organizationId": org["_id"],
+            "organization": summarize(org, "_id", "name", "type"),
+            "curation": None,
+            "groupsOrUsers": [],
+        }
+        s.insert("workspaces", workspace)
+        root = s.insert(
+            "directories",
+            {
+                "name": "ROOT",
+                "workspace": summarize(workspace, "_id", "name", "refName", "open"),
+                "directories": [],
+                "fileIds": [],
+                "parentDirectory": None,
+            },
+        )
+        workspace["rootDirectory"] = summarize(root, "_id", "name")
+        return workspace
+
+    def create_directory(self, data):
+        s = self.store
+        parent = s.get("directories", data["parentDirectory"]["_id"])
+        directory = s.insert(
+            "directories",
+            {
+                "name": data["name"],
+                "workspace": data["workspace"],
+                "directories": [],
+                "fileIds": [],
+                "parentDirectory": summarize(parent, "_id", "name"),
+            },
+        )
+        parent["directories"].append(summarize(directory, "_id", "name"))
+        return directory
+
+    def render_directory(self, directory):
+        files = []
+        for file_id in directory["fileIds"]:
+            f = self.store.get("file", file_id)
+            files.append(
+                {
+                    **summarize(f, "_id", "custFileName", "modelId"),
+                    "currentVersion": f["currentVersion"],
+                }
+            )
+        result = {k: v for k, v in directory.items() if k != "fileIds"}
+        result["files"] = files
+        return result
+
+    def delete_directory(self, directory):
+        if directory["fileIds"] or directory["directories"]:
+            raise FakeLensError(400, "The directory is not empty")
+        parent = self.store.get("directories", directory["parentDirectory"]["_id"])
+        parent["directories"] = [
+            d for d in parent["directories"] if d["_id"] != directory["_id"]
+        ]
+
+    def new_version(self, data):
+        version = data["version"]
+        return {
+            "_id": self.store.new_id(),
+            "uniqueFileName": version["uniqueFileName"],
+            "message": version.get("message", ""),
+            "userId": self.user["_id"],
+            "createdAt": now_ms(),
+            "fileUpdatedAt": version.get("fileUpdatedAt"),
+            "additionalData": {"fileUpdatedAt": version.get("fileUpdatedAt")},
+            "lockedSharedModels": [],
+        }
+
+    def create_file(self, data):
+        s = self.store
+        directory = s.get("directories", data["directory"]["_id"])
+        version = self.new_version(data)
+        f = s.insert(
+            "file",
+            {
+                "custFileName": data["custFileName"],
+                "currentVersionId": version["_id"],
+                "currentVersion": version,
+                "versions": [version],
+                "userId": self.user["_id"],
+                "modelId": None,
+                "isSystemGenerated": False,
+                "directory": summarize(directory, "_id", "name"),
+                "workspace": data.get("workspace"),
+                "relatedUserDetails": [],
+                "followingActiveSharedModels": [],
+            },
+        )
+        directory["fileIds"].append(f["_id"])
+        return f
+
+    def patch_file(self, f, data):
+        if data.get("shouldCommitNewVersion"):
+            version = self.new_version(data)
+            f["versions"].append(version)
+            f["currentVersionId"] = version["_id"]
+            f["currentVersion"] = version
+        if data.get("shouldCheckoutToVersion"):
+            for version in f["versions"]:
+                if version["_id"] == data["versionId"]:
+                    f["currentVersionId"] = version["_id"]
+                    f["currentVersion"] = version
+                    break
+            else:
+                raise FakeLensError(400, "Unknown version")
+        f["updatedAt"] = now_ms()
+        return f
+
+    def delete_file(self, f):
+        directory = self.store.get("directories", f["directory"]["_id"])
+        directory["fileIds"].remove(f["_id"])
+
+    def create_model(self, data):
+        f = self.store.get("file", data["fileId"])
+        model = self.store.insert(
+            "models",
+            {
+                "fileId": f["_id"],
+                "custFileName": f["custFileName"],
+                "uniqueFileName": f["currentVersion"]["uniqueFileName"],
+                "shouldStartObjGeneration": data.get("shouldStartObjGeneration"),
+                "isObjGenerationInProgress": False,
+                "isObjGenerated": False,
+                "isSharedModel": False,
+                "userId": self.user["_id"],
+                "errorMsg": "",
+                "attributes": {},
+                "objUrl": None,
+                "thumbnailUrl": None,
+            },
+        )
+        f["modelId"] = model["_id"]
+        return model
+
+    def create_shared_model(self, data):
+        return self.store.insert(
+            "shared-models",
+            {
+                "isActive": True,
+                "isSystemGenerated": False,
+                "isThumbnailGenerated": False,
+                "userId": self.user["_id"],
+                **data,
+            },
+        )
+
+    def upload(self, unique_name, content):
+        self.store.blobs[unique_name] = content
+        return {"uniqueFileName": unique_name, "size": len(content)}
+
+    # ####
+    # Dispatching
+    # ####
+
+    def handle(self, method, service, id, params, body, headers):
+        """Handle a call and return the status and (a copy of) the document."""
+        if service == "authentication" and method == "POST":
+            return 201, self.authenticate(json.loads(body or b"{}"))
+        public = (
+            service in PUBLIC_SERVICES
+            or params.get("publicInfo") == "true"
+            or (service == "shared-models" and params.get("protection") == "Listed")
+        )
+        if not public:
+            auth = headers.get("Authorization", "")
+            self.check_token(auth[len("Bearer ") :])
+
+        with self.store.lock:
+            status, doc = self.dispatch(method, service, id, params, body, headers)
+            return status, copy.deepcopy(doc)
+
+    def dispatch(self, method, service, id, params, body, headers):
+        s = self.store
+        if service == "upload":
+            if method == "POST":
+                name, content = parse_multipart(headers.get("Content-Type"), body)
+                return 201, self.upload(name, content)
+            if method == "GET" and id in s.blobs:
+                return 200, {"url": f"{self.base_url()}/blobs/{id}"}
+            raise FakeLensError(404, f"No blob {id}")
+        if service == "keywords":
+            return 200, {"data": [{"sortedMatches": []}], "total": 1}
+        if method == "GET" and id is None:
+            return 200, self.find(service, params)
+        if method == "GET":
+            doc = s.get(service, id)
+            if service == "directories":
+                return 200, self.render_directory(doc)
+            return 200, doc
+        if method == "POST":
+            return 201, self.create(service, json.loads(body))
+        if method == "PATCH":
+            return 200, self.patch(service, s.get(service, id), json.loads(body))
+        if method == "DELETE":
+            doc = s.get(service, id)
+            if service == "directories":
+                self.delete_directory(doc)
+            elif service == "file":
+                self.delete_file(doc)
+            del s.services[service][id]
+            return 200, doc
+        raise FakeLensError(405, f"Method {method} not allowed")
+
+    def find(self, service, params):
+        docs = self.store.find(service, params)
+        if service == "directories":
+            docs = [self.render_directory(d) for d in docs]
+        limit = min(int(params.get("$limit", PAGE_SIZE)), PAGE_SIZE)
+        skip = int(params.get("$skip", 0))
+        return {
+            "total": len(docs),
+            "limit": limit,
+            "skip": skip,
+            "data": docs[skip : skip + limit],
+        }
+
+    def create(self, service, data):
+        if service == "workspaces":
+            return self.create_workspace(data)
+        elif service == "directories":
+            return self.create_directory(data)
+        elif service == "file":
+            return self.create_file(data)
+        elif service == "models":
+            return self.create_model(data)
+        elif service == "shared-models":
+            return self.create_shared_model(data)
+        return self.store.insert(service, data)
+
+    def patch(self, service, doc, data):
+        if service == "file":
+            return self.patch_file(doc, data)
+        doc.update(data)
+        doc["updatedAt"] = now_ms()
+        return doc
+
+
+class FakeLensRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # the headers and the body are written separately, which would otherwise
+    # add the delayed ACK of the client to the latency
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_call("GET")
+
+    def do_POST(self):
+        self.handle_call("POST")
+
+    def do_PATCH(self):
+        self.handle_call("PATCH")
+
+    def do_DELETE(self):
+        self.handle_call("DELETE")
+
+    def read_exactly(self, length):
+        chunks = []
+        while length > 0:
+            chunk = self.rfile.read(min(length, WRITE_SIZE))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            length -= len(chunk)
+            self.server.fake.throttle(len(chunk))
+        return b"".join(chunks)
+
+    def read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+            return self.read_exactly(int(self.headers.get("Content-Length") or 0))
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b";")[0], 16)
+            if size == 0:
+                # skip the trailer
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(self.read_exactly(size))
+            self.rfile.readline()
+
+    def decode_body(self, body):
+        """Decompress the body; raises a ValueError for an unknown coding."""
+        encoding = self.headers.get("Content-Encoding", "identity").lower()
+        if encoding == "identity":
+            return body
+        if not self.server.fake.compressed_uploads:
+            raise ValueError(f"Unsupported content coding {encoding}")
+        return compression.decompressor(encoding).decompress(body)
+
+    def accepts_gzip(self):
+        codings = self.headers.get("Accept-Encoding", "").split(",")
+        return "gzip" in (c.split(";")[0].strip().lower() for c in codings)
+
+    def send_body(self, data, compressible=True):
+        """Send the Content-Length and the body, compressed if possible."""
+        if (
+            compressible
+            and self.server.fake.compress_responses
+            and len(data) >= compression.MIN_SIZE
+            and self.accepts_gzip()
+            and compression.is_compressible_sample(data[: compression.SAMPLE_SIZE])
+        ):
+            compressor = compression.compressor("gzip")
+            data = compressor.compress(data) + compressor.flush()
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.write_throttled(data)
+
+    def handle_call(self, method):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        segments = [s for s in url.path.split("/") if s]
+        params = dict(parse_qsl(url.query))
+        body = self.read_body()
+        fake.count(method, segments)
+        fake.delay()
+        try:
+            body = self.decode_body(body)
+        except (ValueError, zlib.error) as e:
+            self.send_json(415, {"name": "UnsupportedMediaType", "message": str(e)})
+            return
+
+        if fake.fail():
+            if fake.failure_status is None:
+                # as if the connection dropped
+                self.close_connection = True
+                return
+            self.send_json(fake.failure_status, {"message": "Injected failure"})
+            return
+
+        if not segments:
+            self.send_json(200, {"name": "Fake Lens API"})
+            return
+        if segments[0] == "blobs" and len(segments) == 2:
+            self.send_blob(fake.lens.store.blobs.get(segments[1]))
+            return
+
+        service = segments[0]
+        id = "/".join(segments[1:]) or None
+        try:
+            status, doc = fake.lens.handle(
+                method, service, id, params, body, self.headers
+            )
+        except FakeLensError as e:
+            status, doc = e.status, {
+                "name": "Error",
+                "message": str(e),
+                "code": e.status,
+            }
+        except (KeyError, ValueError, TypeError) as e:
+            status, doc = 400, {"name": "BadRequest", "message": repr(e), "code": 400}
+        self.send_json(status, doc)
+
+    def send_json(self, status, doc):
+        body = json.dumps(doc).encode()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if (
+            status == 200
+            and self.command == "GET"
+            and self.headers.get("If-None-Match") == etag
+        ):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if status == 200 and self.command == "GET":
+            self.send_header("ETag", etag)
+        self.send_body(body)
+
+    def send_blob(self, data):
+        if data is None:
+            self.send_json(404, {"message": "Not found"})
+            return
+        start, end = 0, len(data) - 1
+        status = 200
+        match = RANGE.match(self.headers.get("Range", ""))
+        if match and data:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            status = 206
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("ETag", '"' + hashlib.md5(data).hexdigest() + '"')
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        # ranges are served uncompressed
+        self.send_body(data[start : end + 1], compressible=status == 200)
+
+    def write_throttled(self, data):
+        for offset in range(0, len(data), WRITE_SIZE):
+            chunk = data[offset : offset + WRITE_SIZE]
+            self.wfile.write(chunk)
+            self.server.fake.throttle(len(chunk))
+
+
+class FakeLensServer:
+    """Serve a fake Lens API at url until the server is stopped.
+
+    Each call is delayed by `latency` seconds plus a random jitter of at most
+    `jitter` seconds.  With a bandwidth (in bytes per second) request and
+    response bodies are throttled per connection.  A fraction `failure_rate`
+    of the calls fails with `failure_status`, or drops the connection if the
+    status is None.  Without compressed_uploads compressed request bodies are
+    rejected with a 415, and without compress_responses nothing is
+    compressed.  Use it as a context manager:
+
+        with FakeLensServer(latency=0.05) as server:
+            api = APIClient(None, EMAIL, PASSWORD, server.url, ...)
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        bandwidth=None,
+        failure_rate=0.0,
+        failure_status=503,
+        seed=None,
+        port=0,
+        compressed_uploads=True,
+        compress_responses=True,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.port = port
+        self.compressed_uploads = compressed_uploads
+        self.compress_responses = compress_responses
+        self.calls = Counter()
+        self.lens = FakeLens(lambda: self.url)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def workspace(self):
+        """The workspace of the user, which starts empty."""
+        return self.lens.workspace
+
+    def count(self, method, segments):
+        # ids are left out, as in transport.instrumentation
+        with self._lock:
+            self.calls[(method, segments[0] if segments else "")] += 1
+
+    def delay(self):
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+    def fail(self):
+        if not self.failure_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def throttle(self, size):
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    def start(self):
+        self._httpd = QuietHTTPServer(("127.0.0.1", self.port), FakeLensRequestHandler)
+        self._httpd.fake = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=3030)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, help="bytes per second")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeLensServer(
+        args.latency, args.jitter, args.bandwidth, args.failure_rate, port=args.port
+    ).start()
+    print(f"Fake Lens API at {server.url}, log in as {EMAIL} / {PASSWORD}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+"""A local stand-in for the file storage that serves byte ranges.
+
+The server can drop connections halfway a response and throttle each
+connection, to test and measure resumable downloads without a Lens server.
+Run from the root of the addon to compare the throughput of a download in a
+single range with one in parallel ranges:
+
+    python benchmarks/range_file_server.py
+"""
+
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+WRITE_SIZE = 64 * 1024
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def do_GET(self, body=True):
+        fs = self.server.file_server
+        data = fs.data
+        start, end = 0, len(data) - 1
+        status = 200
+
+        match = RANGE.match(self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if fs.support_ranges and match and (not if_range or if_range == fs.etag):
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("ETag", fs.etag)
+        self.send_header("Content-Length", str(end + 1 - start))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.end_headers()
+        if not body:
+            return
+
+        drop_after = fs.take_drop()
+        sent = 0
+        for offset in range(start, end + 1, WRITE_SIZE):
+            chunk = data[offset : min(offset + WRITE_SIZE, end + 1)]
+            if drop_after is not None and sent + len(chunk) > drop_after:
+                self.wfile.write(chunk[: drop_after - sent])
+                self.wfile.flush()
+                # the client sees a body shorter than the Content-Length
+                self.close_connection = True
+                return
+            self.wfile.write(chunk)
+            sent += len(chunk)
+            if fs.rate:
+                time.sleep(len(chunk) / fs.rate)
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # dropped connections are the point of this server
+        pass
+
+
+class RangeFileServer:
+    """Serve data at url until the server is stopped.
+
+    The first `drops` responses with a body are cut off after `drop_after`
+    bytes.  With a rate (in bytes per second) each connection is throttled,
+    like a connection over the internet.  Use it as a context manager.
+    """
+
+    def __init__(
+        self, data, drops=0, drop_after=0, rate=None, support_ranges=True, etag='"1"'
+    ):
+        self.data = data
+        self.drops = drops
+        self.drop_after = drop_after
+        self.rate = rate
+        self.support_ranges = support_ranges
+        self.etag = etag
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/blob"
+
+    def take_drop(self):
+        with self._lock:
+            self.requests += 1
+            if self.drops > 0:
+                self.drops -= 1
+                return self.drop_after
+            return None
+
+    def start(self):
+        self._httpd = QuietHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+        self._httpd.file_server = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+
+def main():
+    import requests
+
+    from transport.range_download import RangeDownload
+
+    size = 64 * 1024 * 1024
+    rate = 16 * 1024 * 1024
+    data = os.urandom(size)
+
+    with tempfile.TemporaryDirectory() as tmpdir, requests.Session() as session:
+        path = os.path.join(tmpdir, "blob.FCStd")
+        for segments, drops in [(1, 0), (4, 0), (1, 3), (4, 3)]:
+            with RangeFileServer(
+                data, drops=drops, drop_after=size // 10, rate=rate
+            ) as server:
+                download = RangeDownload(
+                    session.get,
+                    server.url,
+                    path,
+                    "blob",
+                    max_segments=segments,
+                    retry_delay=0,
+                )
+                start = time.perf_counter()
+                download.run()
+                duration = time.perf_counter() - start
+            with open(path, "rb") as f:
+                assert f.read() == data
+            os.remove(path)
+            print(
+                f"segments: {segments}  drops: {drops}  "
+                f"{size / duration / 1024 / 1024:6.1f} MB/s  "
+                f"({duration:.2f} s, {server.requests} requests, "
+                f"{download.retries} retries)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from PySide.QtCore import Qt
+from PySide.QtWidgets import QApplication, QProgressDialog
+
+# Do not show the dialog for transfers that finish quickly
+MINIMUM_DURATION_MS = 500
+
+MEGABYTE = 1024 * 1024
+
+
+class TransferProgressDialog(QProgressDialog):
+    """A progress dialog for uploads and downloads.
+
+    Use it as a context manager and hand `progress` to the APIClient:
+
+        with TransferProgressDialog(f"Downloading {name}") as dialog:
+            api.downloadFileFromServer(unique_name, path, dialog.progress)
+
+    The transfers run on the GUI thread, so `progress` processes events to
+    keep the dialog responsive.
+    """
+
+    def __init__(self, label, parent=None, cancelable=False):
+        super().__init__(label, "Cancel" if cancelable else None, 0, 0, parent)
+        self.label = label
+        self.setWindowTitle("Ondsel Lens")
+        self.setWindowModality(Qt.WindowModal)
+        self.setMinimumDuration(MINIMUM_DURATION_MS)
+        self.setAutoReset(False)
+        self.setAutoClose(False)
+        self.last_megabytes = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def progress(self, bytes_done, bytes_total):
+        """Update the dialog; a callback for the APIClient transfer functions.
+
+        Returns False if the user canceled the transfer.
+        """
+        megabytes = bytes_done // MEGABYTE
+        if megabytes == self.last_megabytes:
+            return not self.wasCanceled()
+        self.last_megabytes = megabytes
+
+        if bytes_total:
+            # a range of 0 to 0 shows a busy indicator when the size is unknown
+            self.setMaximum(1000)
+            self.setValue(int(bytes_done * 1000 / bytes_total))
+            self.setLabelText(
+                f"{self.label}\n{megabytes} of {bytes_total // MEGABYTE} MB"
+            )
+        else:
+            self.setValue(0)
+            self.setLabelText(f"{self.label}\n{megabytes} MB")
+        QApplication.processEvents()
+        return not self.wasCanceled()
@@ -5,6 +5,7 @@ import FreeCAD
 from APIClient import fancy_handle, APICallResult
 
 import Utils
+from components.transfer_progress_dialog import TransferProgressDialog
 
 
 logger = Utils.getLogger(__name__)
@@ -83,7 +84,10 @@ def download_to_memory(api, unique_filename, real_filename):
     if Utils.isOpenableByFreeCAD(real_filename):
         suffix = "." + Utils.get_extension(real_filename)
         with tempfile.NamedTemporaryFile(prefix="sl_", suffix=suffix) as tf:
-            api.downloadFileFromServerUsingHandle(unique_filename, tf)
+            with TransferProgressDialog(f"Downloading {real_filename}") as dialog:
+                api.downloadFileFromServerUsingHandle(
+                    unique_filename, tf, dialog.progress
+                )
             tf.flush()
             if Utils.is_freecad_document(real_filename):
                 FreeCAD.openDocument(tf.name)
@@ -0,0 +1,134 @@
+import functools
+import os
+import sys
+import tempfile
+
+
+@functools.lru_cache(maxsize=None)
+def is_case_insensitive(path):
+    """Whether the file system of the existing directory path ignores case.
+
+    The default file systems of Windows and macOS do, those of Linux do not.
+    The answer is found by creating a file in path and remembered per path.
+    """
+    try:
+        with tempfile.NamedTemporaryFile(prefix="Lens-Case-", dir=path) as f:
+            directory, name = os.path.split(f.name)
+            return os.path.exists(os.path.join(directory, name.lower()))
+    except OSError:
+        return sys.platform in ("win32", "darwin")
+
+
+def merge_listings(
+    serverItems, localItems, funcUpdateFound, funcUpdateNotFound, ignoreCase=False
+):
+    """Merge the items of a server and a local listing by name.
+
+    funcUpdateFound(serverItem, localItem) is called for every local item
+    with a server item of the same name, funcUpdateNotFound(localItem) for
+    the others.  Returns the server items followed by the local items that
+    are not on the server.
+
+    With ignoreCase, a local item that differs only in case from a server
+    item is the same item, as on a file system that ignores case.  A name
+    that matches exactly always wins, and an item is matched only if its
+    name is not ambiguous: if the server has both "Part.FCStd" and
+    "part.FCStd", a local "PART.FCStd" matches neither.
+
+    The merge is linear in the size of the listings.
+    """
+    serverByName = {}
+    for serverItem in serverItems:
+        # the first of duplicate names wins
+        serverByName.setdefault(serverItem.name, serverItem)
+
+    matched = set()
+    unmatchedLocal = []
+    for localItem in localItems:
+        serverItem = serverByName.get(localItem.name)
+        if serverItem is None:
+            unmatchedLocal.append(localItem)
+        else:
+            matched.add(id(serverItem))
+            funcUpdateFound(serverItem, localItem)
+
+    serverByFoldedName = {}
+    if ignoreCase and unmatchedLocal:
+        for serverItem in serverItems:
+            if id(serverItem) not in matched:
+                key = serverItem.name.casefold()
+                serverByFoldedName.setdefault(key, []).append(serverItem)
+
+    itemsToAdd = []
+    for localItem in unmatchedLocal:
+        candidates = serverByFoldedName.get(localItem.name.casefold())
+        if candidates is not None and len(candidates) == 1:
+            # the server item cannot match another local item
+            serverByFoldedName[localItem.name.casefold()] = []
+            funcUpdateFound(candidates[0], localItem)
+        else:
+            funcUpdateNotFound(localItem)
+            itemsToAdd.append(localItem)
+
+    return serverItems + itemsToAdd
+
+
+class ListingDiff:
+    """The row changes that turn one listing into another.
+
+    removed are the (first, last) row ranges to remove, from the bottom up,
+    such that the rows of the next range are unaffected.  inserted are the
+    ranges of rows of the new listing to insert after that, from the top
+    down.  changed are the ranges of rows of the new listing that replace an
+    item that is not the same.
+    """
+
+    def __init__(self, removed, inserted, changed):
+        self.removed = removed
+        self.inserted = inserted
+        self.changed = changed
+
+    def is_empty(self):
+        return not (self.removed or self.inserted or self.changed)
+
+
+def _ranges(rows):
+    """Group ascending row numbers into (first, last) ranges."""
+    ranges = []
+    for row in rows:
+        if ranges and ranges[-1][1] == row - 1:
+            ranges[-1][1] = row
+        else:
+            ranges.append([row, row])
+    return [tuple(r) for r in ranges]
+
+
+def diff_listings(oldItems, newItems, key, same):
+    """Compute the ListingDiff from oldItems to newItems.
+
+    Items are identified by key(item), and same(oldItem, newItem) tells
+    whether an item changed.  Returns None if the listings cannot be diffed:
+    if keys are not unique or the items that both have are in a different
+    order, which calls for a reset of the whole listing.
+
+    The diff is linear in the size of the listings.
+    """
+    oldKeys = [key(item) for item in oldItems]
+    newKeys = [key(item) for item in newItems]
+    oldRows = {k: row for row, k in enumerate(oldKeys)}
+    newRows = {k: row for row, k in enumerate(newKeys)}
+    if len(oldRows) != len(oldKeys) or len(newRows) != len(newKeys):
+        return None
+
+    kept = [k for k in oldKeys if k in newRows]
+    if kept != [k for k in newKeys if k in oldRows]:
+        return None
+
+    removed = _ranges(row for row, k in enumerate(oldKeys) if k not in newRows)
+    inserted = _ranges(row for row, k in enumerate(newKeys) if k not in oldRows)
+    changed = _ranges(
+        row
+        for row, k in enumerate(newKeys)
+        if k in oldRows and not same(oldItems[oldRows[k]], newItems[row])
+    )
+    return ListingDiff(removed[::-1], inserted, changed)
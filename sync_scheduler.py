@@ -0,0 +1,88 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+from PySide.QtCore import QObject, QTimer
+
+import Utils
+from transport.instrumentation import caller
+from transport.schedule import Schedule
+
+logger = Utils.getLogger(__name__)
+
+
+class SyncScheduler(QObject):
+    """Runs all periodic refreshes of the addon on the Qt main thread.
+
+    A single timer fires when the next job is due.  Jobs are added and
+    removed by name, for example when a model is replaced:
+
+        scheduler.add("files", refresh, 60, min_interval=15, max_interval=600)
+        scheduler.remove("files")
+
+    While paused, for example because the Lens tab is hidden, nothing runs.
+    The live list of jobs is available from the Python console:
+
+        WorkspaceView.wsv.scheduler.jobs()
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.schedule = Schedule(on_error=self._log_error)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._run_due)
+
+    def _log_error(self, job, exception):
+        logger.error(f"Refresh {job.name} failed: {exception}")
+
+    def _rearm(self):
+        deadline = self.schedule.next_deadline()
+        if deadline is None:
+            self.timer.stop()
+            return
+        delay = max(0.0, deadline - self.schedule.clock())
+        self.timer.start(int(delay * 1000))
+
+    def _run_due(self):
+        # the calls of the jobs are attributed to the timer
+        with caller("timer"):
+            self.schedule.run_due()
+        self._rearm()
+
+    def add(self, name, func, interval, min_interval=None, max_interval=None):
+        """Add a job that runs func every interval seconds.
+
+        func returns True if it observed a change and False if not, to adapt
+        the interval between min_interval and max_interval.
+        """
+        job = self.schedule.add(name, func, interval, min_interval, max_interval)
+        self._rearm()
+        return job
+
+    def record_change(self, name, changed):
+        """Adapt the job name to a change observed outside of its runs."""
+        if self.schedule.record_change(name, changed):
+            self._rearm()
+
+    def remove(self, name):
+        self.schedule.remove(name)
+        self._rearm()
+
+    def pause(self):
+        self.schedule.pause()
+        self.timer.stop()
+
+    def resume(self):
+        if self.schedule.paused:
+            self.schedule.resume()
+            self._rearm()
+
+    def stop(self):
+        self.schedule.clear()
+        self.timer.stop()
+
+    def jobs(self):
+        return self.schedule.jobs()
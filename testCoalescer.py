@@ -0,0 +1,47 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import unittest
+
+from benchmarks.fake_clock import Clock
+from transport.coalescer import EventCoalescer
+
+
+class TestEventCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.coalescer = EventCoalescer(window=0.3, max_delay=2.0, clock=self.clock)
+
+    def test_burst(self):
+        # a save: temporary file, rename and backup
+        for path in ["/ws/a.FCStd.tmp", "/ws", "/ws", "/ws/a.FCBak"]:
+            self.assertAlmostEqual(self.coalescer.add(path), 0.3)
+            self.clock.now += 0.05
+        self.assertEqual(
+            self.coalescer.take(), {"/ws/a.FCStd.tmp", "/ws", "/ws/a.FCBak"}
+        )
+        self.assertEqual(self.coalescer.get_stats(), {"events": 4, "batches": 1})
+
+    def test_max_delay(self):
+        delays = []
+        for _ in range(20):
+            delays.append(self.coalescer.add("/ws"))
+            self.clock.now += 0.2
+        # the batch is due 2 seconds after the first event at the latest
+        self.assertEqual(delays[-1], 0.0)
+        self.assertAlmostEqual(delays[9], 0.2)
+
+    def test_take_starts_new_batch(self):
+        self.coalescer.add("/ws")
+        self.coalescer.take()
+        self.assertEqual(self.coalescer.take(), set())
+        self.clock.now = 10
+        self.assertAlmostEqual(self.coalescer.add("/ws"), 0.3)
+        self.assertEqual(self.coalescer.get_stats()["batches"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
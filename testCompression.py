@@ -0,0 +1,199 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from benchmarks.fake_lens_server import EMAIL, PASSWORD, FakeLensServer
+from transport import compression, downloads
+from transport.range_download import RangeDownload
+from transport.uploads import MultipartFileEncoder
+
+PATH_DOCUMENT = os.path.join(os.path.dirname(__file__), "testshape.FCStd")
+
+STEP = b"".join(
+    b"#%d=CARTESIAN_POINT('',(%d.,%d.,0.));\n" % (i, i % 97, i % 13)
+    for i in range(20000)
+)
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_is_compressible(self):
+        self.assertTrue(compression.is_compressible(self.write("part.step", STEP)))
+        self.assertTrue(compression.is_compressible(self.write("part.dat", STEP)))
+        self.assertFalse(compression.is_compressible(self.write("small.step", b"x")))
+        self.assertFalse(
+            compression.is_compressible(self.write("noise.dat", os.urandom(10**5)))
+        )
+        # FCStd files are zip archives
+        path = os.path.join(self.tmpdir.name, "part.FCStd")
+        shutil.copy(PATH_DOCUMENT, path)
+        self.assertFalse(compression.is_compressible(path))
+        self.assertFalse(compression.is_compressible(path + ".missing"))
+
+    def test_compressing_body(self):
+        body = compression.CompressingBody(io.BytesIO(STEP), "gzip", chunk_size=1000)
+        wire = b"".join(body)
+        self.assertEqual(gzip.decompress(wire), STEP)
+        self.assertEqual(body.raw_bytes, len(STEP))
+        self.assertEqual(body.wire_bytes, len(wire))
+        self.assertLess(len(wire), len(STEP) / 5)
+
+        body = compression.CompressingBody(io.BytesIO(STEP), "gzip")
+        self.assertEqual(gzip.decompress(body.read(10) + body.read()), STEP)
+
+    def test_negotiation(self):
+        path = self.write("part.stp", STEP)
+        negotiation = compression.UploadCompression(["zstd", "gzip"])
+        self.assertEqual(negotiation.encoding_for(path), "zstd")
+        negotiation.reject("zstd")
+        self.assertEqual(negotiation.encoding_for(path), "gzip")
+        negotiation.reject("gzip")
+        self.assertIsNone(negotiation.encoding_for(path))
+
+    def test_upload_fallback(self):
+        path = self.write("part.step", STEP)
+        negotiation = compression.UploadCompression(["gzip"])
+        sent = []
+
+        def send(encoding, fails=(), error=ValueError):
+            sent.append(encoding)
+            if encoding in fails:
+                raise error(encoding)
+            return encoding
+
+        # a failure without the coding too is not the coding's fault
+        with self.assertRaises(ValueError):
+            negotiation.upload(path, lambda e: send(e, ("gzip", None)), ValueError)
+        self.assertEqual(sent, ["gzip", None])
+        self.assertEqual(negotiation.encoding_for(path), "gzip")
+
+        # other errors are not retried
+        with self.assertRaises(KeyError):
+            negotiation.upload(path, lambda e: send(e, ("gzip",), KeyError), ValueError)
+
+        # a coding refused in any way is rejected
+        sent.clear()
+        self.assertIsNone(
+            negotiation.upload(path, lambda e: send(e, ("gzip",)), ValueError)
+        )
+        self.assertEqual(sent, ["gzip", None])
+        self.assertIsNone(negotiation.encoding_for(path))
+
+    def test_transfer_stats(self):
+        stats = compression.TransferStats(max_recent=1)
+        stats.record("upload", "a.step", "gzip", 1000, 200)
+        stats.record("upload", "b.FCStd", None, 500, 500)
+        self.assertEqual(
+            stats.get_stats()["upload"],
+            {
+                "transfers": 2,
+                "compressed": 1,
+                "rawBytes": 1500,
+                "wireBytes": 700,
+                "savedBytes": 800,
+            },
+        )
+        self.assertEqual(stats.get_recent()[0]["encoding"], "identity")
+
+
+class TestCompressedTransfers(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.tmpdir.cleanup()
+
+    def login(self, server):
+        response = self.session.post(
+            f"{server.url}/authentication",
+            data=json.dumps(
+                {"strategy": "local", "email": EMAIL, "password": PASSWORD}
+            ),
+        )
+        token = response.json()["accessToken"]
+        self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def upload(self, server, name, encoding):
+        with tempfile.TemporaryFile() as fh:
+            fh.write(STEP)
+            fh.seek(0)
+            body = MultipartFileEncoder("file", name, fh)
+            headers = {"Content-Type": body.content_type}
+            if encoding:
+                body = compression.CompressingBody(body, encoding)
+                headers["Content-Encoding"] = encoding
+            return self.session.post(f"{server.url}/upload", data=body, headers=headers)
+
+    def test_upload_and_download(self):
+        with FakeLensServer() as server:
+            self.login(server)
+            response = self.upload(server, "part.step", "gzip")
+            self.assertEqual(response.status_code, 201)
+            url = self.session.get(f"{server.url}/upload/part.step").json()["url"]
+
+            response = self.session.get(
+                url,
+                headers={"Accept-Encoding": compression.accept_encoding()},
+                stream=True,
+            )
+            self.assertEqual(downloads.get_content_encoding(response), "gzip")
+            reported = []
+            with io.BytesIO() as fh:
+                size = downloads.stream_to_handle(
+                    response, fh, lambda done, total: reported.append((done, total))
+                )
+                self.assertEqual(fh.getvalue(), STEP)
+            self.assertEqual(size, len(STEP))
+            wire = downloads.wire_bytes(response, size)
+            self.assertLess(wire, size / 5)
+            # the progress is in compressed bytes, as the Content-Length is
+            self.assertEqual(reported[-1], (wire, wire))
+
+            # ranges of a blob are never compressed
+            path = os.path.join(self.tmpdir.name, "part.step")
+            download = RangeDownload(
+                self.session.get,
+                url,
+                path,
+                "part",
+                accept_encoding=compression.accept_encoding(),
+            )
+            self.assertEqual(download.run(), len(STEP))
+            self.assertIsNone(download.encoding)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), STEP)
+
+    def test_compressed_uploads_rejected(self):
+        with FakeLensServer(compressed_uploads=False) as server:
+            self.login(server)
+            self.assertEqual(self.upload(server, "part.step", "gzip").status_code, 415)
+            self.assertEqual(self.upload(server, "part.step", None).status_code, 201)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import threading
+import unittest
+
+from transport.connectivity import ConnectivityTracker, ConnectivityState
+
+
+class TestConnectivityTracker(unittest.TestCase):
+    def setUp(self):
+        self.probe_result = False
+        self.probed = threading.Event()
+        self.states = []
+
+        def probe():
+            self.probed.set()
+            return self.probe_result
+
+        self.tracker = ConnectivityTracker(
+            probe, max_soft_failures=2, delay_initial=0.01, delay_max=0.02
+        )
+        self.tracker.add_listener(self.states.append)
+
+    def tearDown(self):
+        self.tracker.stop()
+
+    def test_soft_failures_degrade(self):
+        self.tracker.record_failure()
+        self.assertEqual(self.tracker.state, ConnectivityState.DEGRADED)
+        self.tracker.record_success()
+        self.assertEqual(self.tracker.state, ConnectivityState.ONLINE)
+        self.assertEqual(
+            self.states, [ConnectivityState.DEGRADED, ConnectivityState.ONLINE]
+        )
+
+    def test_repeated_soft_failures_go_offline(self):
+        self.tracker.record_failure()
+        self.tracker.record_failure()
+        self.assertTrue(self.tracker.is_offline())
+
+    def test_probe_restores_online(self):
+        self.tracker.record_failure(conclusive=True)
+        self.assertTrue(self.tracker.is_offline())
+        self.assertTrue(self.probed.wait(1))
+        self.probe_result = True
+        self.tracker._probe_thread.join(1)
+        self.assertEqual(self.tracker.state, ConnectivityState.ONLINE)
+        self.assertEqual(
+            self.states, [ConnectivityState.OFFLINE, ConnectivityState.ONLINE]
+        )
+
+    def test_probe_now(self):
+        now = [0]
+        tracker = ConnectivityTracker(
+            lambda: self.probe_result,
+            delay_initial=60,
+            probe_now_min_interval=5,
+            clock=lambda: now[0],
+        )
+        probes = []
+
+        def probe():
+            probes.append(now[0])
+            return self.probe_result
+
+        self.assertTrue(tracker.probe_now(probe))
+        self.assertEqual(probes, [])
+
+        tracker.record_failure(conclusive=True)
+        self.assertFalse(tracker.probe_now(probe))
+        # rate limited
+        now[0] = 4
+        self.probe_result = True
+        self.assertFalse(tracker.probe_now(probe))
+        self.assertEqual(probes, [0])
+
+        now[0] = 5
+        self.assertTrue(tracker.probe_now(probe))
+        self.assertEqual(probes, [0, 5])
+        self.assertEqual(tracker.state, ConnectivityState.ONLINE)
+        tracker.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import json
+import tempfile
+import time
+import unittest
+
+import requests
+
+from benchmarks.fake_lens_server import EMAIL, PASSWORD, FakeLensServer
+from transport.token_manager import decode_expiry
+from transport.uploads import MultipartFileEncoder
+
+
+class TestFakeLensServer(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeLensServer().start()
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+
+    def call(self, method, endpoint, payload=None, **kwargs):
+        if payload is not None:
+            kwargs["data"] = json.dumps(payload)
+        return self.session.request(method, f"{self.server.url}/{endpoint}", **kwargs)
+
+    def login(self):
+        response = self.call(
+            "POST",
+            "authentication",
+            {"strategy": "local", "email": EMAIL, "password": PASSWORD},
+        )
+        self.assertEqual(response.status_code, 201)
+        token = response.json()["accessToken"]
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        return token
+
+    def test_authentication(self):
+        self.assertEqual(self.call("GET", "workspaces").status_code, 401)
+        response = self.call(
+            "POST",
+            "authentication",
+            {"strategy": "local", "email": EMAIL, "password": "wrong"},
+        )
+        self.assertEqual(response.status_code, 401)
+
+        token = self.login()
+        self.assertGreater(decode_expiry(token), time.time())
+        self.assertEqual(self.call("GET", "workspaces").status_code, 200)
+        response = self.call(
+            "POST", "authentication", {"strategy": "jwt", "accessToken": token}
+        )
+        self.assertNotEqual(response.json()["accessToken"], token)
+
+    def test_find_pages(self):
+        self.login()
+        orgId = self.server.workspace["organizationId"]
+        for i in range(60):
+            self.call(
+                "POST",
+                "workspaces",
+                {"name": f"w{i}", "description": "", "organizationId": orgId},
+            )
+        page = self.call("GET", "workspaces", params={"$skip": 50}).json()
+        self.assertEqual(page["total"], 61)
+        self.assertEqual(len(page["data"]), 11)
+        page = self.call(
+            "GET", "workspaces", params={"$limit": 5, "$sort[createdAt]": -1}
+        ).json()
+        self.assertEqual(len(page["data"]), 5)
+        page = self.call("GET", "workspaces", params={"name": "w3"}).json()
+        self.assertEqual(page["total"], 1)
+
+    def test_files(self):
+        self.login()
+        workspace = self.server.workspace
+        root = workspace["rootDirectory"]
+        summary = {k: workspace[k] for k in ("_id", "name", "refName", "open")}
+        directory = self.call(
+            "POST",
+            "directories",
+            {"name": "sub", "workspace": summary, "parentDirectory": root},
+        ).json()
+
+        content = b"content" * 1000
+        with tempfile.TemporaryFile() as fh:
+            fh.write(content)
+            fh.seek(0)
+            body = MultipartFileEncoder("file", "blob.fcstd", fh)
+            response = self.call(
+                "POST", "upload", data=body, headers={"Content-Type": body.content_type}
+            )
+        self.assertEqual(response.status_code, 201)
+
+        version = {"uniqueFileName": "blob.fcstd", "message": "Initial commit"}
+        f = self.call(
+            "POST",
+            "file",
+            {
+                "custFileName": "part.FCStd",
+                "version": version,
+                "directory": directory,
+                "workspace": summary,
+            },
+        ).json()
+        self.call(
+            "PATCH",
+            f"file/{f['_id']}",
+            {"shouldCommitNewVersion": True, "version": version},
+        )
+        listing = self.call("GET", f"directories/{directory['_id']}").json()
+        self.assertEqual(listing["files"][0]["custFileName"], "part.FCStd")
+        self.assertEqual(
+            len(self.call("GET", f"file/{f['_id']}").json()["versions"]), 2
+        )
+        root_listing = self.call("GET", f"directories/{root['_id']}").json()
+        self.assertEqual(root_listing["directories"][0]["name"], "sub")
+
+        url = self.call("GET", "upload/blob.fcstd").json()["url"]
+        self.assertEqual(self.session.get(url).content, content)
+        response = self.session.get(url, headers={"Range": "bytes=0-6"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b"content")
+
+        response = self.call("DELETE", f"directories/{directory['_id']}")
+        self.assertEqual(response.status_code, 400)
+        self.call("DELETE", f"file/{f['_id']}")
+        self.assertEqual(
+            self.call("DELETE", f"directories/{directory['_id']}").status_code, 200
+        )
+        self.assertEqual(self.call("GET", f"file/{f['_id']}").status_code, 404)
+
+    def test_conditional_get(self):
+        self.login()
+        response = self.call("GET", "organizations")
+        etag = response.headers["ETag"]
+        response = self.call("GET", "organizations", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_network_conditions(self):
+        self.server.stop()
+        self.server = FakeLensServer(latency=0.05, failure_rate=0.5, seed=3).start()
+        statuses = []
+        start = time.perf_counter()
+        for _ in range(10):
+            statuses.append(self.call("GET", "keywords").status_code)
+        self.assertGreater(time.perf_counter() - start, 0.5)
+        self.assertIn(503, statuses)
+        self.assertIn(200, statuses)
+        self.assertEqual(sum(self.server.calls.values()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import requests
+
+from benchmarks.range_file_server import RangeFileServer
+from transport.instrumentation import (
+    Histogram,
+    Instrumentation,
+    caller,
+    current_caller,
+    endpoint_template,
+    tag_caller,
+)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_endpoint_template(self):
+        self.assertEqual(
+            endpoint_template("/file/65a1b2c3d4e5f6a7b8c9d0e1"), "file/:id"
+        )
+        self.assertEqual(
+            endpoint_template("upload/c4481734-c18f-4b8c-8867-9694ae2a9f5a.fcstd"),
+            "upload/:id",
+        )
+        self.assertEqual(endpoint_template("workspaces"), "workspaces")
+
+    def test_histogram(self):
+        histogram = Histogram([10, 100])
+        for value in [1, 5, 50, 500]:
+            histogram.add(value)
+        self.assertEqual(histogram.as_dict(), {"<=10": 2, "<=100": 1, ">100": 1})
+        self.assertEqual(histogram.percentile(50), 10)
+        self.assertIsNone(histogram.percentile(95))
+
+    def test_caller(self):
+        self.assertEqual(current_caller(), "user")
+        with caller("timer"):
+            self.assertEqual(current_caller(), "timer")
+            with caller("watcher"):
+                self.assertEqual(current_caller(), "watcher")
+            self.assertEqual(tag_caller("click", current_caller)(), "click")
+        self.assertEqual(current_caller(), "user")
+
+        callers = []
+        thread = threading.Thread(target=lambda: callers.append(current_caller()))
+        thread.start()
+        thread.join()
+        self.assertEqual(callers, ["background"])
+
+    def test_record(self):
+        data = b"x" * 1000
+        with RangeFileServer(data) as server:
+            base_url = server.url.rsplit("/", 1)[0]
+            instrumentation = Instrumentation(base_url)
+            for _ in range(3):
+                response = requests.get(server.url)
+                instrumentation.record("GET", server.url, 0.02, response=response)
+            with caller("timer"):
+                instrumentation.record(
+                    "GET", f"{base_url}/file/{'a' * 24}", 2.0, error=OSError()
+                )
+
+        endpoints = {e["endpoint"]: e for e in instrumentation.summary()}
+        blob = endpoints["blob"]
+        self.assertEqual(blob["calls"], 3)
+        self.assertEqual(blob["responseBytes"], 3000)
+        self.assertEqual(blob["statuses"], {"200": 3})
+        self.assertEqual(blob["callers"], {"user": 3})
+        failed = endpoints["file/:id"]
+        self.assertEqual(failed["errors"], 1)
+        self.assertEqual(failed["callers"], {"timer": 1})
+        self.assertEqual(instrumentation.summary()[0], failed)
+        self.assertEqual(instrumentation.slowest(1)[0]["endpoint"], "file/:id")
+        self.assertEqual(len(instrumentation.recent(caller="user")), 3)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "calls.json")
+            instrumentation.dump(path)
+            with open(path) as f:
+                dumped = json.load(f)
+        self.assertEqual(len(dumped["endpoints"]), 2)
+        self.assertEqual(len(dumped["recent"]), 4)
+
+        instrumentation.reset()
+        self.assertEqual(instrumentation.summary(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import queue
+import threading
+import unittest
+
+from transport.instrumentation import caller, current_caller
+from transport.latest_only import LatestOnly
+
+
+class TestLatestOnly(unittest.TestCase):
+    def setUp(self):
+        self.delivered = queue.Queue()
+        self.runner = LatestOnly(lambda *result: self.delivered.put(result), workers=2)
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def next_result(self):
+        return self.delivered.get(timeout=5)
+
+    def test_latest_applied(self):
+        generation = self.runner.start(lambda: "listing")
+        self.assertEqual(self.next_result(), (generation, "listing", None))
+        self.assertTrue(self.runner.is_current(generation))
+        with self.runner.applying():
+            pass
+        stats = self.runner.get_stats()
+        self.assertEqual((stats["applied"], stats["dropped"]), (1, 0))
+        self.assertIsNotNone(stats["workerMsPerRun"])
+        self.assertIsNotNone(stats["applyMsPerRun"])
+
+    def test_overtaken_dropped(self):
+        release = threading.Event()
+        slow = self.runner.start(lambda: release.wait(5) and "old directory")
+        fast = self.runner.start(lambda: "new directory")
+        self.assertEqual(self.next_result(), (fast, "new directory", None))
+        release.set()
+        self.assertEqual(self.next_result(), (slow, "old directory", None))
+        self.assertFalse(self.runner.is_current(slow))
+        self.assertTrue(self.runner.is_current(fast))
+        self.assertEqual(self.runner.get_stats()["dropped"], 1)
+
+    def test_bump(self):
+        generation = self.runner.start(lambda: "listing")
+        self.next_result()
+        # e.g. refreshed on the GUI thread meanwhile
+        self.runner.bump()
+        self.assertFalse(self.runner.is_current(generation))
+
+    def test_error(self):
+        def fail():
+            raise OSError("offline")
+
+        generation = self.runner.start(fail)
+        _, result, error = self.next_result()
+        self.assertIsNone(result)
+        self.assertIsInstance(error, OSError)
+        self.assertEqual(self.runner.get_stats()["errors"], 1)
+        self.assertTrue(self.runner.is_current(generation))
+
+    def test_caller(self):
+        with caller("timer"):
+            self.runner.start(current_caller)
+        self.assertEqual(self.next_result()[1], "timer")
+
+
+if __name__ == "__main__":
+    unittest.main()
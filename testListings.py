@@ -0,0 +1,117 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import tempfile
+import time
+import unittest
+
+from benchmarks.bench_merge import Item, make_listings
+from listings import diff_listings, is_case_insensitive, merge_listings
+
+
+class TestMergeListings(unittest.TestCase):
+    def merge(self, serverNames, localNames, ignoreCase=False):
+        found = []
+        notFound = []
+        merged = merge_listings(
+            [Item(n) for n in serverNames],
+            [Item(n) for n in localNames],
+            lambda s, l: found.append((s.name, l.name)),
+            lambda l: notFound.append(l.name),
+            ignoreCase=ignoreCase,
+        )
+        return [i.name for i in merged], found, notFound
+
+    def test_merge(self):
+        merged, found, notFound = self.merge(["a", "b", "c"], ["c", "d", "a"])
+        self.assertEqual(merged, ["a", "b", "c", "d"])
+        self.assertEqual(found, [("c", "c"), ("a", "a")])
+        self.assertEqual(notFound, ["d"])
+
+    def test_case(self):
+        merged, found, notFound = self.merge(["Part.FCStd"], ["part.FCStd"])
+        self.assertEqual(merged, ["Part.FCStd", "part.FCStd"])
+        self.assertEqual(notFound, ["part.FCStd"])
+
+        merged, found, notFound = self.merge(
+            ["Part.FCStd"], ["part.FCStd"], ignoreCase=True
+        )
+        self.assertEqual(merged, ["Part.FCStd"])
+        self.assertEqual(found, [("Part.FCStd", "part.FCStd")])
+
+    def test_case_exact_wins(self):
+        merged, found, notFound = self.merge(
+            ["Part.FCStd", "part.FCStd"], ["part.FCStd"], ignoreCase=True
+        )
+        self.assertEqual(found, [("part.FCStd", "part.FCStd")])
+        self.assertEqual(notFound, [])
+
+    def test_case_ambiguous(self):
+        merged, found, notFound = self.merge(
+            ["Part.FCStd", "part.FCStd"], ["PART.FCStd"], ignoreCase=True
+        )
+        self.assertEqual(found, [])
+        self.assertEqual(notFound, ["PART.FCStd"])
+
+    def test_linear(self):
+        serverItems, localItems = make_listings(50000)
+        start = time.perf_counter()
+        merge_listings(serverItems, localItems, lambda s, l: None, lambda l: None, True)
+        # the nested loop of old takes minutes
+        self.assertLess(time.perf_counter() - start, 2)
+
+    def test_is_case_insensitive(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.assertIsInstance(is_case_insensitive(path), bool)
+
+
+class TestDiffListings(unittest.TestCase):
+    def diff(self, old, new):
+        # items are (name, content) pairs
+        return diff_listings(
+            old, new, key=lambda item: item[0], same=lambda a, b: a == b
+        )
+
+    def apply(self, old, new):
+        """Apply the diff to old like a model does."""
+        diff = self.diff(old, new)
+        rows = list(old)
+        for first, last in diff.removed:
+            del rows[first : last + 1]
+        for first, last in diff.inserted:
+            rows[first:first] = new[first : last + 1]
+        self.assertEqual([r[0] for r in rows], [n[0] for n in new])
+        return diff
+
+    def test_diff(self):
+        old = [("a", 1), ("b", 1), ("c", 1), ("d", 1), ("e", 1)]
+        new = [("a", 1), ("aa", 1), ("ab", 1), ("c", 2), ("e", 1), ("f", 1)]
+        diff = self.apply(old, new)
+        self.assertEqual(diff.removed, [(3, 3), (1, 1)])
+        self.assertEqual(diff.inserted, [(1, 2), (5, 5)])
+        self.assertEqual(diff.changed, [(3, 3)])
+
+    def test_unchanged(self):
+        old = [("a", 1), ("b", 1)]
+        self.assertTrue(self.apply(old, list(old)).is_empty())
+        self.assertEqual(self.apply([], old).inserted, [(0, 1)])
+        self.assertEqual(self.apply(old, []).removed, [(0, 1)])
+
+    def test_reset(self):
+        self.assertIsNone(self.diff([("a", 1), ("b", 1)], [("b", 1), ("a", 1)]))
+        self.assertIsNone(self.diff([("a", 1)], [("a", 1), ("a", 2)]))
+
+    def test_linear(self):
+        old = [(f"{i:06d}", 0) for i in range(50000)]
+        new = [(name, i % 100 == 0) for i, (name, _) in enumerate(old) if i % 7]
+        start = time.perf_counter()
+        diff = self.diff(old, new)
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual(len(diff.changed), len([n for n in new if n[1]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
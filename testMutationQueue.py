@@ -0,0 +1,124 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import os
+import tempfile
+import unittest
+
+from transport.mutation_queue import MutationConflict, MutationQueue
+
+
+class TestMutationQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, ".lens", "pending.json")
+        self.applied = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def execute(self, entry, batch):
+        batch["seen"] = batch.get("seen", 0) + 1
+        self.applied.append((entry["op"], entry["args"]["path"], batch["seen"]))
+
+    def test_persistent(self):
+        queue = MutationQueue(self.path)
+        queue.add("createDir", "dir:a", path="a")
+        queue.add("upload", "upload:a/b", path="a/b")
+        reloaded = MutationQueue(self.path)
+        self.assertEqual(
+            [e["key"] for e in reloaded.pending()], ["dir:a", "upload:a/b"]
+        )
+        reloaded.add("upload", "upload:c", path="c")
+        self.assertEqual([e["id"] for e in reloaded.pending()], [1, 2, 3])
+
+    def test_collapse(self):
+        queue = MutationQueue(self.path)
+        queue.add("upload", "upload:a", path="a", message="first")
+        queue.add("createDir", "dir:b", path="b")
+        queue.add("upload", "upload:a", path="a", message="second")
+        pending = queue.pending()
+        self.assertEqual([e["key"] for e in pending], ["dir:b", "upload:a"])
+        self.assertEqual(queue.get("upload:a")["args"]["message"], "second")
+        self.assertIsNone(queue.get("upload:x"))
+
+    def test_cancel(self):
+        queue = MutationQueue(self.path)
+        queue.add("upload", "upload:a/b", path="a/b")
+        queue.add("upload", "upload:c", path="c")
+        removed = queue.cancel(lambda e: e["args"]["path"].startswith("a/"))
+        self.assertEqual(removed, 1)
+        self.assertEqual(len(MutationQueue(self.path)), 1)
+
+    def test_replay_in_batches(self):
+        queue = MutationQueue(self.path, batch_size=2)
+        for name in "abcde":
+            queue.add("upload", f"upload:{name}", path=name)
+        summary = queue.replay(self.execute)
+        self.assertEqual(summary["applied"], 5)
+        self.assertEqual(summary["remaining"], 0)
+        self.assertEqual([p for _, p, _ in self.applied], list("abcde"))
+        # the batch state is shared by the mutations of a batch only
+        self.assertEqual([s for _, _, s in self.applied], [1, 2, 1, 2, 1])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_conflict(self):
+        def execute(entry, batch):
+            if entry["args"]["path"] == "b":
+                raise MutationConflict("b changed on the server")
+            self.execute(entry, batch)
+
+        queue = MutationQueue(self.path)
+        for name in "abc":
+            queue.add("upload", f"upload:{name}", path=name)
+        summary = queue.replay(execute)
+        self.assertEqual(summary["applied"], 2)
+        self.assertEqual(len(summary["conflicts"]), 1)
+        entry, reason = summary["conflicts"][0]
+        self.assertEqual(entry["key"], "upload:b")
+        self.assertEqual(reason, "b changed on the server")
+        self.assertEqual(len(queue), 0)
+
+    def test_offline_again(self):
+        def execute(entry, batch):
+            if entry["args"]["path"] == "b":
+                raise OSError("offline")
+            self.execute(entry, batch)
+
+        queue = MutationQueue(self.path, batch_size=10)
+        for name in "abc":
+            queue.add("upload", f"upload:{name}", path=name)
+        summary = queue.replay(execute)
+        self.assertEqual(summary["applied"], 1)
+        self.assertIsInstance(summary["error"], OSError)
+        self.assertEqual(summary["remaining"], 2)
+        reloaded = MutationQueue(self.path)
+        self.assertEqual(
+            [e["key"] for e in reloaded.pending()], ["upload:b", "upload:c"]
+        )
+
+        self.applied = []
+        summary = reloaded.replay(self.execute)
+        self.assertEqual([p for _, p, _ in self.applied], ["b", "c"])
+
+    def test_added_during_replay(self):
+        queue = MutationQueue(self.path)
+        queue.add("upload", "upload:a", path="a")
+
+        def execute(entry, batch):
+            self.execute(entry, batch)
+            # the file changes again while its upload is replayed
+            if len(self.applied) == 1:
+                queue.add("upload", "upload:a", path="a")
+                self.assertIsNone(queue.replay(self.execute))
+
+        summary = queue.replay(execute)
+        self.assertEqual(summary["applied"], 2)
+        self.assertEqual(len(self.applied), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
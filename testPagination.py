@@ -0,0 +1,60 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import unittest
+
+from transport.pagination import iter_pages, fetch_all
+
+
+class FakeFindEndpoint:
+    """Responds to find queries like a Feathers service would."""
+
+    def __init__(self, total):
+        self.items = list(range(total))
+        self.queries = []
+
+    def __call__(self, params):
+        self.queries.append(params)
+        skip = params["$skip"]
+        limit = params["$limit"]
+        return {
+            "total": len(self.items),
+            "limit": limit,
+            "skip": skip,
+            "data": self.items[skip : skip + limit],
+        }
+
+
+class TestPagination(unittest.TestCase):
+    def test_all_items_are_returned(self):
+        endpoint = FakeFindEndpoint(301)
+        self.assertEqual(fetch_all(endpoint, page_size=50), endpoint.items)
+        self.assertEqual(len(endpoint.queries), 7)
+
+    def test_pages(self):
+        endpoint = FakeFindEndpoint(120)
+        pages = list(iter_pages(endpoint, {"name": "x"}, page_size=50))
+        self.assertEqual([len(page) for page in pages], [50, 50, 20])
+        self.assertTrue(all(q["name"] == "x" for q in endpoint.queries))
+
+    def test_empty(self):
+        endpoint = FakeFindEndpoint(0)
+        self.assertEqual(list(iter_pages(endpoint)), [[]])
+
+    def test_error_is_raised_when_consumed(self):
+        def fetch_page(params):
+            if params["$skip"] > 0:
+                raise RuntimeError("page failed")
+            return {"total": 100, "data": list(range(50))}
+
+        pages = iter_pages(fetch_page)
+        self.assertEqual(len(next(pages)), 50)
+        with self.assertRaises(RuntimeError):
+            next(pages)
+
+
+if __name__ == "__main__":
+    unittest.main()
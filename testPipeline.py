@@ -0,0 +1,103 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import threading
+import time
+import unittest
+
+from transport.pipeline import Pipeline, Stage, Job, JobStatus
+
+
+class TestPipeline(unittest.TestCase):
+    def test_stages_in_order(self):
+        def double(job):
+            job.data["value"] *= 2
+
+        def add(job):
+            job.data["value"] += 1
+            job.size = 10
+
+        jobs = [Job(str(i), value=i) for i in range(20)]
+        summary = (
+            Pipeline([Stage("double", double, 3), Stage("add", add, 2)])
+            .start(jobs)
+            .wait(5)
+        )
+        self.assertEqual(
+            [job.data["value"] for job in jobs], [2 * i + 1 for i in range(20)]
+        )
+        self.assertEqual(summary["done"], 20)
+        self.assertEqual(summary["bytes"], 200)
+
+    def test_failure_skips_stages(self):
+        reached = []
+
+        def check(job):
+            if job.name == "bad":
+                raise ValueError("links")
+
+        jobs = [Job("good"), Job("bad")]
+        summary = (
+            Pipeline([Stage("check", check), Stage("upload", reached.append)])
+            .start(jobs)
+            .wait(5)
+        )
+        self.assertEqual(reached, [jobs[0]])
+        self.assertEqual(jobs[1].status, JobStatus.FAILED)
+        self.assertEqual(jobs[1].stage, "check")
+        self.assertEqual(summary["failed"], 1)
+
+    def test_bounded_workers(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def upload(job):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+
+        Pipeline([Stage("upload", upload, 3)]).start(
+            Job(str(i)) for i in range(20)
+        ).wait(5)
+        self.assertEqual(peak[0], 3)
+
+    def test_callbacks(self):
+        statuses = []
+        finished = threading.Event()
+        summaries = []
+
+        def on_finished(summary):
+            summaries.append(summary)
+            finished.set()
+
+        Pipeline(
+            [Stage("a", lambda job: None), Stage("b", lambda job: None)],
+            on_status=lambda job: statuses.append((job.stage, job.status)),
+            on_finished=on_finished,
+        ).start([Job("x")])
+        self.assertTrue(finished.wait(5))
+        self.assertEqual(
+            statuses,
+            [
+                ("a", JobStatus.RUNNING),
+                ("b", JobStatus.RUNNING),
+                ("b", JobStatus.DONE),
+            ],
+        )
+        self.assertEqual(summaries[0]["done"], 1)
+
+    def test_empty(self):
+        pipeline = Pipeline([Stage("a", lambda job: None)]).start([])
+        self.assertTrue(pipeline.is_finished())
+        self.assertEqual(pipeline.summary()["jobs"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import os
+import tempfile
+import unittest
+
+import requests
+
+from benchmarks.range_file_server import RangeFileServer
+from transport.downloads import is_partial_download, PARTIAL_SUFFIX
+from transport.range_download import RangeDownload, DownloadJournal
+
+SIZE = 1024 * 1024 + 123
+
+
+class TestRangeDownload(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "part.FCStd")
+        self.data = os.urandom(SIZE)
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.tmpdir.cleanup()
+
+    def download(self, server, **kwargs):
+        kwargs.setdefault("retry_delay", 0)
+        kwargs.setdefault("chunk_size", 64 * 1024)
+        return RangeDownload(self.session.get, server.url, self.path, "key", **kwargs)
+
+    def assert_downloaded(self):
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(os.listdir(self.tmpdir.name), ["part.FCStd"])
+
+    def test_segments(self):
+        with RangeFileServer(self.data) as server:
+            download = self.download(server, min_size_parallel=0)
+            self.assertEqual(download.run(), SIZE)
+        self.assertEqual(len(download.segments), 4)
+        self.assert_downloaded()
+
+    def test_retry_after_disconnect(self):
+        with RangeFileServer(self.data, drops=3, drop_after=SIZE // 3) as server:
+            download = self.download(server, min_size_parallel=0, max_segments=2)
+            download.run()
+        self.assertGreater(download.retries, 0)
+        self.assert_downloaded()
+
+    def test_resume_later(self):
+        with RangeFileServer(self.data, drops=10, drop_after=SIZE // 2) as server:
+            download = self.download(server, max_attempts=2)
+            with self.assertRaises(requests.exceptions.RequestException):
+                download.run()
+        self.assertFalse(os.path.exists(self.path))
+        state = DownloadJournal(self.path).load()
+        self.assertGreater(state["segments"][0][2], 0)
+
+        with RangeFileServer(self.data) as server:
+            download = self.download(server)
+            download.run()
+        self.assertEqual(download.resumed_bytes, state["segments"][0][2])
+        self.assert_downloaded()
+
+    def test_restart_when_changed(self):
+        with RangeFileServer(self.data, drops=10, drop_after=SIZE // 2) as server:
+            with self.assertRaises(requests.exceptions.RequestException):
+                self.download(server, max_attempts=1).run()
+
+        self.data = os.urandom(SIZE)
+        with RangeFileServer(self.data, etag='"2"') as server:
+            download = self.download(server)
+            download.run()
+        self.assertEqual(download.resumed_bytes, 0)
+        self.assert_downloaded()
+
+    def test_restart_when_changed_during_run(self):
+        newData = os.urandom(SIZE + 1000)
+        with RangeFileServer(self.data) as server:
+
+            def get(url, **kwargs):
+                response = self.session.get(url, **kwargs)
+                if server.etag == '"1"':
+                    # the blob changes after the probe
+                    server.data = newData
+                    server.etag = '"2"'
+                return response
+
+            download = RangeDownload(
+                get, server.url, self.path, "key", retry_delay=0, chunk_size=64 * 1024
+            )
+            self.assertEqual(download.run(), len(newData))
+        self.data = newData
+        self.assertEqual(download.etag, '"2"')
+        self.assert_downloaded()
+
+    def test_no_range_support(self):
+        with RangeFileServer(self.data, support_ranges=False) as server:
+            self.download(server).run()
+        self.assert_downloaded()
+
+    def test_empty(self):
+        self.data = b""
+        with RangeFileServer(self.data) as server:
+            self.assertEqual(self.download(server).run(), 0)
+        self.assert_downloaded()
+
+    def test_partial_files_are_hidden(self):
+        self.assertTrue(is_partial_download("a.FCStd" + PARTIAL_SUFFIX))
+        self.assertTrue(is_partial_download(DownloadJournal("a.FCStd").path))
+        self.assertFalse(is_partial_download("a.FCStd"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import tempfile
+import unittest
+
+from transport.response_cache import ResponseCache, CacheEntry
+
+
+def make_entry(key, service="directories", body='{"name": "dir"}'):
+    return CacheEntry(key, service, '"etag"', None, body)
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(self.tmpdir.name, max_bytes=1000)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_ignores_param_order(self):
+        key1 = ResponseCache.make_key("u", "file", {"a": 1, "b": 2})
+        key2 = ResponseCache.make_key("u", "/file", {"b": 2, "a": 1})
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, ResponseCache.make_key("v", "file", {"a": 1}))
+
+    def test_put_get(self):
+        self.cache.put(make_entry("k1"))
+        entry = self.cache.get("k1")
+        self.assertEqual(entry.json(), {"name": "dir"})
+        self.assertEqual(entry.validators(), {"If-None-Match": '"etag"'})
+        self.assertIsNone(self.cache.get("k2"))
+
+    def test_persistent(self):
+        self.cache.put(make_entry("k1"))
+        cache = ResponseCache(self.tmpdir.name)
+        self.assertIsNotNone(cache.get("k1"))
+
+    def test_lru_eviction(self):
+        body = '"' + "x" * 300 + '"'
+        for key in ["k1", "k2"]:
+            self.cache.put(make_entry(key, body=body))
+        self.cache.get("k1")  # k2 becomes the least recently used
+        self.cache.put(make_entry("k3", body=body))
+        self.assertIsNotNone(self.cache.get("k1"))
+        self.assertIsNone(self.cache.get("k2"))
+        self.assertIsNotNone(self.cache.get("k3"))
+
+    def test_invalidate(self):
+        self.cache.put(make_entry("k1", service="directories"))
+        self.cache.put(make_entry("k2", service="organizations"))
+        self.cache.invalidate(["directories", "workspaces"])
+        self.assertIsNone(self.cache.get("k1"))
+        self.assertIsNotNone(self.cache.get("k2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import io
+import unittest
+from unittest import mock
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from transport.retry import RetryPolicy, parse_retry_after, is_connect_error
+
+
+def make_response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.raw = io.BytesIO()
+    response.headers.update(headers or {})
+    return response
+
+
+def make_send(*outcomes):
+    """Return a send function that returns or raises the outcomes in turn."""
+    outcomes = list(outcomes)
+
+    def send():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return make_response(outcome) if isinstance(outcome, int) else outcome
+
+    return send
+
+
+def connect_error():
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "/", reason))
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.sleep = mock.Mock()
+        self.policy = RetryPolicy(sleep=self.sleep)
+
+    def test_retry_idempotent_status(self):
+        response = self.policy.call("GET", make_send(503, 502, 200))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sleep.call_count, 2)
+        stats = self.policy.stats.as_dict()
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["byReason"], {"503": 1, "502": 1})
+
+    def test_no_retry_post_status(self):
+        response = self.policy.call("POST", make_send(503, 200))
+        self.assertEqual(response.status_code, 503)
+        self.sleep.assert_not_called()
+
+    def test_retry_post_rejected(self):
+        response = self.policy.call("POST", make_send(429, 201))
+        self.assertEqual(response.status_code, 201)
+
+    def test_retry_post_connect_error(self):
+        response = self.policy.call("POST", make_send(connect_error(), 201))
+        self.assertEqual(response.status_code, 201)
+
+    def test_no_retry_post_reset(self):
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.policy.call(
+                "POST", make_send(requests.exceptions.ConnectionError("reset"), 201)
+            )
+
+    def test_retry_idempotent_patch(self):
+        send = make_send(requests.exceptions.ReadTimeout(), 200)
+        self.assertEqual(self.policy.call("PATCH", send, True).status_code, 200)
+
+    def test_give_up(self):
+        response = self.policy.call("GET", make_send(503, 503, 503, 503, 200))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.policy.stats.as_dict()["giveUps"], 1)
+
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.policy.call("GET", make_send(*[requests.exceptions.Timeout()] * 4))
+        self.assertEqual(self.policy.stats.as_dict()["giveUps"], 2)
+
+    def test_retry_after(self):
+        self.policy.call(
+            "GET", make_send(make_response(503, {"Retry-After": "3"}), 200)
+        )
+        self.sleep.assert_called_once_with(3)
+
+        self.sleep.reset_mock()
+        response = self.policy.call(
+            "GET", make_send(make_response(503, {"Retry-After": "3600"}), 200)
+        )
+        self.assertEqual(response.status_code, 503)
+        self.sleep.assert_not_called()
+
+    def test_retry_budget(self):
+        # a wait longer than a GUI thread can afford is not honoured
+        response = self.policy.call(
+            "GET", make_send(make_response(429, {"Retry-After": "10"}), 200)
+        )
+        self.assertEqual(response.status_code, 429)
+        self.sleep.assert_not_called()
+
+        # nor are waits that together exceed the budget
+        response = self.policy.call(
+            "GET",
+            make_send(
+                make_response(503, {"Retry-After": "3"}),
+                make_response(503, {"Retry-After": "3"}),
+                200,
+            ),
+        )
+        self.assertEqual(response.status_code, 503)
+        self.sleep.assert_called_once_with(3)
+
+        policy = RetryPolicy(sleep=self.sleep, budget=1)
+        with mock.patch.object(policy, "backoff", return_value=2):
+            with self.assertRaises(requests.exceptions.Timeout):
+                policy.call("GET", make_send(requests.exceptions.Timeout(), 200))
+
+    def test_backoff_bounded(self):
+        for attempt in range(1, 20):
+            delay = self.policy.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(8, 0.5 * 2 ** (attempt - 1)))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("120"), 120)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_is_connect_error(self):
+        self.assertTrue(is_connect_error(connect_error()))
+        self.assertTrue(is_connect_error(requests.exceptions.ConnectTimeout()))
+        self.assertFalse(is_connect_error(requests.exceptions.ReadTimeout()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import unittest
+
+from benchmarks.fake_clock import Clock
+from transport.schedule import Schedule
+
+
+class TestSchedule(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.errors = []
+        self.schedule = Schedule(
+            on_error=lambda job, e: self.errors.append((job.name, e)),
+            clock=self.clock,
+        )
+        self.runs = []
+
+    def job(self, name, changed=None):
+        def func():
+            self.runs.append(name)
+            return changed
+
+        return func
+
+    def test_run_due(self):
+        self.schedule.add("a", self.job("a"), 10)
+        self.schedule.add("b", self.job("b"), 30)
+        self.assertEqual(self.schedule.next_deadline(), 10)
+        self.assertEqual(self.schedule.run_due(), 0)
+        self.clock.now = 30
+        self.assertEqual(self.schedule.run_due(), 2)
+        self.assertEqual(self.runs, ["a", "b"])
+        self.assertEqual(self.schedule.next_deadline(), 40)
+
+    def test_replace_and_remove(self):
+        self.schedule.add("files", self.job("old"), 10)
+        self.schedule.add("files", self.job("new"), 10)
+        self.clock.now = 10
+        self.schedule.run_due()
+        self.assertEqual(self.runs, ["new"])
+        self.assertTrue(self.schedule.remove("files"))
+        self.assertFalse(self.schedule.remove("files"))
+        self.assertIsNone(self.schedule.next_deadline())
+
+    def test_removed_while_running(self):
+        def remove():
+            self.schedule.remove("b")
+
+        self.schedule.add("a", remove, 10)
+        self.schedule.add("b", self.job("b"), 10)
+        self.clock.now = 10
+        self.schedule.run_due()
+        self.assertEqual(self.runs, [])
+
+    def test_adapt(self):
+        self.schedule.add("changes", self.job("changes", True), 60, 15, 600)
+        self.schedule.add("quiet", self.job("quiet", False), 60, 15, 600)
+        for _ in range(10):
+            self.clock.now = self.schedule.next_deadline()
+            self.schedule.run_due()
+        jobs = {job["name"]: job for job in self.schedule.jobs()}
+        self.assertEqual(jobs["changes"]["intervalS"], 15)
+        self.assertGreater(jobs["quiet"]["intervalS"], 60)
+        self.assertLessEqual(jobs["quiet"]["intervalS"], 600)
+        self.assertEqual(jobs["changes"]["changes"], self.runs.count("changes"))
+
+    def test_record_change(self):
+        # the refresh completes after the run of the job
+        self.schedule.add("files", self.job("files"), 60, 15, 600)
+        self.clock.now = 60
+        self.schedule.run_due()
+        self.assertEqual(self.schedule.next_deadline(), 120)
+        self.clock.now = 61
+        self.assertTrue(self.schedule.record_change("files", True))
+        self.assertEqual(self.schedule.next_deadline(), 91)
+        job = self.schedule.jobs()[0]
+        self.assertEqual((job["intervalS"], job["changes"]), (30, 1))
+        # e.g. a refresh after an upload that saw no change
+        self.assertTrue(self.schedule.record_change("files", False))
+        self.assertEqual(self.schedule.jobs()[0]["intervalS"], 45)
+        self.assertFalse(self.schedule.record_change("gone", True))
+
+    def test_pause(self):
+        self.schedule.add("a", self.job("a"), 10)
+        self.schedule.pause()
+        self.clock.now = 100
+        self.assertIsNone(self.schedule.next_deadline())
+        self.assertEqual(self.schedule.run_due(), 0)
+        self.assertIsNone(self.schedule.jobs()[0]["nextRunInS"])
+        self.schedule.resume()
+        # overdue jobs run once
+        self.assertEqual(self.schedule.run_due(), 1)
+        self.assertEqual(self.schedule.next_deadline(), 110)
+
+    def test_error(self):
+        def fail():
+            raise ValueError("offline")
+
+        self.schedule.add("a", fail, 10)
+        self.clock.now = 10
+        self.schedule.run_due()
+        self.assertEqual(self.errors[0][0], "a")
+        self.assertEqual(self.schedule.jobs()[0]["errors"], 1)
+        self.assertEqual(self.schedule.next_deadline(), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
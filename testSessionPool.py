@@ -0,0 +1,53 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import unittest
+
+import requests
+
+from benchmarks.range_file_server import RangeFileServer
+from transport.session_pool import (
+    CountingHTTPSConnectionPool,
+    SessionPool,
+    _local,
+)
+
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = SessionPool()
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_reuse(self):
+        with RangeFileServer(b"blob") as server:
+            for _ in range(3):
+                self.assertEqual(self.pool.get(server.url).content, b"blob")
+            self.pool.close()
+            self.pool.get(server.url)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats["handshakes"], 2)
+        self.assertEqual(stats["reuses"], 2)
+
+    def test_https_pool(self):
+        # requests selects the pool of an HTTPS request by its TLS settings
+        url = "https://lens.example/api"
+        adapter = self.pool.get_session(url).get_adapter(url)
+        request = requests.Request("GET", url).prepare()
+        if hasattr(adapter, "get_connection_with_tls_context"):
+            pool = adapter.get_connection_with_tls_context(request, verify=True)
+        else:
+            pool = adapter.get_connection(url)
+        self.assertIsInstance(pool, CountingHTTPSConnectionPool)
+        _local.opened = 0
+        # creates the connection object without connecting
+        pool._new_conn()
+        self.assertEqual(_local.opened, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import threading
+import time
+import unittest
+
+from transport.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+        self.now = 0.0
+        self.single_flight = SingleFlight(memo_window=0.5, clock=lambda: self.now)
+
+    def fetch(self):
+        self.calls += 1
+        time.sleep(0.1)
+        return {"items": [self.calls]}
+
+    def test_make_key(self):
+        self.assertEqual(
+            SingleFlight.make_key("user", "file", {"a": 1, "b": 2}),
+            SingleFlight.make_key("user", "file", {"b": 2, "a": 1}),
+        )
+        self.assertNotEqual(
+            SingleFlight.make_key("user", "file", None),
+            SingleFlight.make_key("public", "file", None),
+        )
+
+    def test_concurrent_calls_share_one(self):
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.single_flight.do("k", self.fetch))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{"items": [1]}] * 8)
+        stats = self.single_flight.get_stats()
+        self.assertEqual(stats["executed"], 1)
+        self.assertEqual(stats["coalesced"] + stats["memoHits"], 7)
+
+    def test_results_are_shared(self):
+        # not copied, not even for the caller that made the call
+        result = {"items": []}
+        self.assertIs(self.single_flight.do("k", lambda: result), result)
+        self.assertIs(self.single_flight.do("k", self.fetch), result)
+
+    def test_memo_window(self):
+        self.single_flight.do("k", self.fetch)
+        self.now = 0.4
+        self.single_flight.do("k", self.fetch)
+        self.assertEqual(self.calls, 1)
+        self.now = 1.0
+        self.single_flight.do("k", self.fetch)
+        self.assertEqual(self.calls, 2)
+        self.single_flight.do("other", self.fetch)
+        self.assertEqual(self.calls, 3)
+
+    def test_errors_are_shared_not_memoized(self):
+        def fail():
+            self.calls += 1
+            time.sleep(0.1)
+            raise OSError("offline")
+
+        errors = []
+
+        def call():
+            try:
+                self.single_flight.do("k", fail)
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(self.single_flight.do("k", self.fetch), {"items": [2]})
+
+    def test_clear(self):
+        self.single_flight.do("k", self.fetch)
+        self.single_flight.clear()
+        self.single_flight.do("k", self.fetch)
+        self.assertEqual(self.calls, 2)
+
+    def test_clear_during_call(self):
+        # a write during a call makes its result stale for later calls
+        started = threading.Event()
+
+        def slow():
+            self.calls += 1
+            started.set()
+            time.sleep(0.1)
+            return {"items": [self.calls]}
+
+        thread = threading.Thread(target=lambda: self.single_flight.do("k", slow))
+        thread.start()
+        started.wait()
+        self.single_flight.clear()
+        self.assertEqual(self.single_flight.do("k", self.fetch), {"items": [2]})
+        thread.join()
+        self.single_flight.do("k", self.fetch)
+        self.assertEqual(self.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
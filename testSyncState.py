@@ -0,0 +1,99 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import os
+import tempfile
+import unittest
+
+from transport.sync_state import SyncState
+
+
+def fileDict(name, versionId):
+    return {
+        "_id": f"id-{name}",
+        "custFileName": name,
+        "currentVersion": {"_id": versionId, "uniqueFileName": f"{versionId}.fcstd"},
+    }
+
+
+class TestSyncState(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, ".lens", "sync-state.sqlite3")
+        self.state = SyncState(self.path)
+
+    def tearDown(self):
+        self.state.close()
+        self.tmpdir.cleanup()
+
+    def listing(self, *files, directories=()):
+        return {
+            "directories": [{"_id": f"dir-{d}", "name": d} for d in directories],
+            "files": list(files),
+        }
+
+    def test_listing(self):
+        self.assertIsNone(self.state.load_listing("root"))
+        listing = self.listing(fileDict("a.FCStd", "v1"), directories=["sub"])
+        self.assertEqual(self.state.store_listing("root", listing), 2)
+        loaded = self.state.load_listing("root")
+        self.assertEqual(loaded["files"], listing["files"])
+        self.assertEqual(loaded["directories"], listing["directories"])
+
+    def test_empty_directory(self):
+        self.state.store_listing("empty", self.listing())
+        loaded = self.state.load_listing("empty")
+        self.assertEqual((loaded["directories"], loaded["files"]), ([], []))
+
+    def test_incremental(self):
+        a, b = fileDict("a.FCStd", "v1"), fileDict("b.FCStd", "v1")
+        self.state.store_listing("root", self.listing(a, b))
+        self.assertEqual(self.state.store_listing("root", self.listing(a, b)), 0)
+        # a new version of a, b removed
+        changed = self.listing(fileDict("a.FCStd", "v2"))
+        self.assertEqual(self.state.store_listing("root", changed), 2)
+        files = self.state.load_listing("root")["files"]
+        self.assertEqual([f["currentVersion"]["_id"] for f in files], ["v2"])
+
+    def test_synced(self):
+        self.state.record_synced("", "a.FCStd", "id-a", "v1", 1000, "abc")
+        self.state.record_synced("sub", "a.FCStd", "id-a2", "v7", 2000)
+        self.assertEqual(
+            self.state.get_synced(""),
+            {
+                "a.FCStd": {
+                    "fileId": "id-a",
+                    "versionId": "v1",
+                    "localUpdatedAt": 1000,
+                    "hash": "abc",
+                }
+            },
+        )
+        self.state.record_synced("", "a.FCStd", "id-a", "v2", 3000)
+        self.assertEqual(self.state.get_synced("")["a.FCStd"]["versionId"], "v2")
+        self.state.forget_synced("sub", "a.FCStd")
+        self.assertEqual(self.state.get_synced("sub"), {})
+
+    def test_persistent(self):
+        self.state.store_listing("root", self.listing(fileDict("a.FCStd", "v1")))
+        self.state.record_synced("", "a.FCStd", "id-a", "v1", 1000)
+        self.state.close()
+        self.state = SyncState(self.path)
+        self.assertEqual(len(self.state.load_listing("root")["files"]), 1)
+        self.assertIn("a.FCStd", self.state.get_synced(""))
+
+    def test_corrupt(self):
+        self.state.close()
+        with open(self.path, "wb") as f:
+            f.write(b"not a database" * 100)
+        self.state = SyncState(self.path)
+        self.assertIsNone(self.state.load_listing("root"))
+        self.state.store_listing("root", self.listing())
+        self.assertEqual(self.state.get_stats()["errors"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import base64
+import json
+import threading
+import time
+import unittest
+
+from transport.token_manager import (
+    TokenManager,
+    TokenRefreshImpossible,
+    decode_expiry,
+)
+
+
+def make_token(exp):
+    def encode(d):
+        return base64.urlsafe_b64encode(json.dumps(d).encode()).rstrip(b"=").decode()
+
+    return f"{encode({'alg': 'HS256'})}.{encode({'exp': exp})}.signature"
+
+
+class TestTokenManager(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+        self.refreshed = []
+        self.manager = self.make_manager()
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def reauthenticate(self, token):
+        self.calls += 1
+        time.sleep(0.05)
+        return make_token(time.time() + 3600 + self.calls)
+
+    def make_manager(self, reauthenticate=None, **kwargs):
+        self.manager = TokenManager(
+            reauthenticate or self.reauthenticate, self.refreshed.append, **kwargs
+        )
+        return self.manager
+
+    def test_decode_expiry(self):
+        self.assertEqual(decode_expiry(make_token(1234)), 1234)
+        self.assertIsNone(decode_expiry("not a token"))
+        self.assertIsNone(decode_expiry(None))
+
+    def test_no_refresh_when_fresh(self):
+        manager = self.make_manager()
+        token = make_token(time.time() + 3600)
+        manager.set_token(token)
+        self.assertEqual(manager.ensure_valid(), token)
+        time.sleep(0.1)
+        self.assertEqual(self.calls, 0)
+
+    def test_background_refresh(self):
+        manager = self.make_manager(margin=300)
+        manager.set_token(make_token(time.time() + 300.2))
+        time.sleep(0.5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.refreshed, [manager.token])
+        self.assertGreater(manager.seconds_left(), 3000)
+
+    def test_burst_refreshes_once(self):
+        # set the token without starting the background refresh
+        manager = self.make_manager(margin=300)
+        stale = make_token(time.time() + 100)
+        manager.token = stale
+        manager.expires_at = decode_expiry(stale)
+        tokens = []
+        threads = [
+            threading.Thread(target=lambda: tokens.append(manager.ensure_valid()))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(len(set(tokens)), 1)
+        self.assertNotEqual(tokens[0], stale)
+
+    def test_impossible(self):
+        def reauthenticate(token):
+            self.calls += 1
+            raise TokenRefreshImpossible()
+
+        manager = self.make_manager(reauthenticate)
+        token = make_token(time.time() + 10)
+        manager.set_token(token)
+        time.sleep(0.1)
+        self.assertEqual(manager.ensure_valid(), token)
+        self.assertEqual(self.calls, 1)
+        self.assertFalse(manager.get_stats()["refreshable"])
+
+    def test_not_extended(self):
+        token = make_token(time.time() + 10)
+        manager = self.make_manager(lambda t: t)
+        manager.set_token(token)
+        time.sleep(0.1)
+        self.assertFalse(manager.get_stats()["refreshable"])
+        self.assertEqual(manager.get_stats()["refreshes"], 0)
+
+    def test_retry_after_failure(self):
+        def reauthenticate(token):
+            self.calls += 1
+            if self.calls == 1:
+                raise OSError("offline")
+            return make_token(time.time() + 3600)
+
+        manager = self.make_manager(reauthenticate, retry_delay=0.1)
+        manager.set_token(make_token(time.time() + 10))
+        time.sleep(0.4)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(manager.get_stats()["failures"], 1)
+        self.assertEqual(len(self.refreshed), 1)
+
+    def test_stop(self):
+        manager = self.make_manager()
+        manager.set_token(make_token(time.time() + 3600))
+        manager.stop()
+        self.assertIsNone(manager.token)
+        manager.set_token(make_token(time.time() + 10))
+        time.sleep(0.2)
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from transport import upload_index
+from transport.upload_index import UploadIndex
+
+
+class TestUploadIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path_index = os.path.join(self.tmpdir.name, "cache", "uploads.json")
+        self.path_file = os.path.join(self.tmpdir.name, "a.FCStd")
+        self.write(b"content")
+        self.index = UploadIndex(self.path_index)
+
+    def tearDown(self):
+        self.index.close()
+        self.tmpdir.cleanup()
+
+    def write(self, data, mtime_ns=None):
+        with open(self.path_file, "wb") as f:
+            f.write(data)
+        if mtime_ns:
+            os.utime(self.path_file, ns=(mtime_ns, mtime_ns))
+
+    def test_hash(self):
+        expected = hashlib.sha256(b"content").hexdigest()
+        self.assertEqual(self.index.hash(self.path_file), expected)
+
+    def test_hash_cached_until_changed(self):
+        self.write(b"content", mtime_ns=10**18)
+        with mock.patch.object(
+            upload_index, "hash_file", wraps=upload_index.hash_file
+        ) as hash_file:
+            digest = self.index.hash(self.path_file)
+            self.assertEqual(self.index.hash(self.path_file), digest)
+            self.assertEqual(hash_file.call_count, 1)
+
+            self.write(b"changed", mtime_ns=2 * 10**18)
+            self.assertNotEqual(self.index.hash(self.path_file), digest)
+            self.assertEqual(hash_file.call_count, 2)
+
+    def test_lookup_per_scope(self):
+        digest = self.index.hash(self.path_file)
+        self.assertIsNone(self.index.lookup("user1", digest))
+        self.index.record("user1", digest, "uuid.fcstd")
+        self.assertEqual(self.index.lookup("user1", digest), "uuid.fcstd")
+        self.assertIsNone(self.index.lookup("user2", digest))
+        self.assertEqual(self.index.get_stats()["hits"], 1)
+
+    def test_persistent(self):
+        digest = self.index.hash(self.path_file)
+        self.index.record("user1", digest, "uuid.fcstd")
+        self.index.close()
+        index = UploadIndex(self.path_index)
+        self.assertEqual(index.lookup("user1", digest), "uuid.fcstd")
+        self.assertEqual(index.get_stats()["hashes"], 1)
+
+    def test_writes_deferred(self):
+        index = UploadIndex(self.path_index, flush_delay=60)
+        for i in range(100):
+            index.record("user1", str(i), f"{i}.fcstd")
+        self.assertFalse(os.path.exists(self.path_index))
+        index.flush()
+        index.flush()
+        self.assertEqual(index.get_stats()["writes"], 1)
+        self.assertEqual(UploadIndex(self.path_index).get_stats()["blobs"], 100)
+
+        # written in the background after the delay
+        index = UploadIndex(self.path_index, flush_delay=0.01)
+        index.record("user1", "a", "a.fcstd")
+        for _ in range(100):
+            if index.get_stats()["writes"]:
+                break
+            time.sleep(0.01)
+        self.assertEqual(UploadIndex(self.path_index).get_stats()["blobs"], 101)
+
+    def test_bounded(self):
+        index = UploadIndex(self.path_index, max_entries=2)
+        for i in range(3):
+            index.record("user1", str(i), f"{i}.fcstd")
+        self.assertIsNone(index.lookup("user1", "0"))
+        self.assertEqual(index.lookup("user1", "2"), "2.fcstd")
+
+    def test_corrupt_index(self):
+        os.makedirs(os.path.dirname(self.path_index))
+        with open(self.path_index, "w") as f:
+            f.write("{")
+        self.assertEqual(UploadIndex(self.path_index).get_stats()["blobs"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+from urllib3.filepost import encode_multipart_formdata
+
+from transport.uploads import MultipartFileEncoder, UploadCanceledException
+
+SIZE = 3 * 1024 * 1024 + 17
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        self.server.received = self.rfile.read(length)
+        self.server.content_type = self.headers["Content-Type"]
+        self.send_response(201)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+
+class TestMultipartFileEncoder(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(SIZE)
+        self.file = tempfile.TemporaryFile()
+        self.file.write(self.data)
+        self.file.seek(0)
+
+    def tearDown(self):
+        self.file.close()
+
+    def test_same_body_as_requests(self):
+        body = MultipartFileEncoder("file", "a.fcstd", self.file)
+        expected, content_type = encode_multipart_formdata(
+            {"file": ("a.fcstd", self.data, "application/octet-stream")},
+            boundary=body.boundary,
+        )
+        self.assertEqual(content_type, body.content_type)
+        self.assertEqual(len(body), len(expected))
+        self.assertEqual(b"".join(body), expected)
+
+    def test_progress(self):
+        calls = []
+        body = MultipartFileEncoder(
+            "file", "a.fcstd", self.file, progress=lambda *args: calls.append(args)
+        )
+        while body.read(64 * 1024):
+            pass
+        self.assertEqual(calls[-1], (len(body), len(body)))
+        self.assertEqual(calls, sorted(calls))
+
+    def test_cancel(self):
+        body = MultipartFileEncoder(
+            "file", "a.fcstd", self.file, progress=lambda done, total: done < SIZE // 2
+        )
+        with self.assertRaises(UploadCanceledException):
+            for _ in body:
+                pass
+
+    def test_post(self):
+        server = HTTPServer(("127.0.0.1", 0), EchoHandler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        body = MultipartFileEncoder("file", "a.fcstd", self.file)
+        host, port = server.server_address
+        response = requests.post(
+            f"http://{host}:{port}/upload",
+            data=body,
+            headers={"Content-Type": body.content_type},
+        )
+        thread.join()
+        server.server_close()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(server.content_type, body.content_type)
+        self.assertIn(self.data, server.received)
+        self.assertEqual(len(server.received), len(body))
+
+
+if __name__ == "__main__":
+    unittest.main()
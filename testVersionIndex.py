@@ -0,0 +1,107 @@
+# ***********************************************************************
+# *                                                                     *
+# * Copyright (c) 2024 Ondsel                                           *
+# *                                                                     *
+# ***********************************************************************
+
+import unittest
+
+from benchmarks.fake_clock import Clock
+from transport.version_index import PRIVATE, PUBLIC, VersionIndex
+
+
+class TestVersionIndex(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.index = VersionIndex(max_age=60, max_files=2, clock=self.clock)
+
+    def store(self, file_id, updated_at, version_ids, public=False):
+        versions = [(v, {"_id": v}) for v in version_ids]
+        file = {"_id": file_id, "updatedAt": updated_at}
+        return self.index.store(file_id, updated_at, file, versions, public)
+
+    def test_lookup(self):
+        self.assertIsNone(self.index.lookup("f", "v1"))
+        get_version = self.store("f", 1, ["v1", "v2"])
+        self.assertEqual(get_version("v2"), {"_id": "v2"})
+        self.assertIsNone(get_version("v3"))
+
+        file, version = self.index.lookup("f", "v1")
+        self.assertEqual(file["_id"], "f")
+        self.assertEqual(version, {"_id": "v1"})
+        # an unknown version may be new, so it is not answered
+        self.assertIsNone(self.index.lookup("f", "v3"))
+        self.assertEqual(self.index.get_stats()["hits"], 1)
+
+    def test_expiry_and_updated_at(self):
+        self.store("f", 1, ["v1"])
+        self.clock.now = 61
+        self.assertIsNone(self.index.lookup("f", "v1"))
+        # fetched again but unchanged: not indexed again
+        self.store("f", 1, ["v1"])
+        self.assertIsNotNone(self.index.lookup("f", "v1"))
+        self.assertEqual(self.index.get_stats()["reindexed"], 1)
+
+        self.store("f", 2, ["v1", "v2"])
+        self.assertIsNotNone(self.index.lookup("f", "v2"))
+        self.assertEqual(self.index.get_stats()["reindexed"], 2)
+
+        self.index.invalidate()
+        self.assertIsNone(self.index.lookup("f", "v1"))
+
+    def test_public(self):
+        self.store("f", 1, ["v1"], public=True)
+        self.assertIsNotNone(self.index.lookup("f", "v1", public=True))
+        # public info may lack details
+        self.assertIsNone(self.index.lookup("f", "v1"))
+
+        self.store("g", 1, ["v1"])
+        self.assertIsNotNone(self.index.lookup("g", "v1", public=True))
+
+    def test_modes(self):
+        self.assertIsNone(self.index.get_mode("f"))
+        self.index.set_mode("f", PRIVATE)
+        self.index.invalidate()
+        self.assertEqual(self.index.get_mode("f"), PRIVATE)
+        self.index.set_mode("g", PUBLIC)
+        self.index.set_mode("h", PUBLIC)
+        self.assertIsNone(self.index.get_mode("f"))
+
+    def test_fetch_falls_back(self):
+        class NotFound(Exception):
+            pass
+
+        calls = []
+
+        def fetch(mode):
+            calls.append(mode)
+            if mode == PRIVATE:
+                # e.g. no longer shared with the user, only public
+                raise NotFound()
+            return {"_id": "f"}
+
+        self.index.set_mode("f", PRIVATE)
+        mode, result = self.index.fetch("f", fetch, (ValueError, NotFound))
+        self.assertEqual((mode, result), (PUBLIC, {"_id": "f"}))
+        self.assertEqual(calls, [PRIVATE, PUBLIC])
+        self.assertEqual(self.index.get_mode("f"), PUBLIC)
+
+    def test_fetch_raises_when_both_fail(self):
+        def fetch(mode):
+            raise ValueError(mode)
+
+        with self.assertRaises(ValueError) as raised:
+            self.index.fetch("f", fetch, (ValueError,))
+        # public is tried first
+        self.assertEqual(str(raised.exception), PRIVATE)
+        self.assertIsNone(self.index.get_mode("f"))
+
+    def test_bounded(self):
+        for file_id in "abc":
+            self.store(file_id, 1, ["v"])
+        self.assertIsNone(self.index.lookup("a", "v"))
+        self.assertEqual(self.index.get_stats()["files"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
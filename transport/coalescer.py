@@ -0,0 +1,55 @@
+import threading
+import time
+
+# Events are handled this long after the last event of a burst...
+WINDOW_S = 0.3
+# ...but no later than this after the first event, for bursts that go on
+MAX_DELAY_S = 2.0
+
+
+class EventCoalescer:
+    """Collects events that arrive in bursts, to handle them at once.
+
+    Saving a document fires several file system events, for example for a
+    temporary file, a rename and a backup.  add() returns the delay after
+    which the batch is due; the owner (re)starts a timer with it and then
+    takes the batch:
+
+        timer.start(coalescer.add(path) * 1000)
+        ...
+        paths = coalescer.take()
+    """
+
+    def __init__(self, window=WINDOW_S, max_delay=MAX_DELAY_S, clock=time.monotonic):
+        self.window = window
+        self.max_delay = max_delay
+        self.clock = clock
+        self.events = 0
+        self.batches = 0
+        self._keys = set()
+        self._first = None
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        """Add an event; returns the seconds until the batch is due."""
+        now = self.clock()
+        with self._lock:
+            if self._first is None:
+                self._first = now
+            self._keys.add(key)
+            self.events += 1
+            due = min(now + self.window, self._first + self.max_delay)
+        return max(0.0, due - now)
+
+    def take(self):
+        """Return the keys of the events of the batch and start a new batch."""
+        with self._lock:
+            keys, self._keys = self._keys, set()
+            if self._first is not None:
+                self.batches += 1
+            self._first = None
+        return keys
+
+    def get_stats(self):
+        with self._lock:
+            return {"events": self.events, "batches": self.batches}
@@ -0,0 +1,256 @@
+import os
+import threading
+import zlib
+from collections import deque
+
+try:
+    import zstandard
+except ImportError:
+    # zstd is only offered when the module is available, gzip otherwise
+    zstandard = None
+
+from transport.downloads import CHUNK_SIZE
+
+# Extensions of files that are text, or otherwise compress well
+COMPRESSIBLE_EXTENSIONS = {
+    ".step",
+    ".stp",
+    ".iges",
+    ".igs",
+    ".obj",
+    ".stl",
+    ".ply",
+    ".off",
+    ".brep",
+    ".brp",
+    ".dxf",
+    ".svg",
+    ".gcode",
+    ".json",
+    ".xml",
+    ".csv",
+    ".txt",
+    ".py",
+    ".fcmacro",
+}
+
+# Leading bytes of formats that are compressed already, such as FCStd files
+# (zip archives), which gain nothing from another round of compression
+COMPRESSED_MAGIC = (
+    b"PK\x03\x04",  # zip, also FCStd and 3MF
+    b"PK\x05\x06",  # empty zip
+    b"\x1f\x8b",  # gzip
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"BZh",  # bzip2
+    b"\xfd7zXZ\x00",  # xz
+    b"7z\xbc\xaf\x27\x1c",  # 7z
+    b"\x89PNG",
+    b"\xff\xd8\xff",  # jpeg
+)
+
+# Files smaller than this are not worth compressing
+MIN_SIZE = 4 * 1024
+
+# Files with another extension are compressed if a sample of this size
+# compresses to at most MAX_SAMPLE_RATIO of its size
+SAMPLE_SIZE = 64 * 1024
+MAX_SAMPLE_RATIO = 0.8
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Number of individual transfers kept for inspection
+MAX_RECENT_TRANSFERS = 100
+
+
+def supported_encodings():
+    """The content codings to compress with, in order of preference."""
+    return ["zstd", "gzip"] if zstandard else ["gzip"]
+
+
+def accept_encoding():
+    """The Accept-Encoding header for downloads.
+
+    urllib3 decodes these codings while the body is streamed.
+    """
+    return ", ".join(supported_encodings() + ["deflate"])
+
+
+def is_compressible(path):
+    """Whether compressing the file at path is likely to pay off."""
+    try:
+        if os.path.getsize(path) < MIN_SIZE:
+            return False
+        with open(path, "rb") as f:
+            sample = f.read(SAMPLE_SIZE)
+    except OSError:
+        return False
+    return is_compressible_sample(sample, os.path.splitext(path)[1])
+
+
+def is_compressible_sample(sample, extension=""):
+    """Whether data that starts with sample is likely to compress well."""
+    if sample.startswith(COMPRESSED_MAGIC):
+        return False
+    if extension.lower() in COMPRESSIBLE_EXTENSIONS:
+        return True
+    return len(zlib.compress(sample, 1)) <= MAX_SAMPLE_RATIO * len(sample)
+
+
+def compressor(encoding):
+    """A compressor with compress(data) and flush() for a content coding."""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    if encoding == "gzip":
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    raise ValueError(f"Unsupported content coding {encoding}")
+
+
+def decompressor(encoding):
+    """A decompressor with decompress(data) for a content coding."""
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj()
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompressobj()
+    raise ValueError(f"Unsupported content coding {encoding}")
+
+
+class CompressingBody:
+    """A file-like body that compresses another file-like body while read.
+
+    The size of the compressed body is unknown beforehand, so requests sends
+    it with chunked transfer encoding:
+
+        body = CompressingBody(MultipartFileEncoder(...), "gzip")
+        session.post(url, data=body, headers={"Content-Encoding": "gzip"})
+
+    raw_bytes and wire_bytes count the bytes before and after compression.
+    """
+
+    def __init__(self, body, encoding, chunk_size=CHUNK_SIZE):
+        self.body = body
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self._compressor = compressor(encoding)
+        self._buffer = b""
+        self._eof = False
+
+    def __iter__(self):
+        # requests only streams bodies that are iterable
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = float("inf")
+        while len(self._buffer) < size and not self._eof:
+            data = self.body.read(self.chunk_size)
+            self.raw_bytes += len(data)
+            if data:
+                self._buffer += self._compressor.compress(data)
+            else:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+        if size == float("inf"):
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self.wire_bytes += len(data)
+        return data
+
+
+class TransferStats:
+    """The bytes saved by compression, per transfer and in total."""
+
+    def __init__(self, max_recent=MAX_RECENT_TRANSFERS):
+        self.recent = deque(maxlen=max_recent)
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, direction, name, encoding, raw_bytes, wire_bytes):
+        """Record a transfer of raw_bytes that took wire_bytes on the wire."""
+        transfer = {
+            "direction": direction,
+            "name": name,
+            "encoding": encoding or "identity",
+            "rawBytes": raw_bytes,
+            "wireBytes": wire_bytes,
+            "savedBytes": raw_bytes - wire_bytes,
+        }
+        with self._lock:
+            self.recent.append(transfer)
+            totals = self.totals.setdefault(
+                direction,
+                {"transfers": 0, "compressed": 0, "rawBytes": 0, "wireBytes": 0},
+            )
+            totals["transfers"] += 1
+            totals["compressed"] += encoding not in (None, "identity")
+            totals["rawBytes"] += raw_bytes
+            totals["wireBytes"] += wire_bytes
+        return transfer
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                direction: dict(
+                    totals, savedBytes=totals["rawBytes"] - totals["wireBytes"]
+                )
+                for direction, totals in self.totals.items()
+            }
+
+    def get_recent(self):
+        with self._lock:
+            return list(self.recent)
+
+
+class UploadCompression:
+    """Negotiates the content coding of uploads with a server.
+
+    A server, or a proxy in front of it, that does not accept compressed
+    uploads refuses them in any way: 415 Unsupported Media Type, a 400 or
+    500 from a multipart parser that got the compressed bytes, or a reset
+    connection.  A failed compressed upload is therefore tried once more
+    uncompressed.  Only if that succeeds was the coding to blame, and it is
+    rejected for the lifetime of this object, see upload().
+    """
+
+    def __init__(self, encodings=None):
+        self.encodings = list(encodings or supported_encodings())
+        self._rejected = set()
+        self._lock = threading.Lock()
+
+    def encoding_for(self, path):
+        """The content coding to upload the file at path with, or None."""
+        with self._lock:
+            encodings = [e for e in self.encodings if e not in self._rejected]
+        if not encodings or not is_compressible(path):
+            return None
+        return encodings[0]
+
+    def upload(self, path, send, errors):
+        """Upload the file at path with send(encoding); returns its result.
+
+        send raises one of the exception classes in errors if the upload
+        failed.  A failed compressed upload is sent again uncompressed; the
+        error of that attempt is raised if it fails too.
+        """
+        encoding = self.encoding_for(path)
+        if encoding is None:
+            return send(None)
+        try:
+            return send(encoding)
+        except errors:
+            result = send(None)
+        # the upload only failed with the coding
+        self.reject(encoding)
+        return result
+
+    def reject(self, encoding):
+        with self._lock:
+            self._rejected.add(encoding)
@@ -0,0 +1,163 @@
+import threading
+import time
+from enum import Enum
+
+import Utils
+
+logger = Utils.getLogger(__name__)
+
+# Number of consecutive soft failures (timeouts, 5xx responses) after which
+# we consider the service to be offline.  A failure to connect at all is
+# conclusive and makes the tracker go offline immediately.
+MAX_SOFT_FAILURES = 3
+
+PROBE_DELAY_INITIAL_S = 2
+PROBE_DELAY_MAX_S = 120
+
+# The user does not wait for the backoff of the background probes: a call on
+# behalf of the user probes right away, but at most once per this interval
+PROBE_NOW_MIN_INTERVAL_S = 5
+
+
+class ConnectivityState(Enum):
+    ONLINE = 1  # the last call succeeded
+    DEGRADED = 2  # recent calls failed but we may still reach the service
+    OFFLINE = 3  # the service cannot be reached
+
+    def __str__(self):
+        return self.name.lower()
+
+
+class ConnectivityTracker:
+    """Infer whether the Lens service is reachable from real calls.
+
+    Instead of probing the API root before or after each call, the APIClient
+    reports the outcome of the calls it makes anyway.  Only when the tracker
+    decides that we are offline, it probes the service in a background thread
+    with an exponential backoff until the service can be reached again.  A
+    call the user is waiting for need not wait for that backoff, see
+    probe_now().
+
+    Listeners are called with the new state whenever the state changes.  Note
+    that they may be called from the probe thread.
+    """
+
+    def __init__(
+        self,
+        probe,
+        max_soft_failures=MAX_SOFT_FAILURES,
+        delay_initial=PROBE_DELAY_INITIAL_S,
+        delay_max=PROBE_DELAY_MAX_S,
+        probe_now_min_interval=PROBE_NOW_MIN_INTERVAL_S,
+        clock=time.monotonic,
+    ):
+        """Create a tracker.
+
+        The probe is a function without arguments that returns True if the
+        service can be reached.
+        """
+        self.probe = probe
+        self.max_soft_failures = max_soft_failures
+        self.delay_initial = delay_initial
+        self.delay_max = delay_max
+        self.probe_now_min_interval = probe_now_min_interval
+        self.clock = clock
+
+        self.state = ConnectivityState.ONLINE
+        self.soft_failures = 0
+        self.listeners = []
+
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._probe_thread = None
+        self._probed_now_at = None
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def is_offline(self):
+        return self.state == ConnectivityState.OFFLINE
+
+    def record_success(self):
+        """A call reached the service."""
+        with self._lock:
+            self.soft_failures = 0
+            changed = self._set_state(ConnectivityState.ONLINE)
+        if changed:
+            self._notify()
+
+    def record_failure(self, conclusive=False):
+        """A call failed to reach the service or the service failed.
+
+        A conclusive failure means that a connection could not be made at all.
+        """
+        with self._lock:
+            self.soft_failures += 1
+            if conclusive or self.soft_failures >= self.max_soft_failures:
+                changed = self._set_state(ConnectivityState.OFFLINE)
+            else:
+                changed = self._set_state(ConnectivityState.DEGRADED)
+        if changed:
+            self._notify()
+
+    def probe_now(self, probe=None):
+        """Probe right away while offline; returns whether we are online.
+
+        Rate limited: within probe_now_min_interval of the last immediate
+        probe, False is returned without probing.  probe overrides the probe
+        of the tracker, for example with a shorter time out.
+        """
+        with self._lock:
+            if self.state != ConnectivityState.OFFLINE:
+                return True
+            now = self.clock()
+            if (
+                self._probed_now_at is not None
+                and now - self._probed_now_at < self.probe_now_min_interval
+            ):
+                return False
+            self._probed_now_at = now
+        if not (probe or self.probe)():
+            return False
+        self.record_success()
+        return True
+
+    def stop(self):
+        """Stop probing, for example when the client is discarded."""
+        self._stopped.set()
+
+    def _set_state(self, new_state):
+        # assumes that the lock is held
+        if new_state == self.state:
+            return False
+        logger.debug(f"Connectivity changed from {self.state} to {new_state}")
+        self.state = new_state
+        if new_state == ConnectivityState.OFFLINE:
+            self._start_probing()
+        return True
+
+    def _notify(self):
+        state = self.state
+        for listener in self.listeners:
+            listener(state)
+
+    def _start_probing(self):
+        # assumes that the lock is held
+        if self._probe_thread is not None and self._probe_thread.is_alive():
+            return
+        self._stopped.clear()
+        self._probe_thread = threading.Thread(target=self._probe_loop, daemon=True)
+        self._probe_thread.start()
+
+    def _probe_loop(self):
+        delay = self.delay_initial
+        while self.is_offline():
+            if self._stopped.wait(delay):
+                return
+            if not self.is_offline():
+                # a real call succeeded in the meantime
+                return
+            if self.probe():
+                self.record_success()
+                return
+            delay = min(delay * 2, self.delay_max)
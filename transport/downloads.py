@@ -0,0 +1,78 @@
+import os
+
+# Size of the chunks in which downloads are written to disk
+CHUNK_SIZE = 1024 * 1024
+
+# Suffix of the file a download is written to before it is renamed
+PARTIAL_SUFFIX = ".lens-part"
+
+# Suffix of the journal that records which parts of a partial file are done,
+# so that a download can be resumed (see range_download.py)
+JOURNAL_SUFFIX = ".lens-journal"
+TMP_SUFFIX = ".tmp"
+
+
+def is_partial_download(name):
+    return name.endswith((PARTIAL_SUFFIX, JOURNAL_SUFFIX, JOURNAL_SUFFIX + TMP_SUFFIX))
+
+
+def get_content_length(response):
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+
+def get_content_encoding(response):
+    """The content coding of a response, or None if it is not encoded."""
+    encoding = response.headers.get("Content-Encoding", "").strip().lower()
+    return None if encoding in ("", "identity") else encoding
+
+
+def wire_bytes(response, default):
+    """The number of bytes of the body read from the connection so far.
+
+    This differs from the number of bytes written if the body is encoded.
+    """
+    tell = getattr(response.raw, "tell", None)
+    return tell() if tell else default
+
+
+def stream_to_handle(response, fh, progress=None, chunk_size=CHUNK_SIZE):
+    """Write the body of a streamed response to a file handle in chunks.
+
+    A compressed body is decompressed while it is streamed.  The progress
+    callback is called as progress(bytes_done, bytes_total) where
+    bytes_total is None if the server did not report the size.  For a
+    compressed body the progress is in compressed bytes, as the size is.
+    Returns the number of bytes written.
+    """
+    total = get_content_length(response)
+    encoded = get_content_encoding(response) is not None
+    done = 0
+    if progress:
+        progress(done, total)
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if chunk:
+            fh.write(chunk)
+            done += len(chunk)
+            if progress:
+                progress(wire_bytes(response, done) if encoded else done, total)
+    return done
+
+
+def stream_to_file(response, path, progress=None, chunk_size=CHUNK_SIZE):
+    """Write the body of a streamed response to path.
+
+    The body is written to a partial file next to path that replaces path
+    only when the download is complete, so that an interrupted download never
+    leaves a truncated file behind.
+    """
+    partial_path = path + PARTIAL_SUFFIX
+    try:
+        with open(partial_path, "wb") as f:
+            done = stream_to_handle(response, f, progress, chunk_size)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return done
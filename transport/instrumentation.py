@@ -0,0 +1,270 @@
+import bisect
+import json
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Upper bounds of the latency buckets in milliseconds, the last bucket is open
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Number of individual calls kept for inspection
+MAX_RECENT_CALLS = 1000
+
+# Path segments that identify an item: Mongo ObjectIds, uuids (possibly with
+# an extension as for uploads) and numbers
+ID_SEGMENT = re.compile(
+    r"^([0-9a-f]{24}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+    r"(\.\w+)?|\d+)$",
+    re.IGNORECASE,
+)
+
+_local = threading.local()
+
+
+def current_caller():
+    """The origin of the calls made by this thread, see caller()."""
+    stack = getattr(_local, "callers", None)
+    if stack:
+        return stack[-1]
+    if threading.current_thread() is threading.main_thread():
+        return "user"
+    return "background"
+
+
+@contextmanager
+def caller(name):
+    """Attribute the calls made in this block to name, e.g. "timer".
+
+    Calls on the GUI thread are attributed to "user" by default and calls on
+    other threads to "background".
+    """
+    stack = getattr(_local, "callers", None)
+    if stack is None:
+        stack = _local.callers = []
+    stack.append(name)
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def tag_caller(name, func):
+    """Wrap func such that its calls are attributed to name.
+
+    Meant for signal connections, e.g.:
+
+        timer.timeout.connect(tag_caller("timer", self.refreshModel))
+    """
+
+    def wrapper(*args, **kwargs):
+        with caller(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def endpoint_template(path):
+    """Replace the ids in a path by :id, e.g. "file/:id" for "file/65a...".
+
+    Calls to the same endpoint with different ids are aggregated this way.
+    """
+    segments = path.strip("/").split("/")
+    return "/".join(":id" if ID_SEGMENT.match(s) else s for s in segments)
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def percentile(self, p):
+        """An upper bound of the p-th percentile, None if above the last bound."""
+        total = sum(self.counts)
+        if total == 0:
+            return None
+        rank = p / 100 * total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+        return dict(zip(labels, self.counts))
+
+
+class EndpointStats:
+    """The aggregated calls to one endpoint template with one method."""
+
+    def __init__(self, method, template):
+        self.method = method
+        self.template = template
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses = {}
+        self.callers = {}
+        self.latency = Histogram()
+
+    def add(self, call):
+        self.calls += 1
+        if call["error"] or (call["status"] or 0) >= 400:
+            self.errors += 1
+        self.total_ms += call["ms"]
+        self.max_ms = max(self.max_ms, call["ms"])
+        self.request_bytes += call["requestBytes"]
+        self.response_bytes += call["responseBytes"]
+        status = str(call["status"] or call["error"])
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.callers[call["caller"]] = self.callers.get(call["caller"], 0) + 1
+        self.latency.add(call["ms"])
+
+    def as_dict(self):
+        return {
+            "method": self.method,
+            "endpoint": self.template,
+            "calls": self.calls,
+            "errors": self.errors,
+            "totalMs": round(self.total_ms, 1),
+            "meanMs": round(self.total_ms / self.calls, 1),
+            "maxMs": round(self.max_ms, 1),
+            "p50Ms": self.latency.percentile(50),
+            "p95Ms": self.latency.percentile(95),
+            "requestBytes": self.request_bytes,
+            "responseBytes": self.response_bytes,
+            "statuses": dict(self.statuses),
+            "callers": dict(self.callers),
+            "latencyMs": self.latency.as_dict(),
+        }
+
+
+def _body_size(prepared_request):
+    length = prepared_request.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else 0
+
+
+def _response_size(response, streamed):
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length)
+    if not streamed:
+        # the body is already read
+        return len(response.content or b"")
+    return 0
+
+
+class Instrumentation:
+    """Records every call with its latency, size, status and caller.
+
+    The calls are aggregated per method and endpoint template.  For streamed
+    responses (downloads) the latency is the time until the headers arrived
+    and the size is taken from Content-Length.
+
+    From the Python console, for example:
+
+        api = WorkspaceView.wsv.api
+        api.instrumentation.print_summary()
+        api.instrumentation.dump("/tmp/lens-calls.json")
+    """
+
+    def __init__(self, base_url=None, max_recent=MAX_RECENT_CALLS):
+        self.base_path = urlparse(base_url).path.rstrip("/") if base_url else ""
+        self.base_host = urlparse(base_url).netloc if base_url else None
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._recent = deque(maxlen=max_recent)
+        self._started = time.time()
+
+    def _template(self, url):
+        parsed = urlparse(url)
+        path = parsed.path
+        if parsed.netloc == self.base_host and path.startswith(self.base_path):
+            return endpoint_template(path[len(self.base_path) :])
+        # for example the signed urls of the file storage
+        return f"{parsed.netloc}/{endpoint_template(path)}"
+
+    def record(self, method, url, seconds, response=None, error=None, streamed=False):
+        size_request = _body_size(response.request) if response is not None else 0
+        size_response = (
+            _response_size(response, streamed) if response is not None else 0
+        )
+        call = {
+            "time": time.time(),
+            "method": method,
+            "endpoint": self._template(url),
+            "status": response.status_code if response is not None else None,
+            "error": type(error).__name__ if error is not None else None,
+            "ms": seconds * 1000,
+            "requestBytes": size_request,
+            "responseBytes": size_response,
+            "caller": current_caller(),
+        }
+        key = (method, call["endpoint"])
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = EndpointStats(*key)
+            stats.add(call)
+            self._recent.append(call)
+
+    def summary(self, sort_by="totalMs"):
+        """The aggregated calls per endpoint, by default the most costly first."""
+        with self._lock:
+            endpoints = [stats.as_dict() for stats in self._endpoints.values()]
+        return sorted(endpoints, key=lambda e: e[sort_by], reverse=True)
+
+    def recent(self, endpoint=None, caller=None):
+        """The most recent calls, optionally filtered."""
+        with self._lock:
+            calls = list(self._recent)
+        return [
+            call
+            for call in calls
+            if (endpoint is None or call["endpoint"] == endpoint)
+            and (caller is None or call["caller"] == caller)
+        ]
+
+    def slowest(self, n=10):
+        return sorted(self.recent(), key=lambda call: call["ms"], reverse=True)[:n]
+
+    def print_summary(self, n=20):
+        print(
+            f"{'method':7}{'endpoint':40}{'calls':>7}{'err':>5}"
+            f"{'total ms':>10}{'mean':>8}{'p95':>7}{'KB in':>9}  callers"
+        )
+        for e in self.summary()[:n]:
+            callers = ", ".join(f"{k}: {v}" for k, v in e["callers"].items())
+            p95 = e["p95Ms"] if e["p95Ms"] is not None else "-"
+            print(
+                f"{e['method']:7}{e['endpoint'][:39]:40}{e['calls']:>7}"
+                f"{e['errors']:>5}{e['totalMs']:>10.0f}{e['meanMs']:>8.0f}"
+                f"{p95:>7}{e['responseBytes'] / 1024:>9.1f}  {callers}"
+            )
+
+    def dump(self, path):
+        """Write the summary and the recent calls to a JSON file."""
+        data = {
+            "started": self._started,
+            "dumped": time.time(),
+            "endpoints": self.summary(),
+            "recent": self.recent(),
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._recent.clear()
+            self._started = time.time()
@@ -0,0 +1,118 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from transport.instrumentation import caller, current_caller
+
+
+class LatestOnly:
+    """Run functions on a worker pool, keeping only the latest result.
+
+    start(func) runs func on the pool and then calls
+    deliver(generation, result, error) on the worker thread.  The owner hands
+    the result to its own thread, for example with a queued signal, and
+    applies it only if is_current(generation).  Starting again or bump(), for
+    example when the user navigated elsewhere, makes the results of earlier
+    runs stale:
+
+        runner = LatestOnly(self.refreshFinished.emit, workers=2)
+        runner.start(listDirectory)
+        ...
+        def applyRefresh(self, generation, result, error):
+            if runner.is_current(generation):
+                with runner.applying():
+                    ...
+
+    The calls made by func are attributed to the caller of start().
+    """
+
+    def __init__(self, deliver, workers=1, name="LatestOnly", clock=time.perf_counter):
+        self.deliver = deliver
+        self.clock = clock
+        self.generation = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=name
+        )
+        self._lock = threading.Lock()
+        self._stats = {
+            "started": 0,
+            "applied": 0,
+            "dropped": 0,
+            "errors": 0,
+            "finished": 0,
+            "workerS": 0.0,
+            "applyS": 0.0,
+        }
+
+    def start(self, func):
+        """Run func on the pool; returns the generation of the run."""
+        with self._lock:
+            self.generation += 1
+            generation = self.generation
+            self._stats["started"] += 1
+        self._executor.submit(self._run, generation, func, current_caller())
+        return generation
+
+    def bump(self):
+        """Make the results of the runs so far stale."""
+        with self._lock:
+            self.generation += 1
+
+    def _run(self, generation, func, origin):
+        start = self.clock()
+        result = error = None
+        try:
+            with caller(origin):
+                result = func()
+        except Exception as e:
+            error = e
+        with self._lock:
+            self._stats["workerS"] += self.clock() - start
+            self._stats["errors"] += error is not None
+            self._stats["finished"] += 1
+        self.deliver(generation, result, error)
+
+    def is_current(self, generation):
+        """Whether the result of generation is to be applied."""
+        with self._lock:
+            current = generation == self.generation
+            self._stats["applied" if current else "dropped"] += 1
+        return current
+
+    @contextmanager
+    def applying(self):
+        """Measure the time of applying a result, on the owner's thread."""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._stats["applyS"] += self.clock() - start
+
+    def get_stats(self):
+        """The runs and the time spent in them.
+
+        workerMsPerRun is the time per run kept off the owner's thread,
+        applyMsPerRun the time per applied result spent on it.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        finished = stats["finished"]
+        return {
+            "started": stats["started"],
+            "applied": stats["applied"],
+            "dropped": stats["dropped"],
+            "errors": stats["errors"],
+            "workerMsPerRun": (
+                round(stats["workerS"] * 1000 / finished, 1) if finished else None
+            ),
+            "applyMsPerRun": (
+                round(stats["applyS"] * 1000 / stats["applied"], 1)
+                if stats["applied"]
+                else None
+            ),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+
+# Number of mutations replayed between two writes of the journal
+BATCH_SIZE = 20
+
+
+class MutationConflict(Exception):
+    """A mutation cannot be applied because the server state changed."""
+
+
+class MutationQueue:
+    """A persistent journal of mutations that could not be sent while offline.
+
+    Each mutation has an operation, a key that identifies what it changes and
+    JSON-serializable arguments.  A mutation replaces a pending mutation with
+    the same key, so two uploads of the same file are sent once.  The journal
+    is written before add() returns, so pending mutations survive a restart.
+
+    replay() applies the mutations in order, in batches.  The journal is
+    written after each batch, so after a crash the last batch may be applied
+    again: the mutations must be idempotent.
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.entries = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._replaying = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.entries = data["entries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        self._next_id = max((e["id"] for e in self.entries), default=0) + 1
+
+    def _save(self):
+        # assumes that the lock is held
+        if not self.entries:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"entries": self.entries}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        with self._lock:
+            return len(self.entries)
+
+    def pending(self):
+        with self._lock:
+            return [dict(e) for e in self.entries]
+
+    def get(self, key):
+        """Return the pending mutation with this key or None."""
+        with self._lock:
+            for entry in self.entries:
+                if entry["key"] == key:
+                    return dict(entry)
+        return None
+
+    def add(self, op, key, **args):
+        """Add a mutation, replacing a pending mutation with the same key.
+
+        The mutation goes to the end of the queue such that it is applied
+        after the mutations it may depend on.
+        """
+        with self._lock:
+            self.entries = [e for e in self.entries if e["key"] != key]
+            entry = {
+                "id": self._next_id,
+                "op": op,
+                "key": key,
+                "queued": time.time(),
+                "args": args,
+            }
+            self._next_id += 1
+            self.entries.append(entry)
+            self._save()
+        return dict(entry)
+
+    def cancel(self, predicate):
+        """Remove the pending mutations for which predicate(entry) is true.
+
+        Returns the number of removed mutations.
+        """
+        with self._lock:
+            kept = [e for e in self.entries if not predicate(e)]
+            removed = len(self.entries) - len(kept)
+            if removed:
+                self.entries = kept
+                self._save()
+            return removed
+
+    def replay(self, execute):
+        """Apply the pending mutations in order with execute(entry, batch).
+
+        batch is a dict that lives for one batch, for example to remember
+        lookups.  A MutationConflict drops the mutation and reports it; any
+        other exception stops the replay, keeping the mutation and the ones
+        after it for a later replay.
+
+        Returns a summary, or None if a replay is in progress already.
+        """
+        with self._lock:
+            if self._replaying:
+                return None
+            self._replaying = True
+        summary = {"applied": 0, "conflicts": [], "remaining": 0, "error": None}
+        try:
+            while summary["error"] is None:
+                with self._lock:
+                    entries = [dict(e) for e in self.entries[: self.batch_size]]
+                if not entries:
+                    break
+                done = set()
+                batch = {}
+                for entry in entries:
+                    try:
+                        execute(entry, batch)
+                        summary["applied"] += 1
+                    except MutationConflict as e:
+                        summary["conflicts"].append((entry, str(e)))
+                    except Exception as e:
+                        summary["error"] = e
+                        break
+                    done.add(entry["id"])
+                with self._lock:
+                    # mutations added meanwhile have new ids and are kept
+                    self.entries = [e for e in self.entries if e["id"] not in done]
+                    self._save()
+        finally:
+            with self._lock:
+                self._replaying = False
+                summary["remaining"] = len(self.entries)
+        return summary
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# The maximum page size that the Lens (Feathers) API allows
+PAGE_SIZE = 50
+
+
+def iter_pages(fetch_page, params=None, page_size=PAGE_SIZE, prefetch=True):
+    """Generate the pages of a Feathers "find" query.
+
+    Feathers responds to a find query with a dict with keys `total`, `limit`,
+    `skip` and `data`.  This generator yields the `data` lists one by one,
+    following `$skip` until `total` items have been seen.
+
+    fetch_page is a function that takes the query params and returns the
+    response dict.  With prefetch, page N+1 is requested in a background
+    thread while the caller consumes page N.  Exceptions of fetch_page are
+    raised from the generator at the point the failing page is consumed.
+    """
+    params = dict(params) if params else {}
+    skip = params.pop("$skip", 0)
+    limit = params.pop("$limit", page_size)
+
+    def fetch(skip):
+        return fetch_page({**params, "$limit": limit, "$skip": skip})
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        result = fetch(skip)
+        while True:
+            data = result["data"]
+            total = result.get("total", skip + len(data))
+            skip += len(data)
+            has_next = bool(data) and skip < total
+
+            next_result = None
+            if has_next and executor:
+                next_result = executor.submit(fetch, skip)
+
+            yield data
+
+            if not has_next:
+                return
+            result = next_result.result() if next_result else fetch(skip)
+    finally:
+        if executor:
+            executor.shutdown(wait=False)
+
+
+def fetch_all(fetch_page, params=None, page_size=PAGE_SIZE):
+    """Return the items of all pages of a Feathers "find" query as one list."""
+    return [item for page in iter_pages(fetch_page, params, page_size) for item in page]
@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum, auto
+
+
+class JobStatus(Enum):
+    PENDING = auto()
+    RUNNING = auto()
+    DONE = auto()
+    FAILED = auto()
+
+
+class Job:
+    """An item that flows through the stages of a pipeline.
+
+    The stage functions store their results in `data` for the next stages and
+    may set `size` (in bytes) for the throughput in the summary.
+    """
+
+    def __init__(self, name, **data):
+        self.name = name
+        self.data = data
+        self.size = 0
+        self.status = JobStatus.PENDING
+        self.stage = None
+        self.error = None
+
+    def __repr__(self):
+        return f"Job({self.name!r}, {self.status.name}, stage={self.stage!r})"
+
+
+class Stage:
+    def __init__(self, name, func, workers=1):
+        """A stage that calls func(job) in at most `workers` threads."""
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+
+class Pipeline:
+    """Run jobs through stages, each stage with its own bounded worker pool.
+
+    A job enters the next stage as soon as it leaves the previous one, so that
+    for example hashing the next file overlaps with uploading the current
+    one.  A stage that raises fails the job, which skips the remaining stages.
+
+    on_status(job) is called when a job enters a stage, completes or fails and
+    on_finished(summary) once all jobs are complete.  Both are called from the
+    worker threads.
+    """
+
+    def __init__(self, stages, on_status=None, on_finished=None):
+        self.stages = stages
+        self.on_status = on_status
+        self.on_finished = on_finished
+        self.jobs = []
+        self._executors = []
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._finished = threading.Event()
+        self._canceled = threading.Event()
+        self._started = None
+        self._duration = None
+
+    def start(self, jobs):
+        """Start the jobs without waiting for them to complete."""
+        self.jobs = list(jobs)
+        self._remaining = len(self.jobs)
+        self._started = time.perf_counter()
+        self._executors = [
+            ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=stage.name)
+            for stage in self.stages
+        ]
+        if not self.jobs:
+            self._finish()
+        for job in self.jobs:
+            self._submit(job, 0)
+        return self
+
+    def cancel(self):
+        """Fail the jobs that have not yet entered their next stage."""
+        self._canceled.set()
+
+    def wait(self, timeout=None):
+        """Wait for the jobs to complete and return the summary."""
+        self._finished.wait(timeout)
+        return self.summary()
+
+    def is_finished(self):
+        return self._finished.is_set()
+
+    def _notify(self, job):
+        if self.on_status:
+            self.on_status(job)
+
+    def _submit(self, job, index):
+        if index == len(self.stages):
+            job.status = JobStatus.DONE
+            self._complete(job)
+        else:
+            self._executors[index].submit(self._run, job, index)
+
+    def _run(self, job, index):
+        stage = self.stages[index]
+        job.stage = stage.name
+        if self._canceled.is_set():
+            job.status = JobStatus.FAILED
+            job.error = "Canceled"
+            self._complete(job)
+            return
+        job.status = JobStatus.RUNNING
+        self._notify(job)
+        try:
+            stage.func(job)
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = e
+            self._complete(job)
+            return
+        self._submit(job, index + 1)
+
+    def _complete(self, job):
+        self._notify(job)
+        with self._lock:
+            self._remaining -= 1
+            finished = self._remaining == 0
+        if finished:
+            self._finish()
+
+    def _finish(self):
+        self._duration = time.perf_counter() - self._started
+        for executor in self._executors:
+            # called from a worker thread, so do not wait for the workers
+            executor.shutdown(wait=False)
+        self._finished.set()
+        if self.on_finished:
+            self.on_finished(self.summary())
+
+    def summary(self):
+        done = [job for job in self.jobs if job.status == JobStatus.DONE]
+        failed = [job for job in self.jobs if job.status == JobStatus.FAILED]
+        if self._duration is not None:
+            seconds = self._duration
+        elif self._started is not None:
+            seconds = time.perf_counter() - self._started
+        else:
+            seconds = 0
+        size = sum(job.size for job in done)
+        return {
+            "jobs": len(self.jobs),
+            "done": len(done),
+            "failed": len(failed),
+            "bytes": size,
+            "seconds": seconds,
+            "jobsPerSecond": len(done) / seconds if seconds else 0,
+            "bytesPerSecond": size / seconds if seconds else 0,
+        }
@@ -0,0 +1,330 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+
+import requests
+
+from transport.downloads import (
+    CHUNK_SIZE,
+    JOURNAL_SUFFIX,
+    PARTIAL_SUFFIX,
+    TMP_SUFFIX,
+    get_content_encoding,
+    stream_to_file,
+    wire_bytes,
+)
+
+# Blobs of at least this size are fetched in several byte ranges in parallel
+MIN_SIZE_PARALLEL = 16 * 1024 * 1024
+MAX_SEGMENTS = 4
+
+# Number of attempts per segment before giving up (and keeping the partial
+# file and journal for a later resume)
+MAX_ATTEMPTS = 5
+RETRY_DELAY_S = 0.5
+
+POLL_INTERVAL_S = 0.1
+
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+PARTIAL_CONTENT = requests.codes.partial_content
+RANGE_NOT_SATISFIABLE = requests.codes.range_not_satisfiable
+
+
+class DownloadChangedException(requests.exceptions.RequestException):
+    """The blob changed on the server during a resumed download."""
+
+
+class Segment:
+    """A byte range [start, end] of which the first `done` bytes are on disk."""
+
+    def __init__(self, start, end, done=0):
+        self.start = start
+        self.end = end
+        self.done = done
+
+    @property
+    def next_byte(self):
+        return self.start + self.done
+
+    @property
+    def remaining(self):
+        return self.end + 1 - self.next_byte
+
+    def is_complete(self):
+        return self.remaining <= 0
+
+    def to_list(self):
+        return [self.start, self.end, self.done]
+
+
+def split_segments(size, max_segments=MAX_SEGMENTS, min_size=MIN_SIZE_PARALLEL):
+    count = max_segments if size >= min_size else 1
+    segment_size = -(-size // count)  # rounded up
+    return [
+        Segment(start, min(start + segment_size, size) - 1)
+        for start in range(0, size, segment_size)
+    ]
+
+
+class DownloadJournal:
+    """The state of a partial download, stored next to the target file."""
+
+    def __init__(self, path):
+        self.path = path + JOURNAL_SUFFIX
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, state):
+        tmp_path = self.path + TMP_SUFFIX
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RangeDownload:
+    """A download that survives dropped connections.
+
+    The blob is written to a partial file next to the target.  A journal
+    records which byte ranges are complete.  After a failure, the download
+    resumes with HTTP Range requests, both within this run (a number of
+    attempts per segment) and in a later run with the same key.  Large blobs
+    are fetched in several byte ranges in parallel.
+
+    The key identifies the blob, because download urls are signed and differ
+    per request.  The size and ETag of the blob guard against resuming with
+    stale data.  Servers that do not support ranges get a plain download.
+
+    With accept_encoding the probe asks for a compressed blob.  A server that
+    compresses it gets a plain, compressed download too: byte ranges of a
+    compressed body cannot be stitched together.  The ranges themselves are
+    always requested uncompressed.
+    """
+
+    def __init__(
+        self,
+        get,
+        url,
+        path,
+        key,
+        max_segments=MAX_SEGMENTS,
+        min_size_parallel=MIN_SIZE_PARALLEL,
+        max_attempts=MAX_ATTEMPTS,
+        retry_delay=RETRY_DELAY_S,
+        chunk_size=CHUNK_SIZE,
+        accept_encoding=None,
+    ):
+        """Create a download; get is a function such as requests.Session.get."""
+        self.get = get
+        self.url = url
+        self.path = path
+        self.partial_path = path + PARTIAL_SUFFIX
+        self.key = key
+        self.max_segments = max_segments
+        self.min_size_parallel = min_size_parallel
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.chunk_size = chunk_size
+        self.accept_encoding = accept_encoding
+
+        self.journal = DownloadJournal(path)
+        self.size = None
+        self.etag = None
+        self.segments = []
+        self.resumed_bytes = 0
+        self.retries = 0
+        # the content coding of a plain download and the bytes transferred
+        self.encoding = None
+        self.wire_bytes = 0
+
+        self._lock = threading.Lock()
+        self._aborted = threading.Event()
+
+    def bytes_done(self):
+        with self._lock:
+            return sum(segment.done for segment in self.segments)
+
+    def _state(self):
+        with self._lock:
+            return {
+                "key": self.key,
+                "size": self.size,
+                "etag": self.etag,
+                "segments": [segment.to_list() for segment in self.segments],
+            }
+
+    def _probe(self, progress):
+        """Determine the size and ETag with a one byte range request.
+
+        Returns False if the server does not support ranges, in which case the
+        blob has been downloaded with the probe itself.
+        """
+        headers = {"Range": "bytes=0-0"}
+        if self.accept_encoding:
+            headers["Accept-Encoding"] = self.accept_encoding
+        response = self.get(self.url, headers=headers, stream=True)
+        with response:
+            if response.status_code == RANGE_NOT_SATISFIABLE:
+                # an empty blob
+                open(self.path, "wb").close()
+                return False
+            response.raise_for_status()
+            match = CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if response.status_code != PARTIAL_CONTENT or not match:
+                self._download_plain(response, progress)
+                return False
+            if match.group(3) == "*" or get_content_encoding(response):
+                # unknown size or a compressed body, so download without ranges
+                response.close()
+                del headers["Range"]
+                with self.get(self.url, headers=headers, stream=True) as full_response:
+                    full_response.raise_for_status()
+                    self._download_plain(full_response, progress)
+                return False
+            self.size = int(match.group(3))
+            self.etag = response.headers.get("ETag")
+            return True
+
+    def _download_plain(self, response, progress):
+        self.encoding = get_content_encoding(response)
+        size = stream_to_file(response, self.path, progress, self.chunk_size)
+        self.wire_bytes = wire_bytes(response, size)
+
+    def _prepare(self):
+        state = self.journal.load()
+        if (
+            state
+            and state.get("key") == self.key
+            and state.get("size") == self.size
+            and state.get("etag") == self.etag
+            and os.path.isfile(self.partial_path)
+            and os.path.getsize(self.partial_path) == self.size
+        ):
+            self.segments = [Segment(*segment) for segment in state["segments"]]
+            self.resumed_bytes = self.bytes_done()
+        else:
+            with open(self.partial_path, "wb") as f:
+                f.truncate(self.size)
+            self.segments = split_segments(
+                self.size, self.max_segments, self.min_size_parallel
+            )
+            self.resumed_bytes = 0
+        self.journal.save(self._state())
+
+    def _fetch_once(self, segment):
+        headers = {
+            "Range": f"bytes={segment.next_byte}-{segment.end}",
+            # the offsets are those of the uncompressed blob
+            "Accept-Encoding": "identity",
+        }
+        if self.etag:
+            # if the blob changed, the server sends it entirely with a 200
+            headers["If-Range"] = self.etag
+        with self.get(self.url, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            if response.status_code != PARTIAL_CONTENT:
+                raise DownloadChangedException("The file changed on the server")
+            with open(self.partial_path, "r+b") as f:
+                f.seek(segment.next_byte)
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if self._aborted.is_set():
+                        return
+                    chunk = chunk[: segment.remaining]
+                    f.write(chunk)
+                    # the journal must never claim more than is on disk
+                    f.flush()
+                    with self._lock:
+                        segment.done += len(chunk)
+                        self.wire_bytes += len(chunk)
+                    if segment.is_complete():
+                        return
+
+    def _fetch_segment(self, segment):
+        attempt = 1
+        while not segment.is_complete() and not self._aborted.is_set():
+            try:
+                self._fetch_once(segment)
+            except DownloadChangedException:
+                raise
+            except requests.exceptions.HTTPError as e:
+                # only server errors are worth another attempt
+                if e.response.status_code < 500 or attempt >= self.max_attempts:
+                    raise
+                attempt = self._wait_for_retry(attempt)
+            except requests.exceptions.RequestException:
+                if attempt >= self.max_attempts:
+                    raise
+                attempt = self._wait_for_retry(attempt)
+
+    def _wait_for_retry(self, attempt):
+        with self._lock:
+            self.retries += 1
+        time.sleep(self.retry_delay * attempt)
+        return attempt + 1
+
+    def _fetch_segments(self, progress):
+        pending = [segment for segment in self.segments if not segment.is_complete()]
+        if not pending:
+            return
+        self._aborted.clear()
+        executor = ThreadPoolExecutor(max_workers=len(pending))
+        futures = [executor.submit(self._fetch_segment, s) for s in pending]
+        try:
+            while True:
+                done, not_done = wait(
+                    futures, timeout=POLL_INTERVAL_S, return_when=FIRST_EXCEPTION
+                )
+                if progress:
+                    # called from this thread, so it may update a GUI
+                    progress(self.bytes_done(), self.size)
+                for future in done:
+                    if future.exception():
+                        raise future.exception()
+                if not not_done:
+                    return
+                self.journal.save(self._state())
+        finally:
+            self._aborted.set()
+            executor.shutdown(wait=True)
+            self.journal.save(self._state())
+
+    def run(self, progress=None):
+        """Download the blob to path; returns the size in bytes.
+
+        Raises a RequestException if the download cannot be completed.  The
+        partial file and journal are then kept to resume later.
+        """
+        if not self._probe(progress):
+            self.journal.remove()
+            return os.path.getsize(self.path)
+        try:
+            self._prepare()
+            self._fetch_segments(progress)
+        except DownloadChangedException:
+            # start from scratch, once, with the size and ETag of the new blob
+            self.journal.remove()
+            with self._lock:
+                self.size = None
+                self.etag = None
+                self.segments = []
+            if not self._probe(progress):
+                if os.path.exists(self.partial_path):
+                    os.remove(self.partial_path)
+                return os.path.getsize(self.path)
+            self._prepare()
+            self._fetch_segments(progress)
+        os.replace(self.partial_path, self.path)
+        self.journal.remove()
+        return self.size
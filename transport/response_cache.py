@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Upper bound on the size of the bodies stored on disk
+MAX_BYTES = 20 * 1024 * 1024
+
+SUFFIX = ".json"
+
+
+def service_of(endpoint):
+    """Return the service of an endpoint, e.g. "directories" for "directories/1"."""
+    return endpoint.strip("/").split("/")[0]
+
+
+class CacheEntry:
+    def __init__(self, key, service, etag, last_modified, body):
+        self.key = key
+        self.service = service
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+
+    def validators(self):
+        """The headers to make the request conditional."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def json(self):
+        return json.loads(self.body)
+
+    def to_dict(self):
+        return {
+            "key": self.key,
+            "service": self.service,
+            "etag": self.etag,
+            "lastModified": self.last_modified,
+            "body": self.body,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["key"], d["service"], d["etag"], d["lastModified"], d["body"])
+
+
+class ResponseCache:
+    """An on-disk cache of GET responses with their validators.
+
+    The responses are stored together with their ETag and Last-Modified
+    headers so that a next request can be made conditional.  If the server
+    answers with 304 Not Modified, the stored body can be used.
+
+    Entries are evicted in least recently used order once the total size of
+    the bodies exceeds max_bytes.  Entries are grouped by service ("file",
+    "directories", ...) so that writes to a service can invalidate them.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # key -> (service, size), least recently used first
+        self._index = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._load_index()
+
+    @staticmethod
+    def make_key(scope, endpoint, params):
+        """Compute a key from the user (scope), the endpoint and the params."""
+        params = sorted((params or {}).items())
+        data = json.dumps([scope, endpoint.strip("/"), params], default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def _load_index(self):
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "r") as f:
+                    service = json.load(f)["service"]
+                entries.append((os.path.getmtime(path), name[: -len(SUFFIX)], service))
+            except (OSError, ValueError, KeyError):
+                self._remove_file(path)
+        for _, key, service in sorted(entries):
+            size = os.path.getsize(self._path(key))
+            self._index[key] = (service, size)
+            self._size += size
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _remove(self, key):
+        # assumes that the lock is held
+        _, size = self._index.pop(key)
+        self._size -= size
+        self._remove_file(self._path(key))
+
+    def get(self, key):
+        """Return the entry for key or None."""
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "r") as f:
+                    entry = CacheEntry.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError):
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            return entry
+
+    def record_hit(self, key):
+        """The entry has been confirmed by the server (304)."""
+        with self._lock:
+            self.hits += 1
+            if key in self._index:
+                try:
+                    os.utime(self._path(key))
+                except OSError:
+                    pass
+
+    def put(self, entry):
+        data = json.dumps(entry.to_dict())
+        size = len(data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if entry.key in self._index:
+                self._remove(entry.key)
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(entry.key)
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError:
+                self._remove_file(tmp_path)
+                return
+            self._index[entry.key] = (entry.service, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._index)))
+
+    def invalidate(self, services):
+        """Remove all entries that belong to one of the services."""
+        with self._lock:
+            for key, (service, _) in list(self._index.items()):
+                if service in services:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,212 @@
+import email.utils
+import random
+import threading
+import time
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+# Methods that have the same effect when repeated.  PATCH is idempotent as
+# long as the same payload is sent again, which the caller has to decide.
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+
+# Statuses that indicate a transient problem of the server or a proxy
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+# Statuses for which the server has not processed the request, so that even
+# a non-idempotent request can be retried
+REJECTED_STATUSES = frozenset([429])
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_S = 0.5
+# The calls are made on the GUI thread, so never wait long: a single wait is
+# at most BACKOFF_MAX_S and all waits of a call together at most
+# RETRY_BUDGET_S.  A server that asks to wait longer gets no retry.
+BACKOFF_MAX_S = 8
+RETRY_AFTER_MAX_S = BACKOFF_MAX_S
+RETRY_BUDGET_S = 5
+
+
+def is_connect_error(e):
+    """Whether the request failed before a connection was made.
+
+    The request has then certainly not reached the server.
+    """
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(e, requests.exceptions.ConnectionError) and e.args:
+        reason = getattr(e.args[0], "reason", e.args[0])
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def parse_retry_after(value):
+    """Return the number of seconds of a Retry-After header or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, date.timestamp() - time.time())
+
+
+class RetryStats:
+    """Thread-safe counters on the retries of a RetryPolicy."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.retries = 0
+            self.retried_calls = 0
+            self.give_ups = 0
+            self.by_reason = {}
+
+    def record_call(self, retries, gave_up):
+        with self._lock:
+            self.calls += 1
+            if retries:
+                self.retried_calls += 1
+            if gave_up:
+                self.give_ups += 1
+
+    def record_retry(self, reason):
+        with self._lock:
+            self.retries += 1
+            self.by_reason[reason] = self.by_reason.get(reason, 0) + 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "retriedCalls": self.retried_calls,
+                "giveUps": self.give_ups,
+                "byReason": dict(self.by_reason),
+            }
+
+
+class RetryPolicy:
+    """Retry requests that fail for transient reasons.
+
+    Idempotent requests are retried on connection errors, time outs and the
+    statuses in RETRY_STATUSES.  Other requests are only retried if they
+    certainly have not been processed: the connection could not be made or the
+    server rejected the request with 429 Too Many Requests.
+
+    Between attempts the policy waits with exponential backoff and full
+    jitter, or as long as the server asks with Retry-After.  If the server
+    asks to wait longer than retry_after_max, or if the wait would exceed the
+    budget for all waits of the call, the policy gives up and the caller gets
+    the last response or exception.
+    """
+
+    def __init__(
+        self,
+        max_attempts=MAX_ATTEMPTS,
+        backoff_base=BACKOFF_BASE_S,
+        backoff_max=BACKOFF_MAX_S,
+        retry_after_max=RETRY_AFTER_MAX_S,
+        budget=RETRY_BUDGET_S,
+        retry_statuses=RETRY_STATUSES,
+        sleep=time.sleep,
+    ):
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.budget = budget
+        self.retry_statuses = retry_statuses
+        self.sleep = sleep
+        self.stats = RetryStats()
+
+    def is_idempotent(self, method):
+        return method.upper() in IDEMPOTENT_METHODS
+
+    def backoff(self, attempt):
+        """The delay after the failed attempt (counting from 1)."""
+        cap = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, cap)
+
+    def _reason_response(self, response, idempotent):
+        status = response.status_code
+        if status in self.retry_statuses and (
+            idempotent or status in REJECTED_STATUSES
+        ):
+            return str(status)
+        return None
+
+    def _reason_exception(self, e, idempotent):
+        if is_connect_error(e):
+            return "connect"
+        if idempotent and isinstance(
+            e,
+            (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ),
+        ):
+            return type(e).__name__
+        return None
+
+    def _delay(self, attempt, response):
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return retry_after if retry_after <= self.retry_after_max else None
+        return self.backoff(attempt)
+
+    def _within_budget(self, waited, delay):
+        return delay is not None and waited + delay <= self.budget
+
+    def call(self, method, send, idempotent=None):
+        """Return send() for a request with method, retrying transient failures.
+
+        idempotent overrides the classification by method, for example for a
+        PATCH that sends the same payload again.  The last response is
+        returned or the last exception raised once the attempts run out.
+        """
+        if idempotent is None:
+            idempotent = self.is_idempotent(method)
+        attempt = 1
+        waited = 0
+        while True:
+            response = None
+            try:
+                response = send()
+                reason = self._reason_response(response, idempotent)
+            except requests.exceptions.RequestException as e:
+                reason = self._reason_exception(e, idempotent)
+                delay = self.backoff(attempt)
+                if (
+                    reason is None
+                    or attempt >= self.max_attempts
+                    or not self._within_budget(waited, delay)
+                ):
+                    self.stats.record_call(attempt - 1, reason is not None)
+                    raise
+            else:
+                if reason is None:
+                    self.stats.record_call(attempt - 1, False)
+                    return response
+                delay = self._delay(attempt, response)
+                if attempt >= self.max_attempts or not self._within_budget(
+                    waited, delay
+                ):
+                    self.stats.record_call(attempt - 1, True)
+                    return response
+
+            if response is not None:
+                response.close()
+            self.stats.record_retry(reason)
+            self.sleep(delay)
+            waited += delay
+            attempt += 1
@@ -0,0 +1,173 @@
+import threading
+import time
+
+# A job that observes a change runs this much sooner next time, a job that
+# does not this much later, within the bounds of the job
+SPEEDUP = 0.5
+SLOWDOWN = 1.5
+
+
+class Job:
+    """A function that runs periodically.
+
+    The function returns True if it observed a change, False if it did not
+    and None if it cannot tell, for example because the work completes
+    later and is reported with Schedule.record_change().  The interval
+    adapts to the changes, between min_interval and max_interval.
+    """
+
+    def __init__(self, name, func, interval, min_interval, max_interval, next_run):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.next_run = next_run
+        self.runs = 0
+        self.changes = 0
+        self.errors = 0
+        self.last_duration = None
+
+    def adapt(self, changed):
+        if changed is True:
+            self.interval = max(self.min_interval, self.interval * SPEEDUP)
+        elif changed is False:
+            self.interval = min(self.max_interval, self.interval * SLOWDOWN)
+
+    def as_dict(self, now, paused):
+        return {
+            "name": self.name,
+            "intervalS": round(self.interval, 1),
+            "nextRunInS": None if paused else round(max(0, self.next_run - now), 1),
+            "runs": self.runs,
+            "changes": self.changes,
+            "errors": self.errors,
+            "lastDurationMs": (
+                None
+                if self.last_duration is None
+                else round(self.last_duration * 1000, 1)
+            ),
+        }
+
+
+class Schedule:
+    """The periodic jobs of the addon, by name.
+
+    The schedule does not keep time itself: the owner runs run_due() at
+    next_deadline(), for example with a timer on the GUI thread.  While the
+    schedule is paused no job is due.  Jobs that became due meanwhile run
+    once after resume().
+
+    on_error(job, exception) is called if a job raises.
+    """
+
+    def __init__(self, on_error=None, clock=time.monotonic):
+        self.on_error = on_error
+        self.clock = clock
+        self.paused = False
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        name,
+        func,
+        interval,
+        min_interval=None,
+        max_interval=None,
+        run_now=False,
+    ):
+        """Add a job, replacing a job with the same name.
+
+        Without bounds the interval does not adapt.
+        """
+        now = self.clock()
+        job = Job(
+            name,
+            func,
+            interval,
+            interval if min_interval is None else min_interval,
+            interval if max_interval is None else max_interval,
+            now if run_now else now + interval,
+        )
+        with self._lock:
+            self._jobs[name] = job
+        return job
+
+    def remove(self, name):
+        with self._lock:
+            return self._jobs.pop(name, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
+
+    def record_change(self, name, changed):
+        """Adapt a job to whether a change was observed outside of its run.
+
+        For example by work that the job started and that completed later,
+        or by the same work done on request.  As that work just happened,
+        the next run is an interval from now.  Returns whether the job
+        exists.
+        """
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is None:
+                return False
+            job.changes += changed is True
+            job.adapt(changed)
+            job.next_run = self.clock() + job.interval
+        return True
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def next_deadline(self):
+        """The time at which the next job is due, or None."""
+        if self.paused:
+            return None
+        with self._lock:
+            return min((job.next_run for job in self._jobs.values()), default=None)
+
+    def run_due(self):
+        """Run the jobs that are due; returns the number of jobs run."""
+        if self.paused:
+            return 0
+        with self._lock:
+            due = [j for j in self._jobs.values() if j.next_run <= self.clock()]
+        due.sort(key=lambda job: job.next_run)
+        runs = 0
+        for job in due:
+            with self._lock:
+                if self._jobs.get(job.name) is not job:
+                    # removed or replaced by a job that ran before
+                    continue
+            self._run(job)
+            runs += 1
+        return runs
+
+    def _run(self, job):
+        start = self.clock()
+        changed = None
+        try:
+            changed = job.func()
+        except Exception as e:
+            job.errors += 1
+            if self.on_error:
+                self.on_error(job, e)
+        end = self.clock()
+        job.runs += 1
+        job.changes += changed is True
+        job.last_duration = end - start
+        job.adapt(changed)
+        job.next_run = end + job.interval
+
+    def jobs(self):
+        """The scheduled jobs in order of their next run."""
+        now = self.clock()
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job.next_run)
+        return [job.as_dict(now, self.paused) for job in jobs]
@@ -0,0 +1,250 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import Utils
+
+logger = Utils.getLogger(__name__)
+
+# Number of keep-alive connections kept per host.  The addon rarely has more
+# than a handful of calls in flight, so a small pool suffices.
+POOL_MAXSIZE = 8
+
+# A host session that has not been used for this many seconds is closed.
+# Load balancers in front of Lens drop idle connections after about a minute,
+# so keeping them around longer only leads to resets on the next call.
+IDLE_TIMEOUT_S = 50
+
+TIMEOUT_PRECONNECT_S = 5
+
+
+_local = threading.local()
+
+
+class _CountingPoolMixin:
+    def _new_conn(self):
+        # called on the thread that sends the request
+        _local.opened = getattr(_local, "opened", 0) + 1
+        return super()._new_conn()
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+POOL_CLASSES = {
+    "http": CountingHTTPConnectionPool,
+    "https": CountingHTTPSConnectionPool,
+}
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """An HTTPAdapter that counts new connections versus reused connections.
+
+    The connection pools of the adapter count the sockets they open
+    (including the TLS handshake) for the thread that sends a request, so
+    that we know whether the request reused a kept-alive connection.  The
+    count is kept by the pools themselves because requests selects the pool
+    of an HTTPS request by its TLS settings as well as its url.
+    """
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = POOL_CLASSES
+        return manager
+
+    def send(self, request, **kwargs):
+        _local.opened = 0
+        response = super().send(request, **kwargs)
+        if _local.opened:
+            self.stats.record_handshake(_local.opened)
+        else:
+            self.stats.record_reuse()
+        return response
+
+
+class ConnectionStats:
+    """Thread-safe counters on the connections made by a SessionPool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.handshakes = 0
+            self.reuses = 0
+            self.evictions = 0
+            self.preconnects = 0
+
+    def record_handshake(self, count=1):
+        with self._lock:
+            self.handshakes += count
+
+    def record_reuse(self):
+        with self._lock:
+            self.reuses += 1
+
+    def record_eviction(self):
+        with self._lock:
+            self.evictions += 1
+
+    def record_preconnect(self):
+        with self._lock:
+            self.preconnects += 1
+
+    def as_dict(self):
+        with self._lock:
+            requests_sent = self.handshakes + self.reuses
+            return {
+                "handshakes": self.handshakes,
+                "reuses": self.reuses,
+                "evictions": self.evictions,
+                "preconnects": self.preconnects,
+                "reuseRatio": self.reuses / requests_sent if requests_sent else 0.0,
+            }
+
+
+class SessionPool:
+    """Keep-alive HTTP sessions, one per host.
+
+    The module-level functions of `requests` open a new TCP (and TLS)
+    connection for every call.  A SessionPool keeps a `requests.Session` per
+    host (Lens API, storage for downloads, thumbnails) so that subsequent calls
+    reuse an open connection.  Sessions that have been idle for longer than
+    `idle_timeout` seconds are closed on the next access.
+
+    The interface mirrors the functions of `requests`, so `requests.get(...)`
+    becomes `pool.get(...)`.
+    """
+
+    def __init__(
+        self,
+        pool_maxsize=POOL_MAXSIZE,
+        idle_timeout=IDLE_TIMEOUT_S,
+        instrumentation=None,
+    ):
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        # records every request if given (see instrumentation.py)
+        self.instrumentation = instrumentation
+        self.stats = ConnectionStats()
+        self._sessions = {}  # host -> (session, time last used)
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = CountingHTTPAdapter(
+            self.stats,
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _evict_idle(self, now):
+        # assumes that the lock is held
+        for host, (session, last_used) in list(self._sessions.items()):
+            if now - last_used > self.idle_timeout:
+                logger.debug(f"Closing idle connections to {host}")
+                session.close()
+                del self._sessions[host]
+                self.stats.record_eviction()
+
+    def get_session(self, url):
+        """Return the session for the host of the url."""
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            if host in self._sessions:
+                session, _ = self._sessions[host]
+            else:
+                session = self._create_session()
+            self._sessions[host] = (session, now)
+            return session
+
+    def request(self, method, url, **kwargs):
+        session = self.get_session(url)
+        if self.instrumentation is None:
+            return session.request(method, url, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.instrumentation.record(
+                method, url, time.perf_counter() - start, error=e
+            )
+            raise
+        self.instrumentation.record(
+            method,
+            url,
+            time.perf_counter() - start,
+            response=response,
+            streamed=kwargs.get("stream", False),
+        )
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def preconnect(self, url):
+        """Open a connection to the host of url in a background thread.
+
+        The connection is returned to the pool so that the first real call
+        does not have to pay for the handshake.  Failures are ignored, the
+        call itself reports problems.
+        """
+
+        def open_connection():
+            try:
+                self.head(url, timeout=TIMEOUT_PRECONNECT_S)
+                self.stats.record_preconnect()
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"Preconnect to {url} failed: {e}")
+
+        thread = threading.Thread(target=open_connection, daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        with self._lock:
+            for session, _ in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def get_stats(self):
+        stats = self.stats.as_dict()
+        with self._lock:
+            stats["openHosts"] = list(self._sessions.keys())
+        return stats
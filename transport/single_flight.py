@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+
+# Results are reused for this many seconds after a call completes.  The watcher,
+# the timers and the user tend to ask for the same directory within
+# milliseconds of each other, so a short window suffices.
+MEMO_WINDOW_S = 0.5
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Share one call among identical calls that overlap in time.
+
+    A call with the same key as a call in flight waits for that call and
+    shares its result (or exception) instead of making a request itself.
+    Results are also reused for `memo_window` seconds after they arrive.
+
+    Results are shared as they are, without copying, so func returns
+    immutable data, such as the body of a response, that every caller
+    decodes into objects of its own.  Call clear() after a write, since a
+    result from before the write is stale.
+    """
+
+    def __init__(self, memo_window=MEMO_WINDOW_S, clock=time.monotonic):
+        self.memo_window = memo_window
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._memo = {}  # key -> (time completed, result)
+        # incremented by clear() so that calls from before do not memoize
+        self._generation = 0
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.memo_hits = 0
+
+    @staticmethod
+    def make_key(*parts):
+        return json.dumps(parts, sort_keys=True, default=str)
+
+    def do(self, key, func):
+        """Return the result of func(), shared with identical overlapping calls."""
+        with self._lock:
+            self.calls += 1
+            memo = self._memo.get(key)
+            if memo and self.clock() - memo[0] <= self.memo_window:
+                self.memo_hits += 1
+                return memo[1]
+            call = self._in_flight.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._in_flight[key] = _Call()
+                self.executed += 1
+                leader = True
+                generation = self._generation
+
+        if leader:
+            try:
+                result = func()
+            except Exception as e:
+                call.error = e
+                raise
+            else:
+                call.result = result
+                return result
+            finally:
+                with self._lock:
+                    if self._in_flight.get(key) is call:
+                        del self._in_flight[key]
+                    if call.error is None and generation == self._generation:
+                        self._memo[key] = (self.clock(), call.result)
+                        self._expire()
+                call.done.set()
+
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _expire(self):
+        # assumes that the lock is held
+        now = self.clock()
+        for key, (completed, _) in list(self._memo.items()):
+            if now - completed > self.memo_window:
+                del self._memo[key]
+
+    def clear(self):
+        """Forget the memoized results, for example after a write.
+
+        Calls in flight may have started before the write, so later calls do
+        not share them.
+        """
+        with self._lock:
+            self._generation += 1
+            self._memo.clear()
+            self._in_flight.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "memoHits": self.memo_hits,
+            }
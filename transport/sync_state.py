@@ -0,0 +1,243 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    id TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    directory_id TEXT NOT NULL,
+    is_folder INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    server_id TEXT,
+    version_id TEXT,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (directory_id, is_folder, name)
+);
+CREATE TABLE IF NOT EXISTS synced (
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    file_id TEXT,
+    version_id TEXT NOT NULL,
+    local_updated_at INTEGER NOT NULL,
+    hash TEXT,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (directory, name)
+);
+"""
+
+
+def _entry_key(is_folder, entry):
+    return (is_folder, entry["name"] if is_folder else entry["custFileName"])
+
+
+class SyncState:
+    """The sync state of a workspace, persisted in an SQLite database.
+
+    The state has two parts:
+
+    - the server listings of directories by directory id, as returned by
+      getDirectory, so that the workspace can be browsed offline with the
+      status of the files as last known, and
+    - per local file, relative to the workspace, the file and version on the
+      server and the modification time (and hash if known) of the local
+      file when it was last synced, that is, downloaded or uploaded.
+
+    A listing is stored incrementally: only the entries that changed are
+    written.  The state is best effort: it can always be rebuilt from the
+    server, so a database that cannot be read is started anew and failing
+    writes are counted in the stats but not raised.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.writes = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            self._db = self._open()
+        except sqlite3.DatabaseError:
+            # corrupt or of another schema, start anew
+            os.remove(path)
+            self._db = self._open()
+
+    def _open(self):
+        # the connection is used by the GUI thread and the refresh workers,
+        # serialized by the lock
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, SCHEMA_VERSION):
+                raise sqlite3.DatabaseError(f"Unknown schema version {version}")
+            db.executescript(SCHEMA)
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            db.commit()
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    def _write(self, func):
+        with self._lock:
+            try:
+                with self._db:
+                    result = func(self._db)
+                self.writes += 1
+                return result
+            except sqlite3.Error:
+                self.errors += 1
+                return None
+
+    def store_listing(self, directory_id, listing):
+        """Store the getDirectory result of a directory.
+
+        Returns the number of entries that were added, changed or removed.
+        """
+        rows = {}
+        for is_folder, entries in ((1, listing["directories"]), (0, listing["files"])):
+            for entry in entries:
+                version_id = None
+                if not is_folder:
+                    version_id = entry.get("currentVersion", {}).get("_id")
+                rows[_entry_key(is_folder, entry)] = (
+                    entry.get("_id"),
+                    version_id,
+                    json.dumps(entry, sort_keys=True),
+                )
+
+        def store(db):
+            stored = {
+                (is_folder, name): entry
+                for is_folder, name, entry in db.execute(
+                    "SELECT is_folder, name, entry FROM entries"
+                    " WHERE directory_id = ?",
+                    (directory_id,),
+                )
+            }
+            removed = [key for key in stored if key not in rows]
+            changed = [
+                (directory_id, key[0], key[1], *row)
+                for key, row in rows.items()
+                if stored.get(key) != row[2]
+            ]
+            db.executemany(
+                "DELETE FROM entries"
+                " WHERE directory_id = ? AND is_folder = ? AND name = ?",
+                [(directory_id, *key) for key in removed],
+            )
+            db.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", changed
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO directories VALUES (?, ?)",
+                (directory_id, self.clock()),
+            )
+            return len(removed) + len(changed)
+
+        return self._write(store)
+
+    def load_listing(self, directory_id):
+        """The stored listing of a directory like getDirectory, or None.
+
+        The listing has the "directories" and "files" of the directory and
+        "fetchedAt", the time it was stored.
+        """
+        with self._lock:
+            try:
+                fetched = self._db.execute(
+                    "SELECT fetched_at FROM directories WHERE id = ?",
+                    (directory_id,),
+                ).fetchone()
+                if fetched is None:
+                    return None
+                rows = self._db.execute(
+                    "SELECT is_folder, entry FROM entries WHERE directory_id = ?"
+                    " ORDER BY name",
+                    (directory_id,),
+                ).fetchall()
+            except sqlite3.Error:
+                self.errors += 1
+                return None
+        listing = {"directories": [], "files": [], "fetchedAt": fetched[0]}
+        for is_folder, entry in rows:
+            listing["directories" if is_folder else "files"].append(json.loads(entry))
+        return listing
+
+    def record_synced(
+        self, directory, name, file_id, version_id, local_updated_at, hash=None
+    ):
+        """Record that a local file is the version version_id on the server.
+
+        directory is relative to the workspace, "" for its root.
+        """
+        self._write(
+            lambda db: db.execute(
+                "INSERT OR REPLACE INTO synced VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    directory,
+                    name,
+                    file_id,
+                    version_id,
+                    local_updated_at,
+                    hash,
+                    self.clock(),
+                ),
+            )
+        )
+
+    def get_synced(self, directory):
+        """The sync records of the files in directory, by name."""
+        with self._lock:
+            try:
+                rows = self._db.execute(
+                    "SELECT name, file_id, version_id, local_updated_at, hash"
+                    " FROM synced WHERE directory = ?",
+                    (directory,),
+                ).fetchall()
+            except sqlite3.Error:
+                self.errors += 1
+                return {}
+        return {
+            name: {
+                "fileId": file_id,
+                "versionId": version_id,
+                "localUpdatedAt": local_updated_at,
+                "hash": hash,
+            }
+            for name, file_id, version_id, local_updated_at, hash in rows
+        }
+
+    def forget_synced(self, directory, name):
+        self._write(
+            lambda db: db.execute(
+                "DELETE FROM synced WHERE directory = ? AND name = ?",
+                (directory, name),
+            )
+        )
+
+    def get_stats(self):
+        with self._lock:
+            try:
+                counts = {
+                    table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[
+                        0
+                    ]
+                    for table in ("directories", "entries", "synced")
+                }
+            except sqlite3.Error:
+                counts = {}
+            return {**counts, "writes": self.writes, "errors": self.errors}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,190 @@
+import base64
+import json
+import threading
+import time
+
+# Refresh a token this many seconds before it expires
+REFRESH_MARGIN_S = 300
+
+# Wait this long before trying again after a failed background refresh
+RETRY_DELAY_S = 30
+
+
+class TokenRefreshImpossible(Exception):
+    """The token cannot be refreshed, for example without credentials."""
+
+
+def decode_expiry(token):
+    """Return the expiry (exp claim) of a JWT as a timestamp, or None.
+
+    The signature is not verified; the server does that.  We only need to know
+    when to refresh.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenManager:
+    """Keep an access token fresh by refreshing it ahead of its expiry.
+
+    A background thread refreshes the token `margin` seconds before it
+    expires.  Calls that find the token (nearly) expired refresh it
+    synchronously with ensure_valid().  Refreshes are serialized: of a burst of
+    calls that find the same stale token, only the first refreshes and the
+    others wait for and use its result.
+
+    reauthenticate(token) is called to obtain a new token and raises
+    TokenRefreshImpossible if there is no way to do so.  on_refresh(token) is
+    called after each successful refresh, from the thread that refreshed.
+    """
+
+    def __init__(
+        self,
+        reauthenticate,
+        on_refresh=None,
+        margin=REFRESH_MARGIN_S,
+        retry_delay=RETRY_DELAY_S,
+        clock=time.time,
+    ):
+        self.reauthenticate = reauthenticate
+        self.on_refresh = on_refresh
+        self.margin = margin
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self.refreshes = 0
+        self.failures = 0
+        self.token = None
+        self.expires_at = None
+        self._refreshable = True
+        self._refresh_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._next_attempt = None
+        self._thread = None
+        # stopping ends the thread of the current generation
+        self._generation = 0
+
+    def set_token(self, token):
+        """Use a new token, for example after logging in, and schedule its refresh."""
+        with self._condition:
+            self.token = token
+            self.expires_at = decode_expiry(token) if token else None
+            self._refreshable = True
+            self._next_attempt = self._refresh_time()
+            self._condition.notify_all()
+        if token:
+            self._start_thread()
+
+    def _refresh_time(self):
+        if self.expires_at is None:
+            return None
+        return self.expires_at - self.margin
+
+    def seconds_left(self):
+        if self.expires_at is None:
+            return None
+        return self.expires_at - self.clock()
+
+    def needs_refresh(self):
+        left = self.seconds_left()
+        return left is not None and left < self.margin and self._refreshable
+
+    def refresh(self, stale_token):
+        """Refresh the token unless another thread refreshed stale_token already.
+
+        Returns the current token.  Raises the exception of reauthenticate.
+        """
+        with self._refresh_lock:
+            if self.token != stale_token:
+                # refreshed while we were waiting for the lock
+                return self.token
+            try:
+                token = self.reauthenticate(stale_token)
+                expires_at = decode_expiry(token)
+                if (
+                    expires_at is not None
+                    and self.expires_at is not None
+                    and expires_at <= self.expires_at
+                ):
+                    raise TokenRefreshImpossible("The token is not extended")
+            except TokenRefreshImpossible:
+                self._refreshable = False
+                raise
+            except Exception:
+                self.failures += 1
+                raise
+            self.refreshes += 1
+            self.set_token(token)
+        if self.on_refresh:
+            self.on_refresh(token)
+        return token
+
+    def ensure_valid(self):
+        """Refresh the token now if it (nearly) expired; returns the token.
+
+        A failed refresh is not raised: the token may still be valid and
+        otherwise the call fails as it would have without refreshing.
+        """
+        token = self.token
+        if token and self.needs_refresh():
+            try:
+                return self.refresh(token)
+            except Exception:
+                pass
+        return self.token
+
+    def _start_thread(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(self._generation,),
+                name="TokenManager",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self, generation):
+        while True:
+            with self._condition:
+                while self._generation == generation:
+                    next_attempt = self._next_attempt
+                    if next_attempt is not None and self._refreshable:
+                        delay = next_attempt - self.clock()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+                if self._generation != generation:
+                    return
+                token = self.token
+            try:
+                self.refresh(token)
+            except TokenRefreshImpossible:
+                pass
+            except Exception:
+                with self._condition:
+                    if self.token == token:
+                        self._next_attempt = self.clock() + self.retry_delay
+
+    def stop(self):
+        """Stop refreshing and forget the token."""
+        with self._condition:
+            self._generation += 1
+            self._thread = None
+            self.token = None
+            self.expires_at = None
+            self._condition.notify_all()
+
+    def get_stats(self):
+        return {
+            "secondsLeft": self.seconds_left(),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "refreshable": self._refreshable,
+        }
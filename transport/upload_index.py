@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from transport.downloads import CHUNK_SIZE
+
+# Upper bound on the number of hashes and blobs remembered
+MAX_ENTRIES = 10000
+
+# Changes are written this long after the first change that is not written
+FLUSH_DELAY_S = 5.0
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """Compute the SHA-256 of a file incrementally, in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadIndex:
+    """An index of uploaded blobs by the SHA-256 of their content.
+
+    Uploading content that the server already has can be skipped by reusing
+    the unique file name of the earlier upload.  Blobs are indexed per scope
+    (the user), because a blob uploaded by one user is not necessarily
+    accessible to another.
+
+    Hashing a large file is costly, so hashes are remembered by path, size and
+    modification time.  Both maps are persisted in a single JSON file and are
+    bounded in least recently used order.  The file is rewritten at most once
+    per flush_delay, in the background, so that the workers of a bulk upload
+    do not wait for it.  flush() writes the changes right away, for example
+    at the end of a batch, and close() before the index is discarded.
+    """
+
+    def __init__(self, path, max_entries=MAX_ENTRIES, flush_delay=FLUSH_DELAY_S):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_delay = flush_delay
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        # path -> [size, mtime_ns, digest]
+        self._hashes = OrderedDict()
+        # scope + digest -> unique file name
+        self._blobs = OrderedDict()
+        self._lock = threading.Lock()
+        # serializes the writes of the file, without holding the lock
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._timer = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self._hashes.update(data["hashes"])
+            self._blobs.update(data["blobs"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _changed(self):
+        # assumes that the lock is held
+        for entries in (self._hashes, self._blobs):
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write the changes to the file, if any."""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                data = json.dumps({"hashes": self._hashes, "blobs": self._blobs})
+            directory = os.path.dirname(self.path)
+            tmp_path = self.path + ".tmp"
+            try:
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(tmp_path, "w") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+                self.writes += 1
+            except OSError:
+                pass
+
+    def close(self):
+        self.flush()
+
+    @staticmethod
+    def _blob_key(scope, digest):
+        return f"{scope}:{digest}"
+
+    def hash(self, path):
+        """Return the SHA-256 of the file at path, computed only when changed."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._hashes.get(path)
+            if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+                self._hashes.move_to_end(path)
+                return cached[2]
+        digest = hash_file(path)
+        with self._lock:
+            self._hashes[path] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._changed()
+        return digest
+
+    def lookup(self, scope, digest):
+        """Return the unique name of an uploaded blob with this digest or None."""
+        key = self._blob_key(scope, digest)
+        with self._lock:
+            unique_name = self._blobs.get(key)
+            if unique_name is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._blobs.move_to_end(key)
+            return unique_name
+
+    def record(self, scope, digest, unique_name):
+        """Remember that content with this digest is uploaded as unique_name."""
+        key = self._blob_key(scope, digest)
+        with self._lock:
+            self._blobs[key] = unique_name
+            self._blobs.move_to_end(key)
+            self._changed()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "hashes": len(self._hashes),
+                "blobs": len(self._blobs),
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+            }
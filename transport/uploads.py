@@ -0,0 +1,81 @@
+import io
+import os
+import uuid
+
+from transport.downloads import CHUNK_SIZE
+
+
+class UploadCanceledException(Exception):
+    """The progress callback canceled an upload."""
+
+
+class MultipartFileEncoder:
+    """A multipart/form-data body with a single file that is read in chunks.
+
+    With `files=`, requests builds the whole multipart body in memory.  This
+    body is a file-like object that requests streams instead:
+
+        body = MultipartFileEncoder("file", name, f, progress=progress)
+        session.post(url, data=body, headers={"Content-Type": body.content_type})
+
+    The progress callback is called as progress(bytes_sent, bytes_total) and
+    cancels the upload by returning False.
+    """
+
+    def __init__(
+        self,
+        field,
+        filename,
+        fh,
+        content_type="application/octet-stream",
+        progress=None,
+    ):
+        self.boundary = uuid.uuid4().hex
+        self.progress = progress
+
+        head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; '
+            f'filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+        file_size = os.fstat(fh.fileno()).st_size - fh.tell()
+
+        self.total = len(head) + file_size + len(tail)
+        self.sent = 0
+        self._parts = [io.BytesIO(head), fh, io.BytesIO(tail)]
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        # requests uses the length for the Content-Length header
+        return self.total
+
+    def __iter__(self):
+        # requests only streams bodies that are iterable
+        while True:
+            chunk = self.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.total - self.sent
+        chunks = []
+        while size > 0 and self._parts:
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            size -= len(chunk)
+        data = b"".join(chunks)
+
+        self.sent += len(data)
+        if self.progress and self.progress(self.sent, self.total) is False:
+            raise UploadCanceledException("The upload is canceled")
+        return data
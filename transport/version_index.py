@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds that a file is answered from the index without asking the server
+MAX_AGE_S = 60
+
+# Upper bound on the number of files in the index
+MAX_FILES = 256
+
+PUBLIC = "public"
+PRIVATE = "private"
+
+
+class IndexedFile:
+    def __init__(self, updated_at, file, versions, public, stored):
+        self.updated_at = updated_at
+        self.file = file
+        self.versions = versions
+        self.public = public
+        self.stored = stored
+
+
+class VersionIndex:
+    """Files with their versions indexed by version id, per file id.
+
+    A file is fetched with all its versions, so looking up a version means
+    fetching the file and scanning the versions.  The index answers a lookup
+    of a recently fetched file without a request.  Once a file is older than
+    max_age it is fetched again.  The versions are indexed again only if the
+    updatedAt of the file changed.
+
+    A file fetched with public info may lack details, so it only answers
+    public lookups.  The index also remembers per file which access mode
+    worked, so that a public lookup of a file that is not public goes
+    straight to a private request.
+
+    The files and versions are shared by the callers and must not be
+    modified.
+    """
+
+    def __init__(self, max_age=MAX_AGE_S, max_files=MAX_FILES, clock=time.monotonic):
+        self.max_age = max_age
+        self.max_files = max_files
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.reindexed = 0
+        self._files = OrderedDict()
+        self._modes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bound(self, entries):
+        # assumes that the lock is held
+        while len(entries) > self.max_files:
+            entries.popitem(last=False)
+
+    def lookup(self, file_id, version_id, public=False):
+        """Return (file, version) if the index can answer, otherwise None.
+
+        version is None if the file has no such version.
+        """
+        with self._lock:
+            entry = self._files.get(file_id)
+            if (
+                entry is None
+                or (entry.public and not public)
+                or self.clock() - entry.stored > self.max_age
+                or version_id not in entry.versions
+            ):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._files.move_to_end(file_id)
+            return entry.file, entry.versions[version_id]
+
+    def store(self, file_id, updated_at, file, versions, public=False):
+        """Store a fetched file with its versions as (version id, version).
+
+        Returns a function that looks up a version of the stored file.
+        """
+        with self._lock:
+            entry = self._files.get(file_id)
+            if entry and entry.updated_at == updated_at and entry.public == public:
+                # unchanged, so the versions need not be indexed again
+                entry.file = file
+                entry.stored = self.clock()
+            else:
+                self.reindexed += 1
+                entry = IndexedFile(
+                    updated_at, file, dict(versions), public, self.clock()
+                )
+                self._files[file_id] = entry
+            self._files.move_to_end(file_id)
+            self._bound(self._files)
+            return entry.versions.get
+
+    def get_mode(self, file_id):
+        """The access mode that worked for the file (PUBLIC or PRIVATE) or None."""
+        with self._lock:
+            return self._modes.get(file_id)
+
+    def set_mode(self, file_id, mode):
+        with self._lock:
+            self._modes[file_id] = mode
+            self._modes.move_to_end(file_id)
+            self._bound(self._modes)
+
+    def fetch(self, file_id, fetch, errors):
+        """Fetch a file in the access mode that worked for it last time.
+
+        fetch(mode) raises one of the exception classes in errors if the file
+        is not accessible in that mode, in which case the other mode is
+        tried.  Public first if neither worked before.  Returns the mode that
+        worked and the result of fetch.
+        """
+        modes = [PUBLIC, PRIVATE]
+        if self.get_mode(file_id) == PRIVATE:
+            modes.reverse()
+        for mode in modes:
+            try:
+                result = fetch(mode)
+            except errors:
+                if mode == modes[-1]:
+                    raise
+                continue
+            self.set_mode(file_id, mode)
+            return mode, result
+
+    def invalidate(self):
+        """Forget the files, for example after a write to a file.
+
+        The access modes are kept: a write does not make a file public.
+        """
+        with self._lock:
+            self._files.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reindexed": self.reindexed,
+            }